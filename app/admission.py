@@ -0,0 +1,209 @@
+"""
+Admission control with priority lanes.
+
+Every request is classified into a lane before it reaches the routers:
+
+    critical    attendance marking, logins, token generation
+    analytics   heavy admin reads (grades, export, dashboard, history, bulk ingest)
+    default     every other /api/ request
+
+Pages, static files and probes (anything outside /api/) bypass admission:
+they are served from memory on the event loop, and health checks must
+answer while the API is saturated.
+
+Critical requests are always admitted. The other lanes share what is left
+of settings.ADMISSION_MAX_CONCURRENCY after ADMISSION_CRITICAL_RESERVED
+slots are held back, so reports can never take the threadpool and database
+connections that attendance marking needs. A full lane queues requests for
+up to ADMISSION_QUEUE_TIMEOUT_SECONDS and is shed with 503 and Retry-After
+if the queue is full or the wait times out. Analytics requests are also shed
+outright while critical traffic fills its whole reservation.
+
+The controller runs on the event loop, so its counters need no locking.
+"""
+import asyncio
+import json
+import re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from . import tracing
+from .config import settings
+
+CRITICAL = "critical"
+ANALYTICS = "analytics"
+DEFAULT = "default"
+
+# (method, path pattern, lane), first match wins
+ROUTE_LANES: List[Tuple[str, "re.Pattern", str]] = [
+    (method, re.compile(pattern), lane)
+    for method, pattern, lane in [
+        ("POST", r"^/api/student/attendance/mark$", CRITICAL),
+        ("POST", r"^/api/student/login$", CRITICAL),
+        ("POST", r"^/api/admin/login$", CRITICAL),
+        ("POST", r"^/api/admin/tokens/generate$", CRITICAL),
+        # Mostly waiting, and capped by PROFILER_MAX_SESSIONS; must work when the worker is saturated
+        ("GET", r"^/api/admin/debug/profile$", CRITICAL),
+        ("GET", r"^/api/admin/students/grades$", ANALYTICS),
+        ("GET", r"^/api/admin/export/excel$", ANALYTICS),
+        ("GET", r"^/api/admin/dashboard$", ANALYTICS),
+        ("GET", r"^/api/admin/tokens/history(/\d+)?$", ANALYTICS),
+        ("GET", r"^/api/admin/attendance/session/\d+$", ANALYTICS),
+        ("POST", r"^/api/admin/attendance/bulk(/csv)?$", ANALYTICS),
+    ]
+]
+
+
+# Only API requests use threadpool threads and database connections
+ADMITTED_PREFIX = "/api/"
+
+
+def classify(method: str, path: str) -> str:
+    """Return the lane for an /api/ request."""
+    for route_method, pattern, lane in ROUTE_LANES:
+        if method == route_method and pattern.match(path):
+            return lane
+    return DEFAULT
+
+
+class Lane:
+    """Concurrency limit plus a bounded FIFO queue of waiting requests."""
+
+    def __init__(self, name: str, limit: Optional[int], queue_size: int):
+        self.name = name
+        self.limit = limit  # None means unlimited
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "queue_size": self.queue_size,
+            "admitted_total": self.admitted,
+            "queued_total": self.queued,
+            "shed_total": self.shed,
+        }
+
+
+class AdmissionController:
+    """Admits, queues or sheds requests per lane."""
+
+    def __init__(self):
+        shared = max(settings.ADMISSION_MAX_CONCURRENCY - settings.ADMISSION_CRITICAL_RESERVED, 1)
+        analytics = min(settings.ADMISSION_ANALYTICS_CONCURRENCY, shared)
+        self.lanes: Dict[str, Lane] = {
+            CRITICAL: Lane(CRITICAL, None, 0),
+            ANALYTICS: Lane(ANALYTICS, analytics, settings.ADMISSION_ANALYTICS_QUEUE_SIZE),
+            DEFAULT: Lane(DEFAULT, max(shared - analytics, 1), settings.ADMISSION_QUEUE_SIZE),
+        }
+
+    def under_pressure(self) -> bool:
+        """True while critical traffic is using its whole reservation."""
+        return self.lanes[CRITICAL].active >= settings.ADMISSION_CRITICAL_RESERVED
+
+    async def acquire(self, lane_name: str) -> bool:
+        """
+        Wait for a slot in a lane.
+
+        Returns:
+            True once admitted, False if the request should be shed
+        """
+        lane = self.lanes[lane_name]
+        if lane_name == ANALYTICS and self.under_pressure():
+            lane.shed += 1
+            return False
+
+        if lane.limit is None or (lane.active < lane.limit and not lane.waiters):
+            lane.active += 1
+            lane.admitted += 1
+            return True
+
+        if len(lane.waiters) >= lane.queue_size:
+            lane.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        lane.queued += 1
+        try:
+            await asyncio.wait_for(waiter, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            lane.shed += 1
+            return False
+        except BaseException:
+            # Client went away; hand on a slot we may already have been given
+            if waiter.done() and not waiter.cancelled():
+                self.release(lane_name)
+            raise
+        finally:
+            if waiter in lane.waiters:
+                lane.waiters.remove(waiter)
+
+        lane.admitted += 1
+        return True
+
+    def release(self, lane_name: str) -> None:
+        """Free a slot, passing it straight to the next live waiter."""
+        lane = self.lanes[lane_name]
+        while lane.waiters:
+            waiter = lane.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)  # The slot moves over; active is unchanged
+                return
+        lane.active -= 1
+
+    def snapshot(self) -> dict:
+        """Current lane occupancy, queue depths and counters."""
+        return {
+            "enabled": settings.ADMISSION_ENABLED,
+            "max_concurrency": settings.ADMISSION_MAX_CONCURRENCY,
+            "critical_reserved": settings.ADMISSION_CRITICAL_RESERVED,
+            "under_pressure": self.under_pressure(),
+            "lanes": {name: lane.snapshot() for name, lane in self.lanes.items()},
+        }
+
+
+controller = AdmissionController()
+
+_SHED_BODY = json.dumps({"detail": "Server is busy, please retry shortly"}).encode()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that runs each HTTP request through the controller."""
+
+    def __init__(self, app, admission: AdmissionController = None):
+        self.app = app
+        self.admission = admission or controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED \
+                or not scope["path"].startswith(ADMITTED_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        lane = classify(scope["method"], scope["path"])
+        with tracing.span("admission.wait", lane=lane):
+            admitted = await self.admission.acquire(lane)
+        if not admitted:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_SHED_BODY)).encode()),
+                    (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _SHED_BODY})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(lane)
@@ -0,0 +1,160 @@
+"""
+Fingerprinted static assets and pre-rendered pages.
+
+Everything under static/ is read once, content-hashed and compressed in
+memory. Templates contain no per-request data, so they are rendered once
+against the hashed asset URLs. Hashed URLs are cached by browsers forever
+(a new deploy changes the hash); pages and unhashed URLs are revalidated
+with ETags, which costs a 304 and no body.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip alone is served without it
+    brotli = None
+
+# Hashed URLs change whenever the content does
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Pages and unhashed URLs: always revalidate, answered with 304 when unchanged
+REVALIDATE = "no-cache"
+
+# Smaller bodies are not worth a Content-Encoding
+MIN_COMPRESS_BYTES = 512
+
+
+def _accepted_encodings(request: Request) -> set:
+    """Parse Accept-Encoding, dropping codings refused with q=0."""
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+class Asset:
+    """A response body held in memory with precompressed variants."""
+
+    def __init__(self, content: bytes, media_type: str):
+        self.media_type = media_type
+        # Weak, since the same ETag covers every encoding of the content
+        self.etag = f'W/"{hashlib.sha256(content).hexdigest()[:16]}"'
+        self.variants = {"identity": content}
+        if len(content) >= MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(content, quality=11)
+            self.variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        """
+        Serve the asset, negotiating the encoding and honouring If-None-Match.
+
+        Args:
+            request: Incoming request
+            cache_control: Cache-Control header value
+
+        Returns:
+            200 with the best encoding the client accepts, or 304
+        """
+        headers = {"ETag": self.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        accepted = _accepted_encodings(request)
+        encoding = next(
+            (coding for coding in ("br", "gzip") if coding in self.variants and coding in accepted),
+            "identity"
+        )
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+class StaticAssets:
+    """In-memory static files, served under both hashed and original names."""
+
+    def __init__(self, directory: str, url_prefix: str = "/static"):
+        self.url_prefix = url_prefix
+        self.files: Dict[str, tuple] = {}  # served path -> (Asset, Cache-Control)
+        self.urls: Dict[str, str] = {}  # original path -> hashed URL
+
+        for root, _, filenames in os.walk(directory):
+            for filename in sorted(filenames):
+                full_path = os.path.join(root, filename)
+                path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    content = f.read()
+
+                media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                if media_type.startswith("text/") or media_type == "application/javascript":
+                    media_type += "; charset=utf-8"
+                asset = Asset(content, media_type)
+
+                stem, ext = os.path.splitext(path)
+                hashed_path = f"{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}"
+                self.files[hashed_path] = (asset, IMMUTABLE)
+                self.files[path] = (asset, REVALIDATE)
+                self.urls[path] = f"{url_prefix}/{hashed_path}"
+
+    def url(self, path: str) -> str:
+        """Return the fingerprinted URL of a static file, e.g. /static/css/style.1a2b3c4d5e.css."""
+        return self.urls[path.lstrip("/")]
+
+    def response(self, request: Request, path: str) -> Response:
+        """Serve a static file by its hashed or original path."""
+        entry = self.files.get(path)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        asset, cache_control = entry
+        return asset.response(request, cache_control)
+
+
+class PageCache:
+    """Templates rendered once and served from memory."""
+
+    def __init__(self, directory: str, assets: StaticAssets):
+        self.environment = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(["html", "xml"]),
+        )
+        self.environment.globals["url_for"] = self._url_for
+        self.assets = assets
+        self.pages: Dict[str, Asset] = {}
+
+    def _url_for(self, name: str, path: Optional[str] = None) -> str:
+        """Stand-in for Starlette's url_for; only static URLs are needed by the templates."""
+        if name != "static":
+            raise ValueError(f"Pre-rendered templates can only link static files, not '{name}'")
+        return self.assets.url(path)
+
+    def render(self, name: str) -> Asset:
+        """Render a template and keep the result."""
+        html = self.environment.get_template(name).render()
+        page = self.pages[name] = Asset(html.encode("utf-8"), "text/html; charset=utf-8")
+        return page
+
+    def render_all(self) -> int:
+        """
+        Render every template ahead of the first request.
+
+        Returns:
+            Number of pages rendered
+        """
+        for name in self.environment.list_templates(extensions=["html"]):
+            self.render(name)
+        return len(self.pages)
+
+    def response(self, request: Request, name: str) -> Response:
+        """Serve a rendered page (rendering it now if startup has not)."""
+        page = self.pages.get(name) or self.render(name)
+        return page.response(request, REVALIDATE)
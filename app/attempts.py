@@ -0,0 +1,94 @@
+"""
+Attempt limiting for session token submissions.
+
+Tokens are six digits and live for minutes, so they can be guessed. Every
+wrong token counts against its (student, session) pair in the cache;
+submissions refused for other reasons (outside the attendance window,
+already marked, unknown session) do not. The MARK_ATTEMPT_LIMIT-th wrong
+token within MARK_ATTEMPT_WINDOW_SECONDS locks the pair out for
+MARK_LOCKOUT_BASE_SECONDS, doubling with each further lockout up to
+MARK_LOCKOUT_MAX_SECONDS. Submitting a valid token resets the count.
+
+While locked out, submissions are refused by check() before any database
+work is done.
+
+Counters live in the configured cache, so they are shared by every worker
+when CACHE_BACKEND is "sqlite" and per worker with "memory".
+"""
+import math
+import time
+
+from fastapi import HTTPException
+
+from . import logs
+from .cache import get_cache
+from .config import settings
+
+# Lockout counts are remembered this long, so the doubling survives a quiet spell
+STRIKE_MEMORY_SECONDS = 24 * 60 * 60
+
+
+def _keys(student_id: int, session_id: int) -> tuple:
+    suffix = f"{student_id}:{session_id}"
+    return f"mark-attempts:{suffix}", f"mark-lockout:{suffix}", f"mark-strikes:{suffix}"
+
+
+def lockout_seconds(strikes: int) -> int:
+    """Length of the n-th lockout: the base, doubled for each earlier one, capped."""
+    return min(settings.MARK_LOCKOUT_BASE_SECONDS * 2 ** (strikes - 1), settings.MARK_LOCKOUT_MAX_SECONDS)
+
+
+def check(student_id: int, session_id: int) -> None:
+    """
+    Refuse a submission while its (student, session) pair is locked out.
+
+    Args:
+        student_id: Authenticated student
+        session_id: Session the token is submitted for
+
+    Raises:
+        HTTPException: 429 with Retry-After when the pair is locked out
+    """
+    locked_until = get_cache().get(_keys(student_id, session_id)[1])
+    if locked_until is not None:
+        _reject(locked_until)
+
+
+def record_failure(student_id: int, session_id: int) -> None:
+    """
+    Count a wrong token, locking the pair out once the limit is reached.
+
+    Args:
+        student_id: Authenticated student
+        session_id: Session the token was submitted for
+
+    Raises:
+        HTTPException: 429 with Retry-After when this failure starts a lockout
+    """
+    cache = get_cache()
+    attempts_key, lockout_key, strikes_key = _keys(student_id, session_id)
+
+    if cache.incr(attempts_key, settings.MARK_ATTEMPT_WINDOW_SECONDS) >= settings.MARK_ATTEMPT_LIMIT:
+        strikes = cache.incr(strikes_key, STRIKE_MEMORY_SECONDS)
+        duration = lockout_seconds(strikes)
+        locked_until = time.time() + duration
+        cache.set(lockout_key, locked_until, duration)
+        cache.delete(attempts_key)
+        logs.audit("attendance.locked_out", student_id=student_id, session_id=session_id,
+                   strikes=strikes, lockout_seconds=duration)
+        _reject(locked_until)
+
+
+def reset(student_id: int, session_id: int) -> None:
+    """Forget counted attempts once the student has submitted a valid token."""
+    get_cache().delete(_keys(student_id, session_id)[0])
+
+
+def _reject(locked_until: float) -> None:
+    retry_after = max(math.ceil(locked_until - time.time()), 1)
+    raise HTTPException(
+        status_code=429,
+        detail=f"Too many attempts. Try again in {retry_after} seconds",
+        headers={"Retry-After": str(retry_after)}
+    )
+
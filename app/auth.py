@@ -7,6 +7,8 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from .config import settings
+from .logs import audit
+from .tracing import traced
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -17,6 +19,7 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+@traced("auth.verify_password")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -62,11 +65,13 @@ def verify_student_token(token: str) -> int:
         user_type: str = payload.get("type")
         
         if student_id is None or user_type != "student":
+            audit("auth.failed", kind="student", reason="wrong_token_type")
             raise credentials_exception
             
         return int(student_id)
         
-    except JWTError:
+    except JWTError as e:
+        audit("auth.failed", kind="student", reason="invalid_token", error=type(e).__name__)
         raise credentials_exception
 
 
@@ -95,11 +100,13 @@ def verify_admin_token(token: str) -> str:
         user_type: str = payload.get("type")
         
         if username is None or user_type != "admin":
+            audit("auth.failed", kind="admin", reason="wrong_token_type")
             raise credentials_exception
             
         return username
         
-    except JWTError:
+    except JWTError as e:
+        audit("auth.failed", kind="admin", reason="invalid_token", error=type(e).__name__)
         raise credentials_exception
 
 
@@ -0,0 +1,57 @@
+"""
+Bulk loading helpers for large imports.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from .utils import roster_fingerprint
+
+
+def copy_students(db, students: Iterable[Tuple[str, str, Optional[str]]]) -> int:
+    """
+    Insert unregistered students with PostgreSQL COPY, skipping existing UINs.
+
+    Rows are streamed into a temporary staging table with COPY and then merged
+    with a single INSERT ... ON CONFLICT DO NOTHING, so the cost is one round
+    trip per import instead of one per student.
+
+    Args:
+        db: SQLAlchemy session bound to a PostgreSQL engine
+        students: (uin, name, course) tuples
+
+    Returns:
+        Number of students inserted
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for uin, name, course in students:
+        writer.writerow([uin, name, course or "", roster_fingerprint(uin, name, course)])
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMP TABLE students_staging "
+            "(uin TEXT, name TEXT, course TEXT, fingerprint TEXT) ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            "COPY students_staging (uin, name, course, fingerprint) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        cursor.execute(
+            """
+            INSERT INTO students
+                (uin, name, course, roster_fingerprint, is_enrolled,
+                 hashed_password, is_registered, created_at)
+            SELECT DISTINCT ON (uin) uin, name, NULLIF(course, ''), fingerprint, TRUE,
+                '', FALSE, %s
+            FROM students_staging
+            ON CONFLICT (uin) DO NOTHING
+            """,
+            (datetime.utcnow(),)
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
@@ -0,0 +1,167 @@
+"""
+Pluggable key-value cache with per-key expiry.
+
+Used for short-lived coordination state (read-your-writes markers, attempt
+counters and the like). The backend is selected with settings.CACHE_BACKEND:
+
+- "memory": a dict in each worker process. Fastest, but every worker
+  keeps its own state.
+- "sqlite": a SQLite file (settings.CACHE_SQLITE_PATH) shared by all
+  workers on the host.
+
+Attempt limits and Idempotency-Key records only hold across workers with
+a shared backend, so when CACHE_BACKEND is unset run.py picks "sqlite"
+for multi-worker servers (see backend_for_workers).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from .config import settings
+
+
+class MemoryCache:
+    """Thread-safe in-process cache. State is local to one worker process."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store value under key for ttl seconds."""
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            if len(self._data) > 10000:
+                self._purge_expired()
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Add one to the counter under key and return it. A new counter expires after ttl seconds."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                entry = (0, time.monotonic() + ttl)
+            self._data[key] = (entry[0] + 1, entry[1])
+            return entry[0] + 1
+
+    def delete(self, key: str) -> None:
+        """Remove key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+
+
+class SqliteCache:
+    """Cache in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.CACHE_SQLITE_PATH
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit, so each statement is its own short transaction
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for key, or None if missing or expired."""
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        # Counters are stored as plain integers so incr can update them in SQL
+        return row[0] if isinstance(row[0], int) else pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store value under key for ttl seconds."""
+        stored = value if type(value) is int else pickle.dumps(value)
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, stored, time.time() + ttl)
+        )
+        self._after_write()
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Add one to the counter under key and return it. A new counter expires after ttl seconds."""
+        now = time.time()
+        row = self._connect().execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, 1, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN expires_at <= ? THEN 1 ELSE value + 1 END, "
+            "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+            "RETURNING value",
+            (key, now + ttl, now, now)
+        ).fetchone()
+        self._after_write()
+        return row[0]
+
+    def delete(self, key: str) -> None:
+        """Remove key if present."""
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _after_write(self) -> None:
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._connect().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+
+_BACKENDS = {
+    "memory": MemoryCache,
+    "sqlite": SqliteCache,
+}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def backend_for_workers(workers: int) -> str:
+    """The configured backend, else "sqlite" when several worker processes must share state."""
+    if settings.CACHE_BACKEND:
+        return settings.CACHE_BACKEND
+    return "sqlite" if workers > 1 else "memory"
+
+
+def get_cache():
+    """Return the process-wide cache for the configured backend."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = settings.CACHE_BACKEND or "memory"
+                if backend not in _BACKENDS:
+                    raise ValueError(
+                        f"Unknown CACHE_BACKEND '{backend}'. "
+                        f"Choose one of: {', '.join(_BACKENDS)}"
+                    )
+                _cache = _BACKENDS[backend]()
+    return _cache
@@ -0,0 +1,265 @@
+"""
+Opt-in capture of real request streams for later replay.
+
+With settings.CAPTURE_ENABLED, CaptureMiddleware records one compact JSON
+line per API request: arrival time, method, route template and path
+parameters, query string, a pseudonymous principal, an anonymized body,
+the response status and the duration. benchmarks/replay.py re-issues a
+capture against a local instance.
+
+Nothing identifying is stored:
+- Principals (JWT subjects, login UINs, admin usernames) become keyed
+  hashes. The key includes the day the capture started, so they are
+  stable for a whole capture file (even past midnight) and across workers
+  started the same day. One student's requests can be followed without
+  knowing who they are.
+  Anyone holding SECRET_KEY could recompute them.
+- Passwords and names are dropped. UINs in bodies are hashed.
+- A submitted session token is recorded only as "<valid>" or "<invalid>",
+  judged from the response status.
+- Headers other than Content-Type and X-Course are not kept. Client
+  addresses are hashed per connection, so anonymous requests on one
+  keep-alive connection still group together.
+
+Lines are queued and written by a background thread in batches, one gzip
+file per worker process under settings.CAPTURE_DIR. The queue holds at
+most settings.CAPTURE_QUEUE_SIZE records; beyond that records are dropped
+and counted rather than slowing requests down.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from typing import Optional
+
+from jose import JWTError, jwt
+
+from .config import settings
+from .utils import DEBUG_PREFIX, SKIPPED_PREFIXES
+
+logger = logging.getLogger("app.capture")
+
+# Never captured: assets, probes and the profiling/tracing endpoints themselves
+_UNCAPTURED_PREFIXES = SKIPPED_PREFIXES + (DEBUG_PREFIX,)
+
+REDACTED = "<redacted>"
+VALID_TOKEN = "<valid>"
+INVALID_TOKEN = "<invalid>"
+
+# Body fields that are dropped or hashed wherever they appear
+_DROPPED_FIELDS = {"password", "new_password", "name", "student_name"}
+_HASHED_FIELDS = {"uin", "username", "student_uin"}
+
+# Logins whose response reveals the principal that later requests will carry
+_LOGIN_ROUTES = {"/api/student/login", "/api/admin/login"}
+_MARK_ROUTE = "/api/student/attendance/mark"
+
+
+def pseudonym(kind: str, value, day: str) -> str:
+    """Keyed, day-scoped hash of an identifier, e.g. "student:3f9a1c2b7d"."""
+    key = f"{settings.SECRET_KEY}:capture:{day}".encode()
+    digest = hmac.new(key, f"{kind}:{value}".encode(), hashlib.sha256).hexdigest()[:10]
+    return f"{kind}:{digest}"
+
+
+def anonymize(value, day: str):
+    """Drop or hash identifying fields anywhere in a JSON body."""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key in _DROPPED_FIELDS:
+                result[key] = REDACTED
+            elif key in _HASHED_FIELDS and item is not None:
+                result[key] = pseudonym("uin" if key != "username" else "admin", item, day)
+            else:
+                result[key] = anonymize(item, day)
+        return result
+    if isinstance(value, list):
+        return [anonymize(item, day) for item in value]
+    return value
+
+
+def principal_from_headers(headers: dict, day: str) -> Optional[str]:
+    """Pseudonymous principal of a bearer token, from its (unverified) claims."""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.startswith("Bearer "):
+        return None
+    try:
+        claims = jwt.get_unverified_claims(authorization[len("Bearer "):])
+    except JWTError:
+        return None
+    if claims.get("type") not in ("student", "admin"):
+        return None
+    return pseudonym(claims["type"], claims.get("sub"), day)
+
+
+class CaptureWriter:
+    """Background thread appending captured records to a gzip JSON-lines file."""
+
+    def __init__(self, directory: str = None, queue_size: int = None):
+        self.directory = directory or settings.CAPTURE_DIR
+        self.path = None
+        # Pseudonyms are keyed on the day the capture started, so one file never splits a principal at midnight
+        self.day = date.today().isoformat()
+        self._queue = queue.Queue(maxsize=queue_size or settings.CAPTURE_QUEUE_SIZE)
+        self._thread = None
+        self.dropped = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.day = date.today().isoformat()
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.directory, f"capture-{stamp}-{os.getpid()}.jsonl.gz")
+        self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict) -> None:
+        """Queue a record; never blocks the request. Dropped and counted if the queue is full."""
+        if self._thread is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        """Flush queued records and close the file."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            if self.dropped:
+                logger.warning("Dropped capture records while the queue was full", extra={"dropped": self.dropped})
+
+    def _run(self) -> None:
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                batch = [record]
+                # Drain whatever else is waiting so bursts become one write
+                while record is not None and len(batch) < 1000:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(record)
+                lines = [json.dumps(r, separators=(",", ":"), default=str) for r in batch if r is not None]
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                if batch[-1] is None:
+                    return
+
+
+writer = CaptureWriter()
+
+
+class CaptureMiddleware:
+    """ASGI middleware feeding API requests to the capture writer."""
+
+    def __init__(self, app, capture_writer: CaptureWriter = None):
+        self.app = app
+        self.writer = capture_writer or writer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(_UNCAPTURED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        started = time.perf_counter()
+        body = bytearray()
+        body_truncated = False
+        response = {"status": 500, "body": bytearray()}
+        headers = dict(scope["headers"])
+
+        async def receive_wrapper():
+            nonlocal body_truncated
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                if len(body) + len(chunk) <= settings.CAPTURE_MAX_BODY_BYTES:
+                    body.extend(chunk)
+                else:
+                    body_truncated = True
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body" and scope.get("route") is not None \
+                    and scope["route"].path in _LOGIN_ROUTES:
+                response["body"].extend(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            self.writer.write(self._record(scope, headers, arrived, started, body, body_truncated, response))
+
+    def _record(self, scope, headers, arrived, started, body, body_truncated, response) -> dict:
+        route = scope.get("route")
+        template = route.path if route is not None else scope["path"]
+        status = response["status"]
+        day = self.writer.day
+
+        who = principal_from_headers(headers, day)
+        parsed = None
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        if body and not body_truncated and content_type.startswith("application/json"):
+            try:
+                parsed = json.loads(body)
+            except ValueError:
+                parsed = None
+
+        if template in _LOGIN_ROUTES and isinstance(parsed, dict):
+            # A successful login's response says whose token later requests carry
+            who = self._login_principal(template, parsed, response["body"], status, day)
+        if template == _MARK_ROUTE and isinstance(parsed, dict) and "token" in parsed:
+            # 200 (marked) and 400 (already marked) both mean the token was accepted
+            parsed["token"] = VALID_TOKEN if status in (200, 400) else INVALID_TOKEN
+
+        if who is None and scope.get("client"):
+            who = pseudonym("conn", f"{scope['client'][0]}:{scope['client'][1]}", day)
+
+        record = {
+            "t": round(arrived, 3),
+            "m": scope["method"],
+            "r": template,
+            "p": {key: str(value) for key, value in (scope.get("path_params") or {}).items()},
+            "q": scope.get("query_string", b"").decode("latin-1"),
+            "who": who,
+            "s": status,
+            "d": round((time.perf_counter() - started) * 1000, 2),
+        }
+        if headers.get(b"x-course"):
+            record["course"] = headers[b"x-course"].decode("latin-1")
+        if parsed is not None:
+            record["b"] = anonymize(parsed, day)
+        elif body or body_truncated:
+            record["body_bytes"] = len(body) if not body_truncated else None
+            record["ct"] = content_type.split(";")[0]
+        return record
+
+    @staticmethod
+    def _login_principal(template: str, request_body: dict, response_body: bytearray, status: int,
+                         day: str) -> str:
+        if template == "/api/admin/login":
+            return pseudonym("admin", request_body.get("username"), day)
+        if status == 200:
+            try:
+                student_id = json.loads(response_body)["user_info"]["id"]
+                return pseudonym("student", student_id, day)
+            except (ValueError, KeyError, TypeError):
+                pass
+        # Failed logins are grouped by the UIN that was tried
+        return pseudonym("uin", request_body.get("uin"), day)
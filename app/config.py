@@ -1,6 +1,7 @@
 """
 Configuration management using environment variables.
 """
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -19,10 +20,120 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./attendance.db"
-    
+
+    # SQLite performance profile: legacy, balanced, throughput or durable
+    DB_PROFILE: str = "balanced"
+    # Optional per-PRAGMA overrides of the selected profile
+    SQLITE_JOURNAL_MODE: Optional[str] = None
+    SQLITE_SYNCHRONOUS: Optional[str] = None
+    SQLITE_BUSY_TIMEOUT_MS: Optional[int] = None
+    SQLITE_CACHE_SIZE: Optional[int] = None
+    SQLITE_MMAP_SIZE: Optional[int] = None
+    SQLITE_TEMP_STORE: Optional[str] = None
+
+    # Connection pool (server databases such as PostgreSQL)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WARMUP: int = 4  # Connections opened at startup
+
+    # Optional read replica for analytic reads, e.g. a read-only SQLite URI
+    # (sqlite:///file:./attendance.db?mode=ro&uri=true) or a replica URL
+    READ_DATABASE_URL: Optional[str] = None
+    # After a write, that user's reads stay on the writer for this long
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+
+    # Per-course databases, e.g. {"CSCE-439": "sqlite:///./csce439.db"}.
+    # Courses not listed here share DATABASE_URL.
+    COURSE_DATABASE_URLS: Dict[str, str] = {}
+    DEFAULT_COURSE: Optional[str] = None
+
+    # Expired token maintenance
+    TOKEN_SWEEP_INTERVAL_SECONDS: int = 60  # 0 disables the background sweeper
+    TOKEN_ARCHIVE_AFTER_DAYS: int = 7  # Expired tokens older than this are archived
+
+    # Cache backend for cross-request coordination state
+    # memory (per worker) or sqlite (shared by the workers on a host). Unset: sqlite when
+    # run.py starts several workers, else memory.
+    CACHE_BACKEND: Optional[str] = None
+    CACHE_SQLITE_PATH: str = "cache.db"
+
+    # Idempotency-Key support on marking, token generation and session creation
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_SECONDS: int = 600  # How long a completed response answers retries
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 65536  # Larger responses are not stored
+
+    # Brute-force protection for session tokens: wrong tokens per student and session,
+    # then lockouts that double with each further offence
+    MARK_ATTEMPT_LIMIT: int = 5
+    MARK_ATTEMPT_WINDOW_SECONDS: int = 300  # Matches a token's lifetime
+    MARK_LOCKOUT_BASE_SECONDS: int = 30
+    MARK_LOCKOUT_MAX_SECONDS: int = 3600
+
+    # Admission control: critical requests (marking, logins, token generation)
+    # keep reserved capacity; analytics and other requests queue or get 503
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENCY: int = 40  # Matches the default threadpool size
+    ADMISSION_CRITICAL_RESERVED: int = 10
+    ADMISSION_ANALYTICS_CONCURRENCY: int = 2
+    ADMISSION_ANALYTICS_QUEUE_SIZE: int = 4
+    ADMISSION_QUEUE_SIZE: int = 100
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 5
+
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED: bool = True
+
+    # Query profiler: slow-query log with plans, N+1 detection, per-route query budgets
+    QUERY_PROFILER_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 100.0
+    N_PLUS_ONE_THRESHOLD: int = 10  # Same statement shape more often than this in one request
+    QUERY_BUDGET_STRICT: bool = False  # Raise instead of log (for tests and CI)
+    QUERY_BUDGET_DEFAULT: int = 25
+    QUERY_BUDGETS: Dict[str, int] = {}  # Route template -> budget, e.g. {"/api/admin/dashboard": 10}
+
+    # Structured logging through a queue and a background writer thread
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json or text
+    LOG_FILE: str = ""  # Empty logs to stdout; with several workers use "{pid}", e.g. logs/app-{pid}.jsonl
+    LOG_MAX_BYTES: int = 50 * 1024 * 1024  # Rotate LOG_FILE at this size
+    LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000  # Records waiting to be written; more are dropped, never waited on
+    LOG_BATCH_SIZE: int = 500
+    LOG_FLUSH_INTERVAL_MS: float = 50.0  # Collect records this long before a write
+    ACCESS_LOG_ENABLED: bool = True
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0  # Share of successful requests logged; errors always are
+    LOG_SLOW_REQUEST_MS: float = 1000.0  # Requests this slow are always logged
+
+    # On-demand sampling profiler at /api/admin/debug/profile
+    PROFILER_MAX_SESSIONS: int = 1  # Concurrent profiles per worker; more get 429
+    PROFILER_MAX_SECONDS: float = 60.0
+    PROFILER_INTERVAL_MS: float = 10.0  # Time between stack samples
+
+    # In-process request tracing, browsable at /api/admin/debug/traces
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.01  # Share of requests traced (plus any arriving with a sampled traceparent)
+    TRACE_BUFFER_SIZE: int = 500  # Finished traces kept per worker
+    TRACE_EXPORT_DIR: str = "traces"  # Where OTLP/JSON exports are written
+
+    # Opt-in capture of anonymized API traffic for replay (benchmarks/replay.py)
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_DIR: str = "captures"
+    CAPTURE_MAX_BODY_BYTES: int = 65536  # Larger bodies (CSV uploads) are recorded by size only
+    CAPTURE_QUEUE_SIZE: int = 10000  # Records waiting for the writer; more are dropped and counted
+
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    SERVER_MODE: str = "development"  # development (one process, auto-reload) or production
+    WORKERS: int = 0  # Production worker processes; 0 sizes to the available CPU cores
+    WORKER_MAX_REQUESTS: int = 10000  # Recycle a worker after this many requests (0 disables)
+    WORKER_MAX_REQUESTS_JITTER: int = 1000  # Spread recycling so workers don't restart together
+    WORKER_GRACEFUL_TIMEOUT: int = 30  # Seconds a worker may drain before being killed
+    KEEPALIVE_TIMEOUT: int = 5  # Seconds an idle keep-alive connection stays open
+    BACKLOG: int = 2048  # Pending connections queued by the listening socket
     
     # Attendance Settings
     ATTENDANCE_START_HOUR: int = 8
@@ -1,27 +1,371 @@
 """
 Database configuration and session management.
 """
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session as OrmSession, sessionmaker
+from sqlalchemy.pool import QueuePool
+from .cache import get_cache
 from .config import settings
+from .metrics import record_pool_wait
+from . import tracing
+
+# SQLite performance profiles, applied as PRAGMAs on every new connection.
+# "legacy" keeps SQLite's built-in defaults (rollback journal, no busy timeout).
+SQLITE_PROFILES = {
+    "legacy": {},
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,  # Negative values are KiB: ~16 MB page cache
+        "temp_store": "MEMORY",
+    },
+    "throughput": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 10000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,  # 256 MB memory-mapped I/O
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 10000,
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def sqlite_pragmas(profile: str = None) -> dict:
+    """
+    Resolve the PRAGMAs for a SQLite profile, applying per-setting overrides.
+
+    Args:
+        profile: Profile name (defaults to settings.DB_PROFILE)
+
+    Returns:
+        Mapping of PRAGMA name to value
+    """
+    profile = profile or settings.DB_PROFILE
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(
+            f"Unknown DB_PROFILE '{profile}'. Choose one of: {', '.join(SQLITE_PROFILES)}"
+        )
+
+    pragmas = dict(SQLITE_PROFILES[profile])
+    overrides = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+    }
+    pragmas.update({name: value for name, value in overrides.items() if value is not None})
+    return pragmas
+
+
+# PRAGMAs that only matter to writers. journal_mode=WAL writes to the file
+# unless it is already in WAL mode, so read-only connections skip these.
+WRITER_PRAGMAS = {"journal_mode", "synchronous"}
+
+
+def is_read_only_sqlite(url: str) -> bool:
+    """True for SQLite URI filenames opened read-only (mode=ro or immutable=1)."""
+    query = url.partition("?")[2]
+    params = dict(pair.partition("=")[::2] for pair in query.split("&") if pair)
+    return params.get("mode") == "ro" or params.get("immutable") == "1"
+
+
+def normalize_database_url(url: str) -> str:
+    """Accept the postgres:// scheme used by Render/Heroku style URLs."""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            with tracing.span("db.checkout"):
+                return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - started)
+
+
+# SQLAlchemy logs pools under their class's module; keep ours at SQLAlchemy's default level
+logging.getLogger(f"{__name__}.{TimedQueuePool.__name__}").setLevel(logging.WARNING)
+
+
+def create_db_engine(url: str = None, profile: str = None):
+    """
+    Create a database engine with the configured performance profile.
+
+    Args:
+        url: Database URL (defaults to settings.DATABASE_URL)
+        profile: SQLite profile name (defaults to settings.DB_PROFILE)
+
+    Returns:
+        SQLAlchemy engine
+    """
+    url = normalize_database_url(url or settings.DATABASE_URL)
+
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            poolclass=TimedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+
+    pool_kwargs = {} if ":memory:" in url else {"poolclass": TimedQueuePool}
+    db_engine = create_engine(url, connect_args={"check_same_thread": False}, **pool_kwargs)
+    pragmas = sqlite_pragmas(profile)
+    if is_read_only_sqlite(url):
+        pragmas = {name: value for name, value in pragmas.items() if name not in WRITER_PRAGMAS}
+
+    @event.listens_for(db_engine, "connect")
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        """Apply the profile PRAGMAs to each new SQLite connection."""
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return db_engine
+
+
+def warm_pool(db_engine, connections: int = None) -> int:
+    """
+    Open pool connections ahead of the first request.
+
+    Connections are checked out concurrently so they are all held at once
+    (otherwise the pool would hand back the same connection each time).
+
+    Args:
+        db_engine: Engine whose pool should be warmed
+        connections: Number of connections (defaults to settings.DB_POOL_WARMUP)
+
+    Returns:
+        Number of connections opened
+    """
+    connections = settings.DB_POOL_WARMUP if connections is None else connections
+    pool_size = getattr(db_engine.pool, "size", None)
+    if pool_size is not None:
+        # Never hold more than the steady-state pool keeps
+        connections = min(connections, pool_size())
+    if connections <= 0:
+        return 0
+
+    checked_out = []
+
+    def checkout(_):
+        conn = db_engine.connect()
+        conn.execute(text("SELECT 1"))
+        checked_out.append(conn)
+
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(checkout, range(connections)))
+    finally:
+        for conn in checked_out:
+            conn.close()
+
+    return len(checked_out)
+
 
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+engine = create_db_engine()
+
+# Read engine for analytic queries (falls back to the writer)
+read_engine = create_db_engine(settings.READ_DATABASE_URL) if settings.READ_DATABASE_URL else engine
+
+# Per-course shard engines, created on first use
+_course_engines = {}
+_course_engines_lock = threading.Lock()
+
+
+def engine_for_course(course: Optional[str], read_only: bool = False):
+    """
+    Return the engine holding a course's data.
+
+    Courses listed in settings.COURSE_DATABASE_URLS get their own database;
+    everything else lives in the default database.
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Args:
+        course: Course code, e.g. "CSCE-439" (None for the default database)
+        read_only: Prefer the read engine for the default database
+
+    Returns:
+        SQLAlchemy engine
+    """
+    url = settings.COURSE_DATABASE_URLS.get(course) if course else None
+    if url is None:
+        return read_engine if read_only else engine
+
+    db_engine = _course_engines.get(course)
+    if db_engine is None:
+        with _course_engines_lock:
+            db_engine = _course_engines.get(course)
+            if db_engine is None:
+                db_engine = _course_engines[course] = create_db_engine(url)
+    return db_engine
+
+
+def course_keys() -> List[Optional[str]]:
+    """Return every routed database key: None (default) plus each sharded course."""
+    return [None] + list(settings.COURSE_DATABASE_URLS)
+
+
+def routed_engines() -> list:
+    """Return the default engine followed by every course shard engine."""
+    return [engine_for_course(course) for course in course_keys()]
+
+
+def dispose_engines() -> None:
+    """Close every pooled connection: writer, read engine and course shards."""
+    engines = routed_engines() + [read_engine]
+    for db_engine in {id(db_engine): db_engine for db_engine in engines}.values():
+        db_engine.dispose()
+
+
+class CourseSession(OrmSession):
+    """Session that resolves its engine from info["course"] on every statement."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        return engine_for_course(self.info.get("course"), self.info.get("read_only", False))
+
+
+# Create session factories
+SessionLocal = sessionmaker(class_=CourseSession, autocommit=False, autoflush=False)
+ReadSessionLocal = sessionmaker(
+    class_=CourseSession, autocommit=False, autoflush=False, info={"read_only": True}
+)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
+def resolve_course(request: Request) -> Optional[str]:
+    """
+    Work out which course a request belongs to.
+
+    Student tokens carry their course as a claim and are never re-routed by
+    headers, since student ids are only unique within one course database.
+    Admins and anonymous callers pick a course with the X-Course header or
+    the ``course`` query parameter. The token signature is verified by the
+    auth dependencies; routing only needs the claims.
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.startswith("Bearer "):
+        try:
+            claims = jwt.get_unverified_claims(authorization[len("Bearer "):])
+        except JWTError:
+            claims = {}
+        if claims.get("type") == "student":
+            return claims.get("course") or settings.DEFAULT_COURSE
+
+    course = request.headers.get("x-course") or request.query_params.get("course")
+    if not course:
+        return settings.DEFAULT_COURSE
+    if settings.COURSE_DATABASE_URLS and course not in settings.COURSE_DATABASE_URLS:
+        raise HTTPException(status_code=404, detail=f"Unknown course '{course}'")
+    return course
+
+
+def use_course(db: OrmSession, course: Optional[str]) -> None:
+    """Point a session at another course database, releasing any open transaction."""
+    db.close()
+    db.info["course"] = course
+
+
+def find_course_for_uin(uin: str) -> Optional[str]:
+    """
+    Search the course shards for a student UIN.
+
+    Returns:
+        The course whose database holds the student, or None
+    """
+    from .models import Student
+
+    for course in settings.COURSE_DATABASE_URLS:
+        db = SessionLocal(info={"course": course})
+        try:
+            if db.query(Student.id).filter(Student.uin == uin).first():
+                return course
+        finally:
+            db.close()
+    return None
+
+
+def get_db(request: Request):
     """Dependency to get database session."""
-    db = SessionLocal()
+    db = SessionLocal(info={"course": resolve_course(request)})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request):
+    """Dependency to get a session for read-only endpoints."""
+    db = ReadSessionLocal(info={"course": resolve_course(request)})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _recent_write_key(course: Optional[str], principal: str) -> str:
+    # Student ids repeat across course databases, so the course is part of the identity
+    return f"recent-write:{course or ''}:{principal}"
+
+
+def record_write(db: OrmSession, principal: str) -> None:
+    """
+    Remember that principal just wrote, so its reads stay on the writer.
+
+    Args:
+        db: Session the write went through (its course database is remembered)
+        principal: Identity of the writer, e.g. "student:42"
+    """
+    if read_engine is not engine:
+        get_cache().set(_recent_write_key(db.info.get("course"), principal), True,
+                        settings.READ_YOUR_WRITES_SECONDS)
+
+
+def read_db_for(request: Request, principal: str):
+    """
+    Yield a read session with read-your-writes protection for principal.
+
+    Args:
+        request: Incoming request (selects the course database)
+        principal: Identity of the reader, e.g. "student:42"
+    """
+    course = resolve_course(request)
+    factory = ReadSessionLocal
+    if read_engine is not engine and get_cache().get(_recent_write_key(course, principal)):
+        factory = SessionLocal
+
+    db = factory(info={"course": course})
     try:
         yield db
     finally:
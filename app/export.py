@@ -0,0 +1,76 @@
+"""
+Excel export of attendance reports.
+
+pandas and openpyxl are imported inside the functions that need them, so
+web workers only pay their import time and memory when an export runs.
+"""
+from typing import Dict, List
+
+
+def _autosize_columns(worksheet):
+    """Widen each column to fit its longest value."""
+    for column in worksheet.columns:
+        max_length = 0
+        column = [cell for cell in column]
+        for cell in column:
+            try:
+                if len(str(cell.value)) > max_length:
+                    max_length = len(str(cell.value))
+            except:
+                pass
+        adjusted_width = (max_length + 2)
+        worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+
+
+def write_excel(rows: List[Dict], columns: Dict[str, str], filename: str,
+                sheet_name: str = "Attendance Report") -> str:
+    """
+    Write rows to an Excel sheet with readable headers and sized columns.
+    
+    Args:
+        rows: List of dicts, one per spreadsheet row
+        columns: Mapping of row key to column header, in output order
+        filename: Output filename
+        sheet_name: Worksheet name
+        
+    Returns:
+        Path to the generated Excel file
+    """
+    import pandas as pd
+    
+    df = pd.DataFrame(rows, columns=list(columns))
+    df.columns = list(columns.values())
+    
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name=sheet_name, index=False)
+        _autosize_columns(writer.sheets[sheet_name])
+    
+    return filename
+
+
+# Columns of the admin attendance report, in output order
+ATTENDANCE_REPORT_COLUMNS = {
+    "uin": "UIN",
+    "name": "Name",
+    "total_sessions": "Total Sessions (All)",
+    "total_regular_sessions": "Regular Sessions",
+    "attended_all": "Attended (All)",
+    "attended_regular": "Attended (Regular)",
+    "attended_test": "Attended (Test)",
+    "attendance_percentage": "Attendance % (Regular)",
+    "grade_points": "Grade Points",
+}
+
+
+def write_attendance_report(attendance_data: List[Dict], filename: str) -> str:
+    """
+    Write the admin attendance report (all/regular/test breakdown with grades).
+    
+    Args:
+        attendance_data: List of dicts keyed by ATTENDANCE_REPORT_COLUMNS
+        filename: Output filename
+        
+    Returns:
+        Path to the generated Excel file
+    """
+    return write_excel(attendance_data, ATTENDANCE_REPORT_COLUMNS, filename)
@@ -0,0 +1,163 @@
+"""
+Idempotency-Key support for POST endpoints that create or record things.
+
+A client that may retry (a student on flaky Wi-Fi resubmitting
+attendance, a script creating sessions) sends the same Idempotency-Key
+header with each attempt. The first completed response is stored in the
+cache for settings.IDEMPOTENCY_TTL_SECONDS. A retry with the same key is
+answered from the store without touching authentication, admission or
+the database, and is marked with an "Idempotent-Replayed: true" header.
+Retries often reach another worker, so this relies on a shared
+CACHE_BACKEND ("sqlite", which run.py picks for multi-worker servers
+unless told otherwise).
+
+Stored responses are keyed by the caller's Authorization header, the path
+and the key, so one client can never see another's response. Reusing a
+key with a different body is a client bug and gets 422. A retry that
+arrives while the first attempt is still running gets 409 with
+Retry-After, since the outcome is not known yet.
+
+Server errors (5xx), 409 and 429 are not stored: they are transient, and
+a retry should be allowed to succeed.
+"""
+import hashlib
+import json
+import re
+
+from starlette.concurrency import run_in_threadpool
+
+from .cache import MemoryCache, get_cache
+from .config import settings
+
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(pattern))
+    for pattern in (
+        r"^/api/student/attendance/mark$",
+        r"^/api/admin/tokens/generate$",
+        r"^/api/admin/sessions/create-test$",
+        r"^/api/admin/sessions/create-regular$",
+    )
+]
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# How long a first attempt may run before a retry is allowed to take over
+IN_FLIGHT_SECONDS = 30
+_UNSTORED_STATUSES = {409, 429}
+
+
+def applies(method: str, path: str) -> bool:
+    return any(method == route_method and pattern.match(path) for route_method, pattern in IDEMPOTENT_ROUTES)
+
+
+async def _cache_call(func, *args):
+    """Run a cache operation, off the event loop unless the cache is in-process."""
+    if isinstance(get_cache(), MemoryCache):
+        return func(*args)
+    return await run_in_threadpool(func, *args)
+
+
+async def _send_json(send, status: int, detail: str, extra_headers: list = ()) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    *extra_headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware answering retried requests from the stored first response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not applies(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+            return
+
+        # Read the whole body up front: its hash tells a retry from a reused key
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return  # Client disconnected
+            body.extend(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body_hash = hashlib.sha256(body).hexdigest()
+
+        caller = hashlib.sha256(headers.get(b"authorization", b"")).hexdigest()[:32]
+        store_key = f"idempotency:{caller}:{scope['path']}:{key.decode('latin-1')}"
+        cache = get_cache()
+
+        stored = await _cache_call(cache.get, store_key)
+        if stored is not None:
+            await self._replay(send, stored, body_hash)
+            return
+
+        lock_key = store_key + ":in-flight"
+        if await _cache_call(cache.incr, lock_key, IN_FLIGHT_SECONDS) > 1:
+            # Maybe the first attempt finished between the two lookups
+            stored = await _cache_call(cache.get, store_key)
+            if stored is not None:
+                await self._replay(send, stored, body_hash)
+            else:
+                await _send_json(send, 409, "A request with this Idempotency-Key is still being processed",
+                                 [(b"retry-after", b"1")])
+            return
+
+        response = {"status": 500, "headers": [], "body": bytearray()}
+        sent_body = False
+
+        async def replay_receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": bytes(body), "more_body": False}
+            return await receive()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].extend(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            status = response["status"]
+            if status < 500 and status not in _UNSTORED_STATUSES \
+                    and len(response["body"]) <= settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                await _cache_call(cache.set, store_key, {
+                    "body_hash": body_hash,
+                    "status": status,
+                    "headers": [(name, value) for name, value in response["headers"] if name != b"traceparent"],
+                    "body": bytes(response["body"]),
+                }, settings.IDEMPOTENCY_TTL_SECONDS)
+            await _cache_call(cache.delete, lock_key)
+
+    @staticmethod
+    async def _replay(send, stored: dict, body_hash: str) -> None:
+        if stored["body_hash"] != body_hash:
+            await _send_json(send, 422, "Idempotency-Key was already used with a different request body")
+            return
+        await send({
+            "type": "http.response.start",
+            "status": stored["status"],
+            "headers": stored["headers"] + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": stored["body"]})
@@ -0,0 +1,167 @@
+"""
+Bulk ingestion of attendance records (paper or kiosk sign-in sheets).
+
+Records are resolved and deduplicated with a handful of set-based queries
+and inserted in batched transactions, instead of one /attendance/mark call
+per student.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import models
+
+BATCH_SIZE = 1000
+
+# Bound parameters per IN (...) lookup, well under SQLite's variable limit
+LOOKUP_CHUNK = 5000
+
+
+def parse_records(text: str, fmt: str) -> List[Dict]:
+    """
+    Parse sign-in records from CSV (uin,session_id,marked_at header) or JSON.
+    
+    Args:
+        text: File contents
+        fmt: "csv" or "json"
+        
+    Returns:
+        List of raw record dicts
+    """
+    if fmt == "json":
+        data = json.loads(text)
+        return data["records"] if isinstance(data, dict) else data
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def _normalize(record: Dict):
+    """Return (uin, session_id, marked_at) or raise ValueError."""
+    uin = str(record.get("uin") or "").strip()
+    if not uin:
+        raise ValueError("missing uin")
+    try:
+        session_id = int(record.get("session_id"))
+    except (TypeError, ValueError):
+        raise ValueError("invalid session_id")
+    
+    marked_at = record.get("marked_at")
+    if marked_at in (None, ""):
+        marked_at = datetime.utcnow()
+    elif not isinstance(marked_at, datetime):
+        try:
+            marked_at = datetime.fromisoformat(str(marked_at).strip())
+        except ValueError:
+            raise ValueError("invalid marked_at")
+    return uin, session_id, marked_at
+
+
+def _lookup(db, query, column, values):
+    """Yield query rows where column is in values, LOOKUP_CHUNK values at a time."""
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        yield from query.filter(column.in_(values[start:start + LOOKUP_CHUNK]))
+
+
+def _insert_statement(dialect_name: str):
+    """INSERT that skips rows violating unique_student_session and returns the rows it kept."""
+    table = models.Attendance.__table__
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(table).on_conflict_do_nothing()
+    elif dialect_name == "postgresql":
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    else:
+        return table.insert()
+    # Skipped rows return nothing, so the caller can tell which rows went in
+    return statement.returning(table.c.student_id, table.c.session_id)
+
+
+def ingest_attendance(db, records: Iterable[Dict], batch_size: int = BATCH_SIZE) -> Dict:
+    """
+    Insert attendance records in bulk and report an outcome for every row.
+    
+    Outcomes: inserted, duplicate (already marked, repeated in the batch or
+    marked concurrently while the batch was inserted), unknown_uin,
+    unknown_session and invalid.
+    
+    Args:
+        db: Session routed to the course database
+        records: Dicts with uin, session_id and optional marked_at
+        batch_size: Rows per insert transaction
+        
+    Returns:
+        Dict with per-row "results" and counts per outcome
+    """
+    results = []
+    parsed = []
+    for index, record in enumerate(records):
+        try:
+            uin, session_id, marked_at = _normalize(record)
+        except ValueError as e:
+            results.append({"row": index, "uin": record.get("uin"),
+                            "session_id": record.get("session_id"),
+                            "status": "invalid", "detail": str(e)})
+            continue
+        result = {"row": index, "uin": uin, "session_id": session_id, "status": None}
+        results.append(result)
+        parsed.append((result, session_id, marked_at))
+    
+    # Resolve UINs and sessions with set-based lookups
+    student_ids = dict(_lookup(
+        db, db.query(models.Student.uin, models.Student.id), models.Student.uin,
+        {result["uin"] for result, _, _ in parsed}
+    ))
+    session_courses = dict(_lookup(
+        db, db.query(models.Session.id, models.Session.course), models.Session.id,
+        {session_id for _, session_id, _ in parsed}
+    ))
+    existing = {
+        (student_id, session_id) for student_id, session_id in _lookup(
+            db, db.query(models.Attendance.student_id, models.Attendance.session_id),
+            models.Attendance.session_id, session_courses.keys()
+        )
+    }
+    
+    rows = []
+    for result, session_id, marked_at in parsed:
+        student_id = student_ids.get(result["uin"])
+        if student_id is None:
+            result["status"] = "unknown_uin"
+        elif session_id not in session_courses:
+            result["status"] = "unknown_session"
+        elif (student_id, session_id) in existing:
+            result["status"] = "duplicate"
+        else:
+            existing.add((student_id, session_id))
+            result["status"] = "inserted"
+            rows.append((result, {
+                "student_id": student_id,
+                "session_id": session_id,
+                "marked_at": marked_at,
+                "course": session_courses[session_id]
+            }))
+    
+    # Conflicts with concurrent marks are skipped by the database
+    statement = _insert_statement(db.get_bind().dialect.name)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        outcome = db.connection().execute(statement, [row for _, row in batch])
+        if outcome.returns_rows:
+            inserted = set(outcome.tuples())
+            for result, row in batch:
+                if (row["student_id"], row["session_id"]) not in inserted:
+                    result["status"] = "duplicate"
+        db.commit()
+    
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    
+    return {
+        "total": len(results),
+        "counts": counts,
+        "results": results
+    }
@@ -0,0 +1,282 @@
+"""
+Structured, non-blocking logging.
+
+Every logger (the app's, uvicorn's and gunicorn's) hands records to a
+bounded in-memory queue. A background listener thread formats them as one
+JSON object per line and writes them in batches, so a request thread never
+formats, writes or flushes log output itself. If the queue is full the
+record is dropped and counted; logging never waits.
+
+Three streams share the pipeline:
+- "app.access": one line per HTTP request from AccessLogMiddleware.
+  Successful fast requests are sampled (LOG_ACCESS_SAMPLE_RATE); errors
+  and requests slower than LOG_SLOW_REQUEST_MS are always kept.
+- "app.audit": security-relevant events such as attendance.marked and
+  auth.failed. Never sampled.
+- everything else: warnings and errors from the app and the server.
+
+Output goes to stdout, or to LOG_FILE with size-based rotation. Rotation
+is per process; with several workers put "{pid}" in LOG_FILE.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from . import tracing
+from .config import settings
+from .utils import SKIPPED_PREFIXES
+
+access_logger = logging.getLogger("app.access")
+audit_logger = logging.getLogger("app.audit")
+
+# LogRecord attributes that are not caller-supplied fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "taskName", "color_message",
+}
+
+_listener: Optional["BatchingQueueListener"] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def audit(event: str, **fields) -> None:
+    """Record a security-relevant event, e.g. audit("auth.failed", kind="student", reason="bad_password")."""
+    audit_logger.info(event, extra=fields)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, logger, message and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener and drops records when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so the record needs no pickling-friendly copy; formatting happens on the listener.
+        # The trace id must be read here, in the thread that logged.
+        current = tracing.current_span()
+        if current is not None and not hasattr(record, "trace_id"):
+            record.trace_id = current.trace.trace_id
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """Writes a batch of lines with one write and one flush."""
+
+    def emit_batch(self, lines: list) -> None:
+        self.acquire()
+        try:
+            self.stream.write("".join(lines))
+            self.flush()
+        finally:
+            self.release()
+
+
+class BatchFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that writes a batch at once and rotates between batches."""
+
+    def emit_batch(self, lines: list) -> None:
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write("".join(lines))
+            self.stream.flush()
+            if self.maxBytes and self.stream.tell() >= self.maxBytes:
+                self.doRollover()
+        finally:
+            self.release()
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that drains records in batches of up to LOG_BATCH_SIZE."""
+
+    def __init__(self, log_queue, *handlers, batch_size: int = 500, flush_interval: float = 0.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def _monitor(self) -> None:
+        log_queue = self.queue
+        while True:
+            batch = [log_queue.get()]
+            stopping = batch[-1] is self._sentinel
+            deadline = time.monotonic() + self.flush_interval
+            # Take whatever else arrives within the flush interval, so a burst becomes one write
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    remaining = deadline - time.monotonic()
+                    record = log_queue.get(timeout=remaining) if remaining > 0 else log_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    batch.append(record)
+            records = [record for record in batch if record is not self._sentinel]
+            if records:
+                self.write(records)
+            if stopping:
+                return
+
+    def write(self, records: list) -> None:
+        for handler in self.handlers:
+            lines = []
+            for record in records:
+                if record.levelno < handler.level:
+                    continue
+                try:
+                    lines.append(handler.format(record) + "\n")
+                except Exception:
+                    handler.handleError(record)
+            if lines:
+                try:
+                    handler.emit_batch(lines)
+                except Exception:
+                    handler.handleError(records[-1])
+
+
+def _formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "text":
+        return logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return JsonFormatter()
+
+
+def _target():
+    if settings.LOG_FILE:
+        path = settings.LOG_FILE.replace("{pid}", str(os.getpid()))
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = BatchFileHandler(path, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT,
+                                   encoding="utf-8", delay=True)
+    else:
+        handler = BatchStreamHandler(sys.stdout)
+    handler.setFormatter(_formatter())
+    return handler
+
+
+def _route_server_loggers(handlers: list) -> None:
+    """Send uvicorn's and gunicorn's loggers through the root handlers."""
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "gunicorn.error", "gunicorn.access"):
+        server_logger = logging.getLogger(name)
+        server_logger.handlers = []
+        server_logger.propagate = True
+    if settings.ACCESS_LOG_ENABLED:
+        # AccessLogMiddleware replaces uvicorn's access lines
+        logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+    root = logging.getLogger()
+    root.handlers = handlers
+    root.setLevel(settings.LOG_LEVEL)
+
+
+def start() -> None:
+    """Route all logging through the queue and start the writer thread (once per worker process)."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = BatchingQueueListener(
+        log_queue, _target(),
+        batch_size=settings.LOG_BATCH_SIZE,
+        flush_interval=settings.LOG_FLUSH_INTERVAL_MS / 1000,
+    )
+    _listener.start()
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _route_server_loggers([_queue_handler])
+
+
+def stop() -> None:
+    """Flush queued records and fall back to direct writes for shutdown messages."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    dropped = _queue_handler.dropped
+    _listener = _queue_handler = None
+    fallback = logging.StreamHandler(sys.stdout)
+    fallback.setFormatter(_formatter())
+    _route_server_loggers([fallback])
+    if dropped:
+        logging.getLogger("app.logs").warning("Dropped log records while the queue was full", extra={"dropped": dropped})
+
+
+def dropped() -> int:
+    """Records dropped because the queue was full since start()."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+class AccessLogMiddleware:
+    """ASGI middleware writing one structured access line per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(SKIPPED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        response = {"status": 500, "traceparent": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name == b"traceparent":
+                        response["traceparent"] = value
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._log(scope, response, (time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    def _log(scope, response: dict, duration_ms: float) -> None:
+        status = response["status"]
+        if status < 400 and duration_ms < settings.LOG_SLOW_REQUEST_MS \
+                and random.random() >= settings.LOG_ACCESS_SAMPLE_RATE:
+            return
+        route = scope.get("route")
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route.path if route is not None else None,
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "client": scope["client"][0] if scope.get("client") else None,
+        }
+        if response["traceparent"]:
+            fields["trace_id"] = response["traceparent"].decode("latin-1").split("-")[1]
+        access_logger.info("http.access", extra=fields)
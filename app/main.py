@@ -1,26 +1,84 @@
 """
 Main FastAPI application.
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import engine, Base
+from . import capture, idempotency, logs, metrics, migrations, profiler, tracing
+from .admission import AdmissionMiddleware
+from .assets import PageCache, StaticAssets
+from .config import settings
+from .maintenance import TokenSweeper
+from .database import dispose_engines, routed_engines, warm_pool
 from .routers import admin, student
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bring schemas up to date, open database connections and start background maintenance."""
+    # In the worker, after the server has configured its own loggers
+    logs.start()
+    migrations.upgrade_all()
+    pages.render_all()
+    for db_engine in routed_engines():
+        warm_pool(db_engine)
+    sweeper = TokenSweeper()
+    sweeper.start()
+    if settings.CAPTURE_ENABLED:
+        capture.writer.start()
+    app.state.ready = True
+    yield
+    # Fail readiness first so load balancers stop routing here while we drain
+    app.state.ready = False
+    sweeper.stop()
+    capture.writer.stop()
+    dispose_engines()
+    logs.stop()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Attendance Wizard",
     description="Robust attendance tracking system with secure authentication",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=tracing.TracedJSONResponse
 )
+app.state.ready = False
+
+if settings.QUERY_PROFILER_ENABLED:
+    profiler.install_query_hooks()
+    app.add_middleware(profiler.QueryProfilerMiddleware)
+
+# Shed or queue requests before they take a thread or a connection
+app.add_middleware(AdmissionMiddleware)
+
+# Retries carrying an Idempotency-Key are answered before admission and the database
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(idempotency.IdempotencyMiddleware)
+
+# Root span per request, around admission so queueing shows up in traces
+if settings.TRACING_ENABLED:
+    tracing.install_hooks()
+    app.add_middleware(tracing.TracingMiddleware)
+
+# Record traffic as clients sent it, including requests that get shed
+if settings.CAPTURE_ENABLED:
+    app.add_middleware(capture.CaptureMiddleware)
+
+# Structured access log, covering shed requests
+if settings.ACCESS_LOG_ENABLED:
+    app.add_middleware(logs.AccessLogMiddleware)
 
-# CORS middleware
+# Around everything but CORS, so shed requests are measured too
+if settings.METRICS_ENABLED:
+    metrics.install_query_hooks()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# CORS middleware, registered last so it is outermost: 503s from admission
+# and 409s from idempotency reach cross-origin callers as retryable responses
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,9 +87,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files and templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+# Fingerprinted static files and pre-rendered templates
+assets = StaticAssets("static")
+pages = PageCache("templates", assets)
 
 # Include routers
 app.include_router(admin.router)
@@ -42,46 +100,52 @@ app.include_router(student.router)
 # Frontend Routes
 # ============================================================================
 
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], name="static", include_in_schema=False)
+async def static_files(request: Request, path: str):
+    """Static files (immutable when requested by their hashed name)."""
+    return assets.response(request, path)
+
+
 @app.get("/", response_class=HTMLResponse)
 async def student_login_page(request: Request):
     """Student login page."""
-    return templates.TemplateResponse("student_login.html", {"request": request})
+    return pages.response(request, "student_login.html")
 
 
 @app.get("/student/register", response_class=HTMLResponse)
 async def student_register_page(request: Request):
     """Student registration page."""
-    return templates.TemplateResponse("student_register.html", {"request": request})
+    return pages.response(request, "student_register.html")
 
 
 @app.get("/student/reset-password", response_class=HTMLResponse)
 async def student_reset_password_page(request: Request):
     """Student password reset page."""
-    return templates.TemplateResponse("student_reset_password.html", {"request": request})
+    return pages.response(request, "student_reset_password.html")
 
 
 @app.get("/student/guide", response_class=HTMLResponse)
 async def student_guide_page(request: Request):
     """Student user guide page."""
-    return templates.TemplateResponse("student_guide.html", {"request": request})
+    return pages.response(request, "student_guide.html")
 
 
 @app.get("/attendance", response_class=HTMLResponse)
 async def student_attendance_page(request: Request):
     """Student attendance marking page."""
-    return templates.TemplateResponse("student_attendance.html", {"request": request})
+    return pages.response(request, "student_attendance.html")
 
 
 @app.get("/admin/login", response_class=HTMLResponse)
 async def admin_login_page(request: Request):
     """Admin login page."""
-    return templates.TemplateResponse("admin_login.html", {"request": request})
+    return pages.response(request, "admin_login.html")
 
 
 @app.get("/admin/dashboard", response_class=HTMLResponse)
 async def admin_dashboard_page(request: Request):
     """Admin dashboard page."""
-    return templates.TemplateResponse("admin_dashboard.html", {"request": request})
+    return pages.response(request, "admin_dashboard.html")
 
 
 # ============================================================================
@@ -92,3 +156,19 @@ async def admin_dashboard_page(request: Request):
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "app": "Attendance Wizard"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup (migrations, pool warm-up) has finished."""
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("Metrics are disabled\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,125 @@
+"""
+Background maintenance for the session token table.
+
+Every generated token stays in session_tokens forever unless something
+removes it. The sweeper deactivates tokens once they expire and, after
+settings.TOKEN_ARCHIVE_AFTER_DAYS, moves them into session_tokens_archive
+(partitioned by month) so the hot table only holds recent tokens.
+Every worker runs a sweeper; the archive insert skips tokens that are
+already archived, so sweeps that overlap are harmless.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import String, cast, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .config import settings
+from .database import SessionLocal, course_keys
+
+logger = logging.getLogger("app.maintenance")
+
+
+def deactivate_expired_tokens(db, now: datetime) -> int:
+    """Flag every expired token as inactive in one UPDATE. Returns rows changed."""
+    return db.query(models.SessionToken).filter(
+        models.SessionToken.is_active == True,
+        models.SessionToken.expires_at < now
+    ).update({models.SessionToken.is_active: False}, synchronize_session=False)
+
+
+def _archive_insert(dialect_name: str):
+    """INSERT into the archive that skips tokens another worker archived first."""
+    table = models.SessionTokenArchive.__table__
+    if dialect_name == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect_name == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return table.insert()
+
+
+def archive_expired_tokens(db, now: datetime) -> int:
+    """
+    Move tokens that expired before the retention cutoff into the archive.
+
+    Returns:
+        Number of tokens archived
+    """
+    cutoff = now - timedelta(days=settings.TOKEN_ARCHIVE_AFTER_DAYS)
+    expired = models.SessionToken.expires_at < cutoff
+
+    archive_month = func.substr(cast(models.SessionToken.created_at, String), 1, 7)
+    db.execute(
+        _archive_insert(db.get_bind().dialect.name).from_select(
+            ["id", "session_id", "token", "expires_at", "created_at", "archive_month", "archived_at"],
+            select(
+                models.SessionToken.id,
+                models.SessionToken.session_id,
+                models.SessionToken.token,
+                models.SessionToken.expires_at,
+                models.SessionToken.created_at,
+                archive_month,
+                literal(now),
+            ).where(expired)
+        )
+    )
+    return db.query(models.SessionToken).filter(expired).delete(synchronize_session=False)
+
+
+def sweep_tokens(course: Optional[str] = None, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """
+    Deactivate and archive expired tokens in one course database.
+
+    Returns:
+        (tokens deactivated, tokens archived)
+    """
+    now = now or datetime.utcnow()
+    db = SessionLocal(info={"course": course})
+    try:
+        deactivated = deactivate_expired_tokens(db, now)
+        archived = archive_expired_tokens(db, now)
+        db.commit()
+        return deactivated, archived
+    except IntegrityError:
+        # Another worker archived the same tokens first (databases without ON CONFLICT)
+        db.rollback()
+        return 0, 0
+    finally:
+        db.close()
+
+
+class TokenSweeper:
+    """Daemon thread that sweeps every course database on an interval."""
+
+    def __init__(self, interval: float = None):
+        self.interval = settings.TOKEN_SWEEP_INTERVAL_SECONDS if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Start sweeping in the background (no-op when the interval is 0)."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="token-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and wait for the current sweep to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            for course in course_keys():
+                try:
+                    sweep_tokens(course)
+                except Exception:
+                    logger.exception("Token sweep failed", extra={"course": course or "default"})
+            if self._stop.wait(self.interval):
+                return
@@ -0,0 +1,286 @@
+"""
+Request and database metrics in the Prometheus text format.
+
+MetricsMiddleware times every HTTP request and labels it with the matched
+route template (e.g. /api/admin/tokens/history/{session_id}), so label
+cardinality stays bounded. SQLAlchemy cursor hooks count queries and query
+time into a per-request object held in a context variable. Context
+variables follow requests into the threadpool, so sync endpoints are
+counted too. Queries outside a request (the token sweeper, scripts) are
+not counted.
+
+All metric updates happen on the event loop thread, so they need no locks.
+With several workers, each process keeps its own numbers and a scrape
+reads whichever worker answers.
+"""
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from . import timing
+
+# Latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Queries per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+class RequestStats:
+    """Database work done on behalf of one request."""
+
+    __slots__ = ("queries", "db_seconds", "pool_checkouts", "pool_wait_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_checkouts = 0
+        self.pool_wait_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Return the stats object of the request being served, if any."""
+    return _request_stats.get()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Gauge(Counter):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def set(self, labels: Tuple, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series: Dict[Tuple, list] = {}  # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, labels: Tuple, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, bucket_label)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    """The process-wide set of metrics."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")))
+LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", LATENCY_BUCKETS, ("method", "route")))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "Database queries executed while serving requests.", ("route",)))
+DB_QUERIES_PER_REQUEST = registry.register(Histogram(
+    "db_queries_per_request", "Database queries per request.", QUERY_COUNT_BUCKETS, ("route",)))
+DB_SECONDS = registry.register(Histogram(
+    "db_time_per_request_seconds", "Time spent in database queries per request.", LATENCY_BUCKETS, ("route",)))
+POOL_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time per request spent waiting to check out pooled connections.", LATENCY_BUCKETS))
+# Sampled when /metrics is scraped
+THREADPOOL = registry.register(Gauge(
+    "threadpool_threads", "Worker threads for sync endpoints (limit, in use, waiting).", ("state",)))
+POOL = registry.register(Gauge(
+    "db_pool_connections", "Pooled database connections by state.", ("database", "state")))
+ADMISSION_ACTIVE = registry.register(Gauge(
+    "admission_active_requests", "Requests admitted and running, per lane.", ("lane",)))
+ADMISSION_QUEUE = registry.register(Gauge(
+    "admission_queue_depth", "Requests waiting for admission, per lane.", ("lane",)))
+ADMISSION_SHED = registry.register(Counter(
+    "admission_shed_total", "Requests rejected with 503, per lane.", ("lane",)))
+PROCESS = registry.register(Gauge(
+    "process_info", "Worker process serving this scrape.", ("pid",)))
+
+
+def route_label(scope) -> str:
+    """Route template of the matched endpoint, or a fixed label for unmatched paths."""
+    route = scope.get("route")
+    return route.path if route is not None else "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and database work per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        IN_FLIGHT.values[()] = IN_FLIGHT.values.get((), 0) + 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.values[()] -= 1
+            _request_stats.reset(token)
+
+            method, route = scope["method"], route_label(scope)
+            REQUESTS.inc((method, route, str(status_code)))
+            LATENCY.observe((method, route), elapsed)
+            if stats.queries:
+                DB_QUERIES.inc((route,), stats.queries)
+                DB_SECONDS.observe((route,), stats.db_seconds)
+            DB_QUERIES_PER_REQUEST.observe((route,), stats.queries)
+            if stats.pool_checkouts:
+                POOL_WAIT.observe((), stats.pool_wait_seconds)
+
+
+def record_pool_wait(seconds: float) -> None:
+    """Add a pool checkout wait to the current request (called from the checking-out thread)."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.pool_checkouts += 1
+        stats.pool_wait_seconds += seconds
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany, elapsed):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _query_error(context, exception, elapsed):
+    # A failed statement still cost the request a round trip
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def install_query_hooks() -> None:
+    """Count queries on every engine, including course shards created later."""
+    timing.register(after=_after_query, error=_query_error)
+
+
+def _sample_threadpool() -> None:
+    """Read the anyio limiter used by run_in_threadpool (must run on the event loop)."""
+    from anyio.to_thread import current_default_thread_limiter
+
+    limiter = current_default_thread_limiter()
+    THREADPOOL.set(("limit",), limiter.total_tokens)
+    THREADPOOL.set(("busy",), limiter.borrowed_tokens)
+    THREADPOOL.set(("waiting",), limiter.statistics().tasks_waiting)
+
+
+def _sample_pools() -> None:
+    from .database import course_keys, engine_for_course
+
+    for course in course_keys():
+        pool = engine_for_course(course).pool
+        database = course or "default"
+        if hasattr(pool, "size"):
+            POOL.set((database, "size"), pool.size())
+        if hasattr(pool, "checkedout"):
+            POOL.set((database, "checked_out"), pool.checkedout())
+        if hasattr(pool, "checkedin"):
+            POOL.set((database, "idle"), pool.checkedin())
+        if hasattr(pool, "overflow"):
+            POOL.set((database, "overflow"), max(pool.overflow(), 0))
+
+
+def _sample_admission() -> None:
+    from .admission import controller
+
+    for name, lane in controller.lanes.items():
+        ADMISSION_ACTIVE.set((name,), lane.active)
+        ADMISSION_QUEUE.set((name,), len(lane.waiters))
+        ADMISSION_SHED.values[(name,)] = lane.shed
+
+
+def render() -> str:
+    """Sample the point-in-time gauges and render every metric."""
+    _sample_threadpool()
+    _sample_pools()
+    _sample_admission()
+    PROCESS.set((str(os.getpid()),), 1)
+    return registry.render()
@@ -0,0 +1,183 @@
+"""
+Lightweight schema migrations.
+
+Migrations are plain functions applied in order against a connection. The
+applied version is stored in the ``schema_version`` table so existing
+databases are upgraded in place: new tables come from ``create_all`` and
+everything else (indexes, columns) from the migration steps below.
+
+A database already at ``HEAD_VERSION`` is left alone without any schema
+introspection, so any change to the tables (including a new model) must
+come with a migration step that bumps the version.
+"""
+from typing import Optional
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.exc import DBAPIError
+
+from .database import Base, course_keys, engine, engine_for_course
+
+# Version bookkeeping lives outside Base so create_all never touches it twice
+_meta = MetaData()
+schema_version = Table(
+    "schema_version",
+    _meta,
+    Column("version", Integer, nullable=False),
+)
+
+# Small key/value store for deployment bookkeeping (e.g. the seed fingerprint)
+app_state = Table(
+    "app_state",
+    _meta,
+    Column("key", String(64), primary_key=True),
+    Column("value", String, nullable=False),
+)
+
+
+def _hot_path_indexes(conn):
+    """
+    Composite indexes for the hottest queries.
+
+    EXPLAIN QUERY PLAN before this migration:
+      token check      SEARCH session_tokens USING INDEX ix_session_tokens_session_id
+      session roster   SEARCH attendances USING INDEX ix_attendances_session_id + TEMP B-TREE
+      recent marks     SCAN attendances + TEMP B-TREE FOR ORDER BY
+      token history    SCAN session_tokens + TEMP B-TREE FOR ORDER BY
+
+    (student_id, session_id) is already served by the unique_student_session
+    constraint index, so it needs no extra index.
+    """
+    statements = [
+        "CREATE INDEX IF NOT EXISTS ix_session_tokens_lookup "
+        "ON session_tokens (session_id, token, is_active, expires_at)",
+        "CREATE INDEX IF NOT EXISTS ix_session_tokens_created_at "
+        "ON session_tokens (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_attendances_session_marked_at "
+        "ON attendances (session_id, marked_at)",
+        "CREATE INDEX IF NOT EXISTS ix_attendances_marked_at "
+        "ON attendances (marked_at)",
+    ]
+    for statement in statements:
+        conn.exec_driver_sql(statement)
+
+
+def _course_columns(conn):
+    """Add the course dimension to students, sessions and attendances."""
+    inspector = inspect(conn)
+    for table in ("students", "sessions", "attendances"):
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "course" not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN course VARCHAR")
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_{table}_course ON {table} (course)")
+
+
+def _token_archive(conn):
+    """Cold storage for expired session tokens."""
+    from .models import SessionTokenArchive
+
+    SessionTokenArchive.__table__.create(conn, checkfirst=True)
+
+
+def _roster_sync_columns(conn):
+    """Per-student roster fingerprint and enrollment flag for incremental sync."""
+    columns = {column["name"] for column in inspect(conn).get_columns("students")}
+    if "roster_fingerprint" not in columns:
+        conn.exec_driver_sql("ALTER TABLE students ADD COLUMN roster_fingerprint VARCHAR(40)")
+    if "is_enrolled" not in columns:
+        conn.exec_driver_sql("ALTER TABLE students ADD COLUMN is_enrolled BOOLEAN DEFAULT TRUE")
+        conn.exec_driver_sql("UPDATE students SET is_enrolled = TRUE")
+
+
+def _app_state(conn):
+    """Key/value table for deployment bookkeeping."""
+    app_state.create(conn, checkfirst=True)
+
+
+# (version, description, function) in application order
+MIGRATIONS = [
+    (1, "Hot-path composite indexes", _hot_path_indexes),
+    (2, "Course columns", _course_columns),
+    (3, "Session token archive", _token_archive),
+    (4, "Roster sync columns", _roster_sync_columns),
+    (5, "Application state table", _app_state),
+]
+
+HEAD_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    """Return the applied schema version (0 for an unversioned database)."""
+    version = conn.execute(select(schema_version.c.version)).scalar()
+    return version or 0
+
+
+def stored_version(db_engine) -> Optional[int]:
+    """
+    Read the applied schema version with a single query.
+
+    Returns:
+        The stored version, or None when the database has no schema_version table yet
+    """
+    try:
+        with db_engine.connect() as conn:
+            return current_version(conn)
+    except DBAPIError:
+        return None
+
+
+def upgrade(db_engine=None) -> int:
+    """
+    Create missing tables and apply pending migrations.
+
+    Args:
+        db_engine: Engine to upgrade (defaults to the application engine)
+
+    Returns:
+        The schema version after upgrading
+    """
+    db_engine = db_engine or engine
+
+    # Steady state: one SELECT, no reflection or create_all
+    if stored_version(db_engine) == HEAD_VERSION:
+        return HEAD_VERSION
+
+    # Import models so every table is registered on Base
+    from . import models  # noqa: F401
+
+    Base.metadata.create_all(bind=db_engine)
+    _meta.create_all(bind=db_engine)
+
+    with db_engine.begin() as conn:
+        applied = current_version(conn)
+        version = applied
+        for migration_version, description, migrate in MIGRATIONS:
+            if migration_version > version:
+                migrate(conn)
+                version = migration_version
+
+        if version != applied:
+            conn.execute(schema_version.delete())
+            conn.execute(schema_version.insert().values(version=version))
+
+    return version
+
+
+def upgrade_all() -> dict:
+    """
+    Upgrade the default database and every course shard.
+
+    Returns:
+        Mapping of course (None for the default database) to schema version
+    """
+    return {course: upgrade(engine_for_course(course)) for course in course_keys()}
+
+
+def get_state(conn, key: str) -> Optional[str]:
+    """Read a value from the app_state table."""
+    return conn.execute(select(app_state.c.value).where(app_state.c.key == key)).scalar()
+
+
+def set_state(conn, key: str, value: str) -> None:
+    """Write a value to the app_state table."""
+    conn.execute(app_state.delete().where(app_state.c.key == key))
+    conn.execute(app_state.insert().values(key=key, value=value))
@@ -1,7 +1,7 @@
 """
 SQLAlchemy database models.
 """
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -16,6 +16,9 @@ class Student(Base):
     name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_registered = Column(Boolean, default=False)  # True after student sets password
+    course = Column(String, index=True)  # Course code, e.g. "CSCE-439"
+    roster_fingerprint = Column(String(40))  # Hash of the last synced roster row
+    is_enrolled = Column(Boolean, default=True)  # False once dropped from the roster
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -29,6 +32,7 @@ class Session(Base):
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False, index=True)
     is_test_session = Column(Boolean, default=False)
+    course = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -49,6 +53,30 @@ class SessionToken(Base):
     
     # Relationships
     session = relationship("Session", back_populates="tokens")
+    
+    # Hot-path indexes (see app/migrations.py)
+    __table_args__ = (
+        Index('ix_session_tokens_lookup', 'session_id', 'token', 'is_active', 'expires_at'),
+        Index('ix_session_tokens_created_at', 'created_at'),
+    )
+
+
+class SessionTokenArchive(Base):
+    """Expired session tokens moved out of the hot table, partitioned by month."""
+    __tablename__ = "session_tokens_archive"
+    
+    id = Column(Integer, primary_key=True)  # Original session_tokens.id
+    session_id = Column(Integer, nullable=False)
+    token = Column(String(6), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    archive_month = Column(String(7), nullable=False)  # "YYYY-MM" of created_at
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_session_tokens_archive_month', 'archive_month'),
+        Index('ix_session_tokens_archive_session', 'session_id', 'created_at'),
+    )
 
 
 class Attendance(Base):
@@ -59,14 +87,17 @@ class Attendance(Base):
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False, index=True)
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False, index=True)
     marked_at = Column(DateTime, default=datetime.utcnow)
+    course = Column(String, index=True)
     
     # Relationships
     student = relationship("Student", back_populates="attendances")
     session = relationship("Session", back_populates="attendances")
     
-    # Prevent duplicate attendance
+    # Prevent duplicate attendance (also serves (student_id, session_id) lookups)
     __table_args__ = (
         UniqueConstraint('student_id', 'session_id', name='unique_student_session'),
+        Index('ix_attendances_session_marked_at', 'session_id', 'marked_at'),
+        Index('ix_attendances_marked_at', 'marked_at'),
     )
 
 
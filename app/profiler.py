@@ -0,0 +1,146 @@
+"""
+Query profiler: slow-query log, N+1 detection and per-route query budgets.
+
+The shared statement timing hooks (app/timing.py) watch every statement
+issued while a request is being served:
+
+* statements slower than settings.SLOW_QUERY_MS are logged together with
+  their EXPLAIN QUERY PLAN (EXPLAIN on PostgreSQL), captured on the same
+  connection with the same parameters (which are never logged);
+* a request that runs one statement shape more than
+  settings.N_PLUS_ONE_THRESHOLD times is logged as a likely N+1;
+* with settings.QUERY_BUDGET_STRICT, going over the route's query budget
+  (QUERY_BUDGETS, else QUERY_BUDGET_DEFAULT) or tripping the N+1 detector
+  raises QueryBudgetExceeded from the offending query. The request then
+  fails loudly and the traceback points at the loop issuing the queries.
+"""
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from . import timing
+from .config import settings
+
+logger = logging.getLogger("app.profiler")
+
+# Collapse IN-lists and whitespace so "IN (?, ?, ?)" and "IN (?)" share a shape
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\([^)]*\)s|%s|:\w+)\s*,)+\s*(?:\?|%\([^)]*\)s|%s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """A request issued more queries than its budget allows (strict mode only)."""
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so repeated executions with different parameters match."""
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("(?)", statement)).strip()
+
+
+class QueryLog:
+    """Statements issued by one request."""
+
+    __slots__ = ("scope", "total", "shapes", "flagged")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.total = 0
+        self.shapes = Counter()
+        self.flagged = set()
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route is not None else self.scope.get("path", "")
+
+
+_query_log: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+
+def query_budget(route: str) -> int:
+    """Maximum queries allowed for a route template."""
+    return settings.QUERY_BUDGETS.get(route, settings.QUERY_BUDGET_DEFAULT)
+
+
+def explain(conn, statement: str, parameters) -> str:
+    """
+    Capture the query plan of a statement through a raw DBAPI cursor.
+
+    Returns:
+        The plan as text, or an explanation of why it is unavailable
+    """
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return "(no plan: not a SELECT)"
+
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" | ".join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as exc:  # The plan is diagnostics only; never fail the query over it
+        return f"(no plan: {exc})"
+    finally:
+        cursor.close()
+
+
+def _before_query(conn, statement, parameters, context, executemany):
+    log = _query_log.get()
+    if log is None:
+        return
+
+    log.total += 1
+    shape = statement_shape(statement)
+    log.shapes[shape] += 1
+    count = log.shapes[shape]
+
+    if count > settings.N_PLUS_ONE_THRESHOLD and shape not in log.flagged:
+        log.flagged.add(shape)
+        logger.warning(
+            "Possible N+1 on %s: statement ran %d times in one request: %s",
+            log.route, count, shape
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                f"{log.route} ran the same statement more than "
+                f"{settings.N_PLUS_ONE_THRESHOLD} times: {shape}"
+            )
+
+    budget = query_budget(log.route)
+    if settings.QUERY_BUDGET_STRICT and log.total > budget:
+        raise QueryBudgetExceeded(f"{log.route} exceeded its budget of {budget} queries")
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany, elapsed):
+    elapsed_ms = elapsed * 1000
+    if _query_log.get() is None or elapsed_ms < settings.SLOW_QUERY_MS or executemany:
+        return
+    # Parameters are used for the plan but never logged: they hold UINs, tokens and password hashes
+    logger.warning(
+        "Slow query (%.1f ms):\n%s\nPlan:\n%s",
+        elapsed_ms, statement, explain(conn, statement, parameters)
+    )
+
+
+def install_query_hooks() -> None:
+    """Watch queries on every engine, including course shards created later."""
+    timing.register(before=_before_query, after=_after_query)
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware that gives each HTTP request its own QueryLog."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _query_log.set(QueryLog(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_log.reset(token)
@@ -0,0 +1,313 @@
+"""
+Set-based roster import engine.
+
+Rosters are streamed from Canvas CSV exports and loaded in chunks: existing
+UINs are fetched once into a set, new students are written with chunked
+INSERT ... ON CONFLICT DO NOTHING (COPY on PostgreSQL), and several files
+are processed in parallel.
+
+sync_rosters() diffs a full roster against the per-student fingerprints
+stored by earlier imports and applies only the adds, changes and drops.
+"""
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .bulk import copy_students
+from .database import SessionLocal, engine_for_course
+from .models import Student
+from .utils import course_from_section, roster_fingerprint
+
+CHUNK_SIZE = 500
+
+# Canvas placeholder rows that are not real students
+SKIPPED_NAMES = {"Points Possible", "Student, Test"}
+
+
+def read_roster(csv_path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Stream students from a Canvas CSV export.
+    
+    Args:
+        csv_path: Path to the CSV file
+        
+    Yields:
+        (uin, name, course) for every real student row
+    """
+    with open(csv_path, 'r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            name = (row.get('Student') or '').strip()
+            uin = (row.get('SIS User ID') or '').strip()
+            if not name or not uin or name in SKIPPED_NAMES:
+                continue
+            yield uin, name, course_from_section(row.get('Section') or '')
+
+
+def _insert_statement(dialect_name: str):
+    """INSERT that ignores UIN conflicts where the dialect supports it."""
+    if dialect_name == "sqlite":
+        return sqlite.insert(Student).on_conflict_do_nothing(index_elements=["uin"])
+    if dialect_name == "postgresql":
+        return postgresql.insert(Student).on_conflict_do_nothing(index_elements=["uin"])
+    return insert(Student)
+
+
+def import_roster(csv_path: str, chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Import one roster file into its course database.
+    
+    Canvas exports one course per file, so the course of the first row picks
+    the database for the whole file.
+    
+    Args:
+        csv_path: Path to the CSV file
+        chunk_size: Rows per INSERT batch
+        
+    Returns:
+        Summary dict with file, course, rows, added, skipped and seconds
+    """
+    start = time.perf_counter()
+    rows = read_roster(csv_path)
+    first = next(rows, None)
+    summary = {"file": csv_path, "course": None, "rows": 0, "added": 0, "skipped": 0}
+    
+    if first is None:
+        summary["seconds"] = time.perf_counter() - start
+        return summary
+    
+    course = first[2]
+    summary["course"] = course
+    db = SessionLocal(info={"course": course})
+    dialect_name = engine_for_course(course).dialect.name
+    
+    try:
+        stream = _counted(_prepend(first, rows), summary)
+        
+        if dialect_name == "postgresql":
+            summary["added"] = copy_students(db, stream)
+        else:
+            existing = {uin for (uin,) in db.query(Student.uin)}
+            statement = _insert_statement(dialect_name)
+            now = datetime.utcnow()
+            
+            while True:
+                chunk = list(islice(stream, chunk_size))
+                if not chunk:
+                    break
+                
+                new_students = []
+                for uin, name, row_course in chunk:
+                    if uin in existing:
+                        continue
+                    existing.add(uin)
+                    new_students.append({
+                        "uin": uin,
+                        "name": name,
+                        "course": row_course,
+                        "roster_fingerprint": roster_fingerprint(uin, name, row_course),
+                        "is_enrolled": True,
+                        "hashed_password": "",  # Empty until student registers
+                        "is_registered": False,
+                        "created_at": now
+                    })
+                
+                if new_students:
+                    summary["added"] += db.connection().execute(statement, new_students).rowcount
+        
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    summary["skipped"] = summary["rows"] - summary["added"]
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def import_rosters(csv_paths: List[str], workers: int = None) -> Dict:
+    """
+    Import several roster files in parallel.
+    
+    Args:
+        csv_paths: Paths to CSV files (missing files are reported and skipped)
+        workers: Parallel file imports (defaults to one per file, max 8)
+        
+    Returns:
+        Summary dict with per-file results, totals and rows_per_second
+    """
+    start = time.perf_counter()
+    missing = [path for path in csv_paths if not os.path.exists(path)]
+    present = [path for path in csv_paths if os.path.exists(path)]
+    
+    files = []
+    if present:
+        workers = workers or min(len(present), 8)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            files = list(executor.map(import_roster, present))
+    
+    seconds = time.perf_counter() - start
+    rows = sum(f["rows"] for f in files)
+    return {
+        "files": files,
+        "missing": missing,
+        "rows": rows,
+        "added": sum(f["added"] for f in files),
+        "skipped": sum(f["skipped"] for f in files),
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0
+    }
+
+
+def diff_roster(db, course: Optional[str], roster: Dict[str, Tuple[str, Optional[str]]]) -> Dict:
+    """
+    Compare a course roster against the students already stored.
+    
+    Only students that came from a roster (they have a fingerprint) can be
+    dropped, so manually created test accounts are never touched.
+    
+    Args:
+        db: Session routed to the course database
+        course: Course code being synced
+        roster: Mapping of UIN to (name, course) for every row in the roster
+        
+    Returns:
+        Dict with "adds" (insert rows), "updates" (update rows) and "drops" (student ids)
+    """
+    columns = (Student.id, Student.uin, Student.roster_fingerprint, Student.is_enrolled)
+    in_course = Student.course == course if course is not None else Student.course.is_(None)
+    stored = db.query(*columns).filter(in_course).all()
+    by_uin = {row.uin: row for row in stored}
+    
+    # UINs stored under another course in this database still count as existing
+    missing = [uin for uin in roster if uin not in by_uin]
+    for start in range(0, len(missing), CHUNK_SIZE):
+        for row in db.query(*columns).filter(Student.uin.in_(missing[start:start + CHUNK_SIZE])):
+            by_uin[row.uin] = row
+    
+    now = datetime.utcnow()
+    adds, updates = [], []
+    for uin, (name, row_course) in roster.items():
+        fingerprint = roster_fingerprint(uin, name, row_course)
+        current = by_uin.get(uin)
+        if current is None:
+            adds.append({
+                "uin": uin,
+                "name": name,
+                "course": row_course,
+                "roster_fingerprint": fingerprint,
+                "is_enrolled": True,
+                "hashed_password": "",  # Empty until student registers
+                "is_registered": False,
+                "created_at": now
+            })
+        elif current.roster_fingerprint != fingerprint or not current.is_enrolled:
+            updates.append({
+                "student_id": current.id,
+                "name": name,
+                "course": row_course,
+                "fingerprint": fingerprint
+            })
+    
+    drops = [
+        row.id for row in stored
+        if row.uin not in roster and row.roster_fingerprint is not None and row.is_enrolled
+    ]
+    return {"adds": adds, "updates": updates, "drops": drops}
+
+
+def sync_rosters(csv_paths: List[str], dry_run: bool = False) -> Dict:
+    """
+    Bring each course in line with its full roster in one transaction per course.
+    
+    Args:
+        csv_paths: Complete roster files (a course may span several files)
+        dry_run: Compute the delta without writing it
+        
+    Returns:
+        Summary dict with per-course added/updated/dropped/unchanged counts
+    """
+    start = time.perf_counter()
+    missing = [path for path in csv_paths if not os.path.exists(path)]
+    
+    rosters = {}
+    rows = 0
+    for path in csv_paths:
+        if path in missing:
+            continue
+        for uin, name, course in read_roster(path):
+            rosters.setdefault(course, {})[uin] = (name, course)
+            rows += 1
+    
+    courses = []
+    for course, roster in rosters.items():
+        db = SessionLocal(info={"course": course})
+        try:
+            delta = diff_roster(db, course, roster)
+            if not dry_run:
+                conn = db.connection()
+                if delta["adds"]:
+                    conn.execute(_insert_statement(conn.dialect.name), delta["adds"])
+                if delta["updates"]:
+                    conn.execute(
+                        update(Student.__table__)
+                        .where(Student.__table__.c.id == bindparam("student_id"))
+                        .values(
+                            name=bindparam("name"),
+                            course=bindparam("course"),
+                            roster_fingerprint=bindparam("fingerprint"),
+                            is_enrolled=True
+                        ),
+                        delta["updates"]
+                    )
+                for chunk_start in range(0, len(delta["drops"]), CHUNK_SIZE):
+                    conn.execute(
+                        update(Student.__table__)
+                        .where(Student.__table__.c.id.in_(delta["drops"][chunk_start:chunk_start + CHUNK_SIZE]))
+                        .values(is_enrolled=False)
+                    )
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        changed = len(delta["adds"]) + len(delta["updates"])
+        courses.append({
+            "course": course,
+            "rows": len(roster),
+            "added": len(delta["adds"]),
+            "updated": len(delta["updates"]),
+            "dropped": len(delta["drops"]),
+            "unchanged": len(roster) - changed
+        })
+    
+    seconds = time.perf_counter() - start
+    return {
+        "courses": courses,
+        "missing": missing,
+        "rows": rows,
+        "dry_run": dry_run,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0
+    }
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def _counted(rows, summary):
+    for row in rows:
+        summary["rows"] += 1
+        yield row
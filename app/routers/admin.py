@@ -1,19 +1,23 @@
 """
 Admin API endpoints for session and token management.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status, Header
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, insert, literal, select, union_all
 from typing import Optional, List
 from datetime import datetime, date
+import asyncio
 import os
 
-from .. import models, schemas, auth, utils
-from ..database import get_db
+from .. import models, schemas, auth, utils, ingest, export, admission, sampler, tracing, logs
+from ..config import settings as app_settings
+from ..database import get_db, read_db_for, record_write
 
-router = APIRouter(prefix="/api/admin", tags=["admin"])
+router = APIRouter(prefix="/api/admin", tags=["admin"], route_class=tracing.TracedRoute)
 
 
+@tracing.traced("auth.admin")
 def get_current_admin(authorization: Optional[str] = Header(None)) -> str:
     """Dependency to verify admin authentication."""
     if not authorization or not authorization.startswith("Bearer "):
@@ -26,10 +30,16 @@ def get_current_admin(authorization: Optional[str] = Header(None)) -> str:
     return auth.verify_admin_token(token)
 
 
+def get_admin_read_db(request: Request, admin: str = Depends(get_current_admin)):
+    """Dependency to get a read-only session for admin reports."""
+    yield from read_db_for(request, f"admin:{admin}")
+
+
 @router.post("/login", response_model=dict)
 def admin_login(req: schemas.AdminLoginRequest, db: Session = Depends(get_db)):
     """Admin login endpoint."""
     if not auth.verify_admin_credentials(req.username, req.password):
+        logs.audit("auth.failed", kind="admin", reason="bad_credentials", username=req.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid admin credentials"
@@ -51,15 +61,19 @@ def admin_login(req: schemas.AdminLoginRequest, db: Session = Depends(get_db)):
 @router.get("/dashboard", response_model=schemas.DashboardStats)
 def get_dashboard_stats(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
     """Get dashboard statistics."""
-    total_students = db.query(models.Student).count()
-    total_registered_students = db.query(models.Student).filter(
+    # Students dropped from the roster keep their records but no longer count
+    enrolled = db.query(models.Student).filter(models.Student.is_enrolled == True)
+    total_students = enrolled.count()
+    total_registered_students = enrolled.filter(
         models.Student.is_registered == True
     ).count()
     total_sessions = db.query(models.Session).count()
-    total_attendances = db.query(models.Attendance).count()
+    total_attendances = db.query(models.Attendance).join(models.Student).filter(
+        models.Student.is_enrolled == True
+    ).count()
     
     # Get today's session
     today = date.today()
@@ -68,7 +82,10 @@ def get_dashboard_stats(
     ).first()
     
     # Get recent attendances
-    recent = db.query(models.Attendance).order_by(
+    recent = db.query(models.Attendance).options(
+        joinedload(models.Attendance.student),
+        joinedload(models.Attendance.session)
+    ).order_by(
         models.Attendance.marked_at.desc()
     ).limit(10).all()
     
@@ -93,26 +110,30 @@ def get_dashboard_stats(
 @router.get("/students/grades", response_model=List[schemas.StudentStats])
 def get_all_student_grades(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
-    """Get grades and statistics for all students."""
-    students = db.query(models.Student).order_by(models.Student.name).all()
+    """Get grades and statistics for all enrolled students."""
+    students = db.query(models.Student).filter(
+        models.Student.is_enrolled == True
+    ).order_by(models.Student.name).all()
     
-    # Get all regular sessions (exclude test sessions from grading)
-    regular_sessions = db.query(models.Session).filter(
+    # Count regular sessions (exclude test sessions from grading)
+    total_regular_sessions = db.query(models.Session).filter(
         models.Session.is_test_session == False
-    ).all()
-    total_regular_sessions = len(regular_sessions)
+    ).count()
     
-    student_stats = []
-    for student in students:
-        # Count attendances for regular sessions only
-        attended_regular = db.query(models.Attendance).join(
+    # Regular-session attendance per student, in one grouped query
+    regular_counts = dict(
+        db.query(models.Attendance.student_id, func.count(models.Attendance.id)).join(
             models.Session
         ).filter(
-            models.Attendance.student_id == student.id,
             models.Session.is_test_session == False
-        ).count()
+        ).group_by(models.Attendance.student_id).all()
+    )
+    
+    student_stats = []
+    for student in students:
+        attended_regular = regular_counts.get(student.id, 0)
         
         # Calculate attendance percentage and grade
         if total_regular_sessions > 0:
@@ -158,7 +179,8 @@ def create_test_sessions(
     for i in range(2 - existing):
         session = models.Session(
             date=datetime.combine(today, datetime.min.time()),
-            is_test_session=True
+            is_test_session=True,
+            course=db.info.get("course")
         )
         db.add(session)
         db.flush()
@@ -169,6 +191,7 @@ def create_test_sessions(
         })
     
     db.commit()
+    record_write(db, f"admin:{admin}")
     
     return {
         "message": f"Created {len(sessions_created)} test sessions for today",
@@ -198,23 +221,32 @@ def create_regular_sessions(
         ).all()
     }
     
-    sessions_created = []
+    new_dates = []
     for date_str in preset_dates:
         session_date = datetime.strptime(date_str, "%Y-%m-%d").date()
         if session_date not in existing_dates:
-            session = models.Session(
-                date=datetime.combine(session_date, datetime.min.time()),
-                is_test_session=False
-            )
-            db.add(session)
-            db.flush()
-            sessions_created.append({
+            new_dates.append(datetime.combine(session_date, datetime.min.time()))
+    
+    sessions_created = []
+    if new_dates:
+        # One executemany instead of an INSERT ... RETURNING per session
+        db.execute(insert(models.Session), [
+            {"date": session_date, "is_test_session": False, "course": db.info.get("course")}
+            for session_date in new_dates
+        ])
+        sessions_created = [
+            {
                 "id": session.id,
                 "date": session.date,
                 "is_test_session": False
-            })
+            } for session in db.query(models.Session).filter(
+                models.Session.is_test_session == False,
+                models.Session.date.in_(new_dates)
+            ).order_by(models.Session.date).all()
+        ]
     
     db.commit()
+    record_write(db, f"admin:{admin}")
     
     return {
         "message": f"Created {len(sessions_created)} regular sessions",
@@ -225,7 +257,7 @@ def create_regular_sessions(
 @router.get("/sessions", response_model=List[schemas.SessionResponse])
 def get_all_sessions(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
     """Get all sessions."""
     sessions = db.query(models.Session).order_by(models.Session.date.desc()).all()
@@ -235,7 +267,7 @@ def get_all_sessions(
 @router.get("/sessions/today")
 def get_today_sessions(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
     """Get today's sessions."""
     today = date.today()
@@ -272,6 +304,7 @@ def generate_token(
     
     db.add(session_token)
     db.commit()
+    record_write(db, f"admin:{admin}")
     
     return {
         "session_id": req.session_id,
@@ -307,23 +340,64 @@ def get_active_tokens(
     }
 
 
+def token_history(db: Session, session_id: Optional[int] = None):
+    """
+    Token history newest first, combining live tokens with the archive.
+    
+    Args:
+        db: Database session
+        session_id: Restrict to one session (all sessions if None)
+        
+    Returns:
+        Rows with token columns plus session_date and is_test_session
+    """
+    live = select(
+        models.SessionToken.id,
+        models.SessionToken.session_id,
+        models.SessionToken.token,
+        models.SessionToken.created_at,
+        models.SessionToken.expires_at,
+        models.SessionToken.is_active
+    )
+    archived = select(
+        models.SessionTokenArchive.id,
+        models.SessionTokenArchive.session_id,
+        models.SessionTokenArchive.token,
+        models.SessionTokenArchive.created_at,
+        models.SessionTokenArchive.expires_at,
+        literal(False).label("is_active")
+    )
+    if session_id is not None:
+        live = live.where(models.SessionToken.session_id == session_id)
+        archived = archived.where(models.SessionTokenArchive.session_id == session_id)
+    
+    tokens = union_all(live, archived).subquery()
+    return db.execute(
+        select(
+            tokens,
+            models.Session.date.label("session_date"),
+            models.Session.is_test_session
+        ).join(
+            models.Session, models.Session.id == tokens.c.session_id
+        ).order_by(tokens.c.created_at.desc())
+    ).all()
+
+
 @router.get("/tokens/history")
 def get_token_history(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
     """Get complete token generation history across all sessions."""
-    tokens = db.query(models.SessionToken).join(models.Session).order_by(
-        models.SessionToken.created_at.desc()
-    ).all()
+    tokens = token_history(db)
     
     return {
         "tokens": [
             {
                 "id": t.id,
                 "session_id": t.session_id,
-                "session_date": t.session.date,
-                "is_test_session": t.session.is_test_session,
+                "session_date": t.session_date,
+                "is_test_session": t.is_test_session,
                 "token": t.token,
                 "created_at": t.created_at,
                 "expires_at": t.expires_at,
@@ -339,7 +413,7 @@ def get_token_history(
 def get_session_token_history(
     session_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
     """Get token generation history for a specific session."""
     session = db.query(models.Session).filter(
@@ -349,9 +423,7 @@ def get_session_token_history(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    tokens = db.query(models.SessionToken).filter(
-        models.SessionToken.session_id == session_id
-    ).order_by(models.SessionToken.created_at.desc()).all()
+    tokens = token_history(db, session_id)
     
     return {
         "session_id": session_id,
@@ -375,7 +447,7 @@ def get_session_token_history(
 def get_session_attendance(
     session_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
     """Get attendance for a specific session."""
     session = db.query(models.Session).filter(
@@ -385,7 +457,9 @@ def get_session_attendance(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    attendances = db.query(models.Attendance).filter(
+    attendances = db.query(models.Attendance).options(
+        joinedload(models.Attendance.student)
+    ).filter(
         models.Attendance.session_id == session_id
     ).all()
     
@@ -402,13 +476,42 @@ def get_session_attendance(
     }
 
 
+@router.post("/attendance/bulk")
+def bulk_ingest_attendance(
+    req: schemas.BulkAttendanceRequest,
+    admin: str = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Bulk-insert attendance from paper or kiosk sign-in sheets."""
+    result = ingest.ingest_attendance(db, req.records)
+    record_write(db, f"admin:{admin}")
+    return result
+
+
+@router.post("/attendance/bulk/csv")
+def bulk_ingest_attendance_csv(
+    file: UploadFile = File(...),
+    admin: str = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Bulk-insert attendance from an uploaded CSV (uin,session_id,marked_at)."""
+    try:
+        text = file.file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+    
+    result = ingest.ingest_attendance(db, ingest.parse_records(text, "csv"))
+    record_write(db, f"admin:{admin}")
+    return result
+
+
 @router.get("/export/excel")
 def export_attendance_excel(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_admin_read_db)
 ):
-    """Export attendance to Excel with grading."""
-    students = db.query(models.Student).all()
+    """Export attendance to Excel with grading (enrolled students only)."""
+    students = db.query(models.Student).filter(models.Student.is_enrolled == True).all()
     
     # Get counts for both test and regular sessions
     total_sessions = db.query(models.Session).count()
@@ -416,18 +519,24 @@ def export_attendance_excel(
         models.Session.is_test_session == False
     ).count()
     
+    # All attended sessions and regular sessions attended (for grading), per student
+    all_counts = dict(
+        db.query(models.Attendance.student_id, func.count(models.Attendance.id)).group_by(
+            models.Attendance.student_id
+        ).all()
+    )
+    regular_counts = dict(
+        db.query(models.Attendance.student_id, func.count(models.Attendance.id)).join(
+            models.Session
+        ).filter(
+            models.Session.is_test_session == False
+        ).group_by(models.Attendance.student_id).all()
+    )
+    
     attendance_data = []
     for student in students:
-        # All attended sessions
-        all_attended = db.query(models.Attendance).filter(
-            models.Attendance.student_id == student.id
-        ).count()
-        
-        # Regular sessions attended (for grading)
-        regular_attended = db.query(models.Attendance).join(models.Session).filter(
-            models.Attendance.student_id == student.id,
-            models.Session.is_test_session == False
-        ).count()
+        all_attended = all_counts.get(student.id, 0)
+        regular_attended = regular_counts.get(student.id, 0)
         
         # Test sessions attended
         test_attended = all_attended - regular_attended
@@ -448,47 +557,11 @@ def export_attendance_excel(
             "grade_points": grade
         })
     
-    # Generate Excel file with updated columns
-    df = pd.DataFrame(attendance_data)
-    
-    # Reorder columns
-    column_order = [
-        "uin", "name", "total_sessions", "total_regular_sessions",
-        "attended_all", "attended_regular", "attended_test",
-        "attendance_percentage", "grade_points"
-    ]
-    df = df[column_order]
-    
-    # Rename columns for better readability
-    df.columns = [
-        "UIN", "Name", "Total Sessions (All)", "Regular Sessions",
-        "Attended (All)", "Attended (Regular)", "Attended (Test)",
-        "Attendance % (Regular)", "Grade Points"
-    ]
-    
     # Generate filename
     filename = f"attendance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     
-    # Create Excel writer with styling
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Attendance Report', index=False)
-        
-        # Get the workbook and worksheet
-        workbook = writer.book
-        worksheet = writer.sheets['Attendance Report']
-        
-        # Adjust column widths
-        for column in worksheet.columns:
-            max_length = 0
-            column = [cell for cell in column]
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+    # pandas/openpyxl are only imported here, on first export
+    export.write_attendance_report(attendance_data, filename)
     
     return {
         "message": "Excel report generated successfully",
@@ -501,6 +574,122 @@ def export_attendance_excel(
     }
 
 
+@router.get("/admission")
+def get_admission_status(admin: str = Depends(get_current_admin)):
+    """Admission lanes: concurrency in use, queue depths and shed counts."""
+    return admission.controller.snapshot()
+
+
+@router.get("/debug/profile")
+async def profile_worker(
+    request: Request,
+    seconds: float = Query(5.0, gt=0),
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    include_idle: bool = False,
+    admin: str = Depends(get_current_admin),
+):
+    """
+    Sample every thread of this worker for a few seconds.
+    
+    Args:
+        seconds: How long to sample (at most PROFILER_MAX_SECONDS)
+        format: "json" for per-route breakdown, "collapsed" for flamegraph input
+        include_idle: Keep samples of threads waiting for work
+        
+    Returns:
+        Collapsed stacks overall and per route
+    """
+    if seconds > app_settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be at most {app_settings.PROFILER_MAX_SECONDS:g}"
+        )
+    try:
+        sampler.acquire_session()
+    except sampler.ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="A profile is already running on this worker"
+        )
+
+    try:
+        run = sampler.Sampler(
+            sampler.route_index(request.app.routes),
+            interval=app_settings.PROFILER_INTERVAL_MS / 1000,
+            include_idle=include_idle,
+        )
+        run.start()
+        try:
+            # Wait on the event loop so no threadpool thread is held
+            await asyncio.sleep(seconds)
+        finally:
+            run.stop()
+    finally:
+        sampler.release_session()
+
+    if format == "collapsed":
+        return PlainTextResponse(sampler.collapsed(run.stacks))
+    return sampler.report(run, seconds)
+
+
+@router.get("/debug/traces")
+def list_traces(
+    route: Optional[str] = None,
+    min_ms: float = 0.0,
+    limit: int = Query(50, ge=1, le=1000),
+    admin: str = Depends(get_current_admin)
+):
+    """
+    Recent request traces of this worker, newest first.
+    
+    Args:
+        route: Only this route, e.g. "POST /api/student/attendance/mark"
+        min_ms: Only requests at least this slow
+        limit: Maximum number of traces
+        
+    Returns:
+        Trace summaries; fetch one by id for its spans
+    """
+    traces = tracing.buffer.find(route, min_ms, limit)
+    return {"traces": [trace.summary() for trace in traces]}
+
+
+@router.get("/debug/traces/{trace_id}")
+def get_trace(trace_id: str, admin: str = Depends(get_current_admin)):
+    """Every span of one trace, in start order."""
+    trace = tracing.buffer.get(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found (it may have left the buffer)")
+    return trace.tree()
+
+
+@router.post("/debug/traces/export")
+def export_traces(
+    route: Optional[str] = None,
+    min_ms: float = 0.0,
+    admin: str = Depends(get_current_admin)
+):
+    """
+    Write buffered traces to an OTLP/JSON file under TRACE_EXPORT_DIR.
+    
+    Args:
+        route: Only this route
+        min_ms: Only requests at least this slow
+        
+    Returns:
+        Path of the file and how much it holds
+    """
+    traces = tracing.buffer.find(route, min_ms, limit=None)
+    if not traces:
+        raise HTTPException(status_code=404, detail="No traces match")
+    path = tracing.export(list(reversed(traces)))
+    return {
+        "path": path,
+        "traces": len(traces),
+        "spans": sum(len(trace.spans) for trace in traces)
+    }
+
+
 @router.get("/settings")
 def get_settings(db: Session = Depends(get_db)):
     """Get admin settings (public endpoint for students to check time restrictions)."""
@@ -531,6 +720,7 @@ def update_settings(
     
     db.commit()
     db.refresh(settings)
+    record_write(db, f"admin:{admin}")
     
     return {
         "message": "Settings updated successfully",
@@ -1,18 +1,19 @@
 """
 Student API endpoints for authentication and attendance marking.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Header
+from sqlalchemy.orm import Session, contains_eager
 from sqlalchemy import func
 from typing import Optional, List
 from datetime import datetime, date
 
-from .. import models, schemas, auth, utils
-from ..database import get_db
+from .. import models, schemas, auth, utils, tracing, logs, attempts
+from ..database import get_db, read_db_for, record_write, find_course_for_uin, use_course
 
-router = APIRouter(prefix="/api/student", tags=["student"])
+router = APIRouter(prefix="/api/student", tags=["student"], route_class=tracing.TracedRoute)
 
 
+@tracing.traced("auth.student")
 def get_current_student(authorization: Optional[str] = Header(None)) -> int:
     """Dependency to verify student authentication."""
     if not authorization or not authorization.startswith("Bearer "):
@@ -25,13 +26,47 @@ def get_current_student(authorization: Optional[str] = Header(None)) -> int:
     return auth.verify_student_token(token)
 
 
+def guard_mark_attempts(
+    req: schemas.AttendanceMarkRequest,
+    student_id: int = Depends(get_current_student)
+) -> int:
+    """Dependency refusing locked-out submissions; declared before get_db so refusals cost no database work."""
+    attempts.check(student_id, req.session_id)
+    return student_id
+
+
+def get_student_read_db(request: Request, student_id: int = Depends(get_current_student)):
+    """Dependency to get a read-only session for the current student."""
+    yield from read_db_for(request, f"student:{student_id}")
+
+
+def find_student(db: Session, uin: str) -> Optional[models.Student]:
+    """
+    Find a student by UIN, searching the other course databases if needed.
+
+    When the student lives in another course shard, db is re-pointed there
+    so later writes land in the right database.
+    """
+    student = db.query(models.Student).filter(
+        models.Student.uin == uin
+    ).first()
+    
+    if not student:
+        course = find_course_for_uin(uin)
+        if course and course != db.info.get("course"):
+            use_course(db, course)
+            student = db.query(models.Student).filter(
+                models.Student.uin == uin
+            ).first()
+    
+    return student
+
+
 @router.post("/register")
 def student_register(req: schemas.StudentRegisterRequest, db: Session = Depends(get_db)):
     """Student registration endpoint - verify UIN and set password."""
     # Check if student with this UIN exists in database (imported from CSV)
-    student = db.query(models.Student).filter(
-        models.Student.uin == req.uin
-    ).first()
+    student = find_student(db, req.uin)
     
     if not student:
         raise HTTPException(
@@ -68,32 +103,45 @@ def student_register(req: schemas.StudentRegisterRequest, db: Session = Depends(
 @router.post("/login")
 def student_login(req: schemas.StudentLoginRequest, db: Session = Depends(get_db)):
     """Student login endpoint."""
-    student = db.query(models.Student).filter(
-        models.Student.uin == req.uin
-    ).first()
+    student = find_student(db, req.uin)
     
     if not student:
+        logs.audit("auth.failed", kind="student", reason="unknown_uin")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid UIN or password"
         )
     
     if not student.is_registered:
+        logs.audit("auth.failed", kind="student", reason="not_registered", student_id=student.id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Please register first before logging in"
         )
     
+    if not student.is_enrolled:
+        logs.audit("auth.failed", kind="student", reason="not_enrolled", student_id=student.id)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are no longer enrolled in this course"
+        )
+    
+    # Hand the connection back before the slow bcrypt check; nothing below needs the database
+    course = db.info.get("course")
+    db.close()
+    
     if not auth.verify_password(req.password, student.hashed_password):
+        logs.audit("auth.failed", kind="student", reason="bad_password", student_id=student.id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid UIN or password"
         )
     
-    # Create JWT token
-    access_token = auth.create_access_token(
-        data={"sub": str(student.id), "type": "student"}
-    )
+    # Create JWT token (course selects the student's database on later requests)
+    token_data = {"sub": str(student.id), "type": "student"}
+    if course:
+        token_data["course"] = course
+    access_token = auth.create_access_token(data=token_data)
     
     return {
         "access_token": access_token,
@@ -111,9 +159,7 @@ def student_login(req: schemas.StudentLoginRequest, db: Session = Depends(get_db
 def reset_password(req: schemas.StudentResetPasswordRequest, db: Session = Depends(get_db)):
     """Reset student password - verify UIN and name, then set new password."""
     # Find student by UIN
-    student = db.query(models.Student).filter(
-        models.Student.uin == req.uin
-    ).first()
+    student = find_student(db, req.uin)
     
     if not student:
         raise HTTPException(
@@ -149,7 +195,7 @@ def reset_password(req: schemas.StudentResetPasswordRequest, db: Session = Depen
 @router.get("/sessions/today")
 def get_today_sessions(
     student_id: int = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_student_read_db)
 ):
     """Get today's sessions for attendance marking."""
     today = date.today()
@@ -180,7 +226,7 @@ def get_today_sessions(
 @router.get("/sessions/available")
 def get_available_sessions(
     student_id: int = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_student_read_db)
 ):
     """Get all available sessions (today and future)."""
     today = date.today()
@@ -211,10 +257,21 @@ def get_available_sessions(
 @router.post("/attendance/mark")
 def mark_attendance(
     req: schemas.AttendanceMarkRequest,
-    student_id: int = Depends(get_current_student),
+    student_id: int = Depends(guard_mark_attempts),
     db: Session = Depends(get_db)
 ):
     """Mark attendance for a session."""
+    # An access token issued before the student was dropped from the roster stays valid, so check enrollment here
+    enrolled = db.query(models.Student.is_enrolled).filter(
+        models.Student.id == student_id
+    ).scalar()
+    
+    if not enrolled:
+        raise HTTPException(
+            status_code=403,
+            detail="You are no longer enrolled in this course"
+        )
+    
     # Validate session exists
     session = db.query(models.Session).filter(
         models.Session.id == req.session_id
@@ -252,11 +309,17 @@ def mark_attendance(
     ).first()
     
     if not token_record:
+        logs.audit("attendance.rejected", reason="invalid_token", student_id=student_id, session_id=req.session_id)
+        # Only wrong tokens count towards a lockout; raises 429 once this one reaches the limit
+        attempts.record_failure(student_id, req.session_id)
         raise HTTPException(
             status_code=403,
             detail="Invalid or expired session token"
         )
     
+    # The token was right, so earlier wrong guesses no longer count
+    attempts.reset(student_id, req.session_id)
+    
     # Check for duplicate attendance
     existing = db.query(models.Attendance).filter(
         models.Attendance.student_id == student_id,
@@ -272,12 +335,15 @@ def mark_attendance(
     # Create attendance record
     attendance = models.Attendance(
         student_id=student_id,
-        session_id=req.session_id
+        session_id=req.session_id,
+        course=session.course
     )
     
     db.add(attendance)
     db.commit()
     db.refresh(attendance)
+    record_write(db, f"student:{student_id}")
+    logs.audit("attendance.marked", student_id=student_id, session_id=req.session_id, course=session.course)
     
     return {
         "message": "Attendance marked successfully",
@@ -288,7 +354,7 @@ def mark_attendance(
 @router.get("/attendance/my-records")
 def get_my_attendance(
     student_id: int = Depends(get_current_student),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_student_read_db)
 ):
     """Get student's attendance records."""
     student = db.query(models.Student).filter(
@@ -302,7 +368,9 @@ def get_my_attendance(
     ).count()
     
     # Get all attended sessions
-    all_attendances = db.query(models.Attendance).join(models.Session).filter(
+    all_attendances = db.query(models.Attendance).join(models.Session).options(
+        contains_eager(models.Attendance.session)
+    ).filter(
         models.Attendance.student_id == student_id
     ).all()
     
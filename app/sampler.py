@@ -0,0 +1,179 @@
+"""
+On-demand sampling profiler for a running worker.
+
+A Sampler thread snapshots the stack of every thread in the process with
+sys._current_frames() at a fixed interval and counts identical stacks.
+Nothing is traced between samples, so the cost is a few microseconds per
+thread per sample and the server keeps serving normally while profiled.
+
+Stacks are reported in the collapsed format ("frame;frame;frame count")
+that flamegraph.pl, speedscope and inferno read directly. Each sample is
+also attributed to a route by finding a route's endpoint function on the
+stack. Sync endpoints run in threadpool threads and async ones on the event
+loop, so either way the endpoint's frame identifies what the thread is
+busy with. Work done outside an endpoint, such as dependencies or
+middleware, shows up as "(no route)".
+
+Only the worker process that serves the profiling request is sampled.
+"""
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict
+
+from .config import settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Leaf frames of threads that are waiting for work rather than doing it
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    # An event loop (uvloop) parked in C, waiting for I/O
+    ("runners.py", "run"),
+    ("base_events.py", "run_forever"),
+}
+
+_labels: Dict[object, str] = {}
+
+
+class ProfilerBusy(Exception):
+    """settings.PROFILER_MAX_SESSIONS profiles are already running."""
+
+
+def frame_label(code) -> str:
+    """Short, stable name for a code object, e.g. "app/routers/admin.py:get_dashboard_stats"."""
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(ROOT + os.sep):
+            filename = os.path.relpath(filename, ROOT)
+        elif "site-packages" in filename:
+            filename = filename.split("site-packages" + os.sep, 1)[1]
+        else:
+            filename = os.path.basename(filename)
+        label = _labels[code] = f"{filename}:{code.co_name}"
+    return label
+
+
+def route_index(routes) -> Dict[object, str]:
+    """Map endpoint code objects to "METHOD /path/template"."""
+    index = {}
+    for route in routes:
+        endpoint = getattr(route, "endpoint", None)
+        # Look through wrappers such as tracing's, to the function whose frame appears in stacks
+        code = getattr(inspect.unwrap(endpoint), "__code__", None) if endpoint is not None else None
+        if code is not None:
+            methods = ",".join(sorted(getattr(route, "methods", None) or [])) or "ANY"
+            index[code] = f"{methods} {route.path}"
+    return index
+
+
+class Sampler:
+    """Samples every thread's stack until stopped."""
+
+    def __init__(self, routes: Dict[object, str], interval: float, include_idle: bool = False):
+        self.routes = routes
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.route_stacks = defaultdict(Counter)
+        self.samples = 0
+        self.idle_samples = 0
+        self.sampling_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        next_sample = time.perf_counter()
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._record(names.get(thread_id, "thread"), frame)
+            self.samples += 1
+            self.sampling_seconds += time.perf_counter() - started
+
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay < 0:
+                next_sample = time.perf_counter()  # Fell behind; don't try to catch up
+            elif self._stop.wait(delay):
+                break
+
+    def _record(self, thread_name: str, frame) -> None:
+        leaf = frame.f_code
+        if not self.include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES:
+            self.idle_samples += 1
+            return
+        labels = []
+        route = None
+        while frame is not None:
+            code = frame.f_code
+            labels.append(frame_label(code))
+            if route is None:
+                route = self.routes.get(code)
+            frame = frame.f_back
+        # Thread names like "AnyIO worker thread" group the pool's threads together
+        labels.append(thread_name.rstrip("0123456789-_ ") or "thread")
+        stack = ";".join(reversed(labels))
+        self.stacks[stack] += 1
+        self.route_stacks[route or "(no route)"][stack] += 1
+
+
+def collapsed(stacks: Counter) -> str:
+    """Render stack counts in the collapsed format, heaviest first."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+_sessions = threading.BoundedSemaphore(max(settings.PROFILER_MAX_SESSIONS, 1))
+
+
+def acquire_session() -> None:
+    """Claim a profiling slot or raise ProfilerBusy."""
+    if not _sessions.acquire(blocking=False):
+        raise ProfilerBusy()
+
+
+def release_session() -> None:
+    _sessions.release()
+
+
+def report(sampler: Sampler, seconds: float) -> dict:
+    """Summarize a finished Sampler: collapsed stacks overall and per route."""
+    total = sum(sampler.stacks.values())
+    routes = {}
+    for route, stacks in sorted(sampler.route_stacks.items(), key=lambda item: -sum(item[1].values())):
+        count = sum(stacks.values())
+        routes[route] = {
+            "samples": count,
+            "share": round(count / total, 4) if total else 0.0,
+            "collapsed": collapsed(stacks),
+        }
+    return {
+        "seconds": seconds,
+        "interval_ms": round(sampler.interval * 1000, 3),
+        "samples": sampler.samples,
+        "stack_samples": total,
+        "idle_samples": sampler.idle_samples,
+        "overhead_ms_per_sample": round(sampler.sampling_seconds / sampler.samples * 1000, 3)
+        if sampler.samples else 0.0,
+        "routes": routes,
+        "collapsed": collapsed(sampler.stacks),
+    }
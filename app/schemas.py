@@ -99,6 +99,12 @@ class AttendanceRecord(BaseModel):
     marked_at: datetime
 
 
+class BulkAttendanceRequest(BaseModel):
+    # {"uin", "session_id", "marked_at"} dicts, validated per row so one bad
+    # row is reported instead of rejecting the whole sheet
+    records: List[dict]
+
+
 # ============================================================================
 # Statistics Schemas
 # ============================================================================
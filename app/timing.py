@@ -0,0 +1,66 @@
+"""
+Shared SQL statement timing.
+
+One set of engine-wide cursor listeners times every statement and hands
+the result to the observers that registered for it: request metrics, the
+query profiler and tracing. The start time is kept on the statement's
+execution context rather than on the connection, so a statement that
+fails cannot leave a stale entry behind for the next one.
+
+Observers are plain functions:
+
+    before(conn, statement, parameters, context, executemany)
+        may raise to stop the statement (the profiler's strict budgets)
+    after(conn, cursor, statement, parameters, context, executemany, elapsed)
+    error(context, exception, elapsed)
+
+elapsed is in seconds.
+"""
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_before: List[Callable] = []
+_after: List[Callable] = []
+_error: List[Callable] = []
+
+
+def register(before: Optional[Callable] = None, after: Optional[Callable] = None,
+             error: Optional[Callable] = None) -> None:
+    """Add an observer's callbacks (once) and make sure the listeners are installed."""
+    for hooks, hook in ((_before, before), (_after, after), (_error, error)):
+        if hook is not None and hook not in hooks:
+            hooks.append(hook)
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+    for hook in _before:
+        hook(conn, statement, parameters, context, executemany)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    context._query_started = None
+    elapsed = time.perf_counter() - started
+    for hook in _after:
+        hook(conn, cursor, statement, parameters, context, executemany, elapsed)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    started = getattr(context, "_query_started", None) if context is not None else None
+    if started is None:
+        return
+    context._query_started = None
+    elapsed = time.perf_counter() - started
+    for hook in _error:
+        hook(context, exception_context.original_exception, elapsed)
@@ -0,0 +1,442 @@
+"""
+Lightweight in-process request tracing.
+
+TracingMiddleware opens a root span per sampled request and keeps the
+current span in a context variable, so nested spans find their parent
+whether they run on the event loop or in a threadpool thread (anyio copies
+the context into the thread). Spans are created automatically for:
+
+- admission queueing ("admission.wait");
+- FastAPI's request stages on routes using TracedRoute: resolving
+  dependencies ("dependencies"), the endpoint function ("endpoint") and
+  response validation/encoding ("serialize", with JSON rendering
+  "render" inside it);
+- authentication dependencies and password checks ("auth.*");
+- database pool checkout ("db.checkout") and every SQL statement
+  ("db.query", with the statement shape but never its parameters).
+
+Only a share of requests (settings.TRACE_SAMPLE_RATE) is traced; a client
+can force tracing by sending a sampled W3C traceparent header.
+
+Finished traces go to an in-memory ring buffer (settings.TRACE_BUFFER_SIZE)
+that admins browse at /api/admin/debug/traces, and can be exported as
+OTLP/JSON files for Jaeger, Tempo or any OpenTelemetry collector. Each
+traced response carries a W3C traceparent header, so a slow request seen
+by a client can be looked up directly.
+"""
+import dataclasses
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from . import timing
+from .config import settings
+from .profiler import statement_shape
+from .utils import DEBUG_PREFIX, SKIPPED_PREFIXES
+
+# Never traced: assets, probes and the debug endpoints themselves
+_UNTRACED_PREFIXES = SKIPPED_PREFIXES + (DEBUG_PREFIX,)
+
+SERVICE_NAME = "attendance-wizard"
+
+# OTLP span kinds and status codes
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int = KIND_INTERNAL,
+                 attributes: dict = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.status = STATUS_UNSET
+
+    def finish(self, error: BaseException = None) -> None:
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = STATUS_ERROR
+            self.attributes["error.type"] = type(error).__name__
+        self.trace.spans.append(self)  # list.append is atomic, spans may finish in any thread
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """All spans of one request."""
+
+    __slots__ = ("trace_id", "spans", "root")
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or f"{random.getrandbits(128):032x}"
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+
+    def summary(self) -> dict:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "status_code": root.attributes.get("http.status_code"),
+            "start": datetime.utcfromtimestamp(root.start_ns / 1e9).isoformat() + "Z",
+            "duration_ms": round(root.duration_ms, 3),
+            "spans": len(self.spans),
+        }
+
+    def tree(self) -> dict:
+        """Spans ordered by start time, with offsets from the start of the request."""
+        origin = self.root.start_ns
+        spans = [
+            {
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "offset_ms": round((span.start_ns - origin) / 1e6, 3),
+                "duration_ms": round(span.duration_ms, 3),
+                "error": span.status == STATUS_ERROR,
+                "attributes": span.attributes,
+            }
+            for span in sorted(self.spans, key=lambda span: span.start_ns)
+        ]
+        return {**self.summary(), "tree": spans}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Time a block as a child of the current span; does nothing outside a traced request."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.finish(exc)
+        raise
+    else:
+        child.finish()
+    finally:
+        _current_span.reset(token)
+
+
+def traced(name: str):
+    """Decorator running a sync function inside a span. Keeps the signature, so it works on dependencies."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceBuffer:
+    """Most recent finished traces, oldest dropped first."""
+
+    def __init__(self, size: int = None):
+        self._traces = deque(maxlen=size or settings.TRACE_BUFFER_SIZE)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def snapshot(self) -> List[Trace]:
+        with self._lock:
+            return list(self._traces)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        for trace in reversed(self.snapshot()):
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+
+    def find(self, name: str = None, min_ms: float = 0.0, limit: Optional[int] = 50) -> List[Trace]:
+        """Newest first, optionally only one route ("POST /api/...") or only slow requests."""
+        found = []
+        for trace in reversed(self.snapshot()):
+            if name and trace.root.name != name:
+                continue
+            if trace.root.duration_ms < min_ms:
+                continue
+            found.append(trace)
+            if limit and len(found) >= limit:
+                break
+        return found
+
+
+buffer = TraceBuffer()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces: List[Trace]) -> dict:
+    """Encode traces as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for trace in traces:
+        for item in trace.spans:
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "parentSpanId": item.parent_id or "",
+                "name": item.name,
+                "kind": item.kind,
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+                "status": {"code": item.status},
+            })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+def export(traces: List[Trace], directory: str = None) -> str:
+    """Write traces to an OTLP/JSON file under settings.TRACE_EXPORT_DIR. Returns its path."""
+    directory = directory or settings.TRACE_EXPORT_DIR
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"traces-{stamp}-{os.getpid()}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_otlp(traces), f, separators=(",", ":"))
+    return os.path.abspath(path)
+
+
+def _parse_traceparent(headers: list) -> tuple:
+    """(trace id, parent span id, sampled flag) from an incoming W3C traceparent header, if valid."""
+    for name, value in headers:
+        if name == b"traceparent":
+            parts = value.decode("latin-1").split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and len(parts[3]) == 2:
+                try:
+                    sampled = bool(int(parts[3], 16) & 1)
+                except ValueError:
+                    return None, None, False
+                return parts[1], parts[2], sampled
+    return None, None, False
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each sampled request."""
+
+    def __init__(self, app, trace_buffer: TraceBuffer = None):
+        self.app = app
+        self.buffer = trace_buffer or buffer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(_UNTRACED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        # A caller that traced its side of the request gets ours too
+        trace_id, parent_id, sampled = _parse_traceparent(scope["headers"])
+        if not sampled and random.random() >= settings.TRACE_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id)
+        root = trace.root = Span(trace, f"{scope['method']} {scope['path']}", parent_id, KIND_SERVER,
+                                 {"http.method": scope["method"], "http.target": scope["path"]})
+        traceparent = f"00-{trace.trace_id}-{root.span_id}-01".encode()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+                message["headers"] = list(message.get("headers", [])) + [(b"traceparent", traceparent)]
+            await send(message)
+
+        token = _current_span.set(root)
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                # Name by template so traces of one endpoint group together
+                root.name = f"{scope['method']} {route.path}"
+                root.attributes["http.route"] = route.path
+            root.finish(error)
+            self.buffer.add(trace)
+
+
+class TracedJSONResponse(JSONResponse):
+    """Default response class; times JSON rendering when a trace is active."""
+
+    def render(self, content) -> bytes:
+        if _current_span.get() is None:
+            return super().render(content)
+        with span("render"):
+            return super().render(content)
+
+
+# Root span of the request while a TracedRoute handles it
+_route_parent: ContextVar[Optional[Span]] = ContextVar("route_parent", default=None)
+
+
+def _traced_endpoint(func):
+    """
+    Wrap an endpoint so it runs in an "endpoint" span and starts the "serialize" stage.
+
+    The wrapper is always async, so FastAPI awaits it in the request's own
+    context and the stage it leaves current is seen by the route handler;
+    sync endpoints still run in the threadpool. functools.wraps keeps the
+    signature FastAPI reads parameters from.
+    """
+    is_async = inspect.iscoroutinefunction(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        parent = _route_parent.get()
+        if parent is None:
+            return await func(*args, **kwargs) if is_async else await run_in_threadpool(func, *args, **kwargs)
+
+        dependencies = _current_span.get()
+        if dependencies is not None and dependencies.end_ns is None:
+            dependencies.finish()
+        endpoint = Span(parent.trace, "endpoint", parent.span_id)
+        _current_span.set(endpoint)
+        try:
+            result = await func(*args, **kwargs) if is_async else await run_in_threadpool(func, *args, **kwargs)
+        except BaseException as exc:
+            endpoint.finish(exc)
+            raise
+        endpoint.finish()
+        # Left current for the route handler: response validation, encoding and rendering
+        _current_span.set(Span(parent.trace, "serialize", parent.span_id))
+        return result
+
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """
+    APIRoute that splits a traced request into dependencies, endpoint and serialize spans.
+
+    Routers opt in with APIRouter(route_class=TracedRoute). The route keeps
+    FastAPI's own handler for the plain endpoint and builds a second one
+    around the wrapped endpoint; only traced requests take the second, so
+    untraced ones (and every request with TRACING_ENABLED off) pay nothing.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not settings.TRACING_ENABLED:
+            return handler
+
+        plain = self.dependant
+        self.dependant = dataclasses.replace(plain, call=_traced_endpoint(plain.call))
+        try:
+            staged_handler = super().get_route_handler()
+        finally:
+            self.dependant = plain
+
+        async def traced_handler(request):
+            parent = _current_span.get()
+            if parent is None:
+                return await handler(request)
+
+            parent_token = _route_parent.set(parent)
+            # Dependency spans (auth.*, db.checkout) nest under this until the endpoint starts
+            span_token = _current_span.set(Span(parent.trace, "dependencies", parent.span_id))
+            error = None
+            try:
+                return await staged_handler(request)
+            except BaseException as exc:
+                error = exc
+                raise
+            finally:
+                stage = _current_span.get()
+                if stage is not None and stage.end_ns is None:
+                    stage.finish(error)
+                _current_span.reset(span_token)
+                _route_parent.reset(parent_token)
+
+        return traced_handler
+
+
+def _before_query(conn, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    context._trace_span = Span(parent.trace, "db.query", parent.span_id, KIND_CLIENT, {
+        "db.system": conn.dialect.name,
+        "db.statement": statement_shape(statement)[:500],
+    })
+    if executemany:
+        context._trace_span.attributes["db.executemany"] = True
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany, elapsed):
+    query_span = getattr(context, "_trace_span", None)
+    if query_span is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            query_span.attributes["db.rows"] = cursor.rowcount
+        query_span.finish()
+        context._trace_span = None
+
+
+def _query_error(context, exception, elapsed):
+    query_span = getattr(context, "_trace_span", None)
+    if query_span is not None:
+        query_span.finish(exception)
+        context._trace_span = None
+
+
+def install_hooks() -> None:
+    """Trace SQL on every engine."""
+    timing.register(before=_before_query, after=_after_query, error=_query_error)
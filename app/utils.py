@@ -1,12 +1,17 @@
 """
 Utility functions for token generation, grading, and Excel export.
 """
+import hashlib
 import random
 from datetime import datetime, timedelta
-import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .config import settings
 
+# Static assets and probes: never traced, captured or access-logged
+SKIPPED_PREFIXES = ("/static/", "/metrics", "/health", "/ready")
+# Debug endpoints are access-logged, but not traced or captured (they would observe themselves)
+DEBUG_PREFIX = "/api/admin/debug/"
+
 
 def generate_session_token() -> str:
     """Generate a random 6-digit token."""
@@ -49,6 +54,38 @@ def calculate_grade(attendance_percentage: float) -> int:
         return 0
 
 
+def course_from_section(section: str) -> Optional[str]:
+    """
+    Derive the course code from a Canvas section name.
+    
+    Args:
+        section: Section name, e.g. "CSCE-439-500"
+        
+    Returns:
+        Course code (e.g. "CSCE-439"), or None if the section is blank
+    """
+    parts = section.strip().split("-")
+    if len(parts) < 2 or not parts[0]:
+        return None
+    return f"{parts[0]}-{parts[1]}"
+
+
+def roster_fingerprint(uin: str, name: str, course: Optional[str]) -> str:
+    """
+    Fingerprint a roster row so unchanged students can be skipped on sync.
+    
+    Args:
+        uin: Student UIN
+        name: Name as it appears in Canvas
+        course: Course code
+        
+    Returns:
+        40-character hex digest
+    """
+    normalized = "\x1f".join([uin.strip(), " ".join(name.split()), course or ""])
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
 def is_within_attendance_window(disable_time_restrictions: bool = False) -> bool:
     """
     Check if current time is within attendance window (8-9 AM).
@@ -77,40 +114,13 @@ def export_to_excel(attendance_data: List[Dict], filename: str = "attendance_rep
     Returns:
         Path to the generated Excel file
     """
-    df = pd.DataFrame(attendance_data)
-    
-    # Reorder columns
-    column_order = [
-        "roll_number", "name", "total_sessions", "attended_sessions",
-        "attendance_percentage", "grade_points"
-    ]
-    df = df[column_order]
-    
-    # Rename columns for better readability
-    df.columns = [
-        "Roll Number", "Name", "Total Sessions", "Attended Sessions",
-        "Attendance %", "Grade Points"
-    ]
-    
-    # Create Excel writer with styling
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Attendance Report', index=False)
-        
-        # Get the workbook and worksheet
-        workbook = writer.book
-        worksheet = writer.sheets['Attendance Report']
-        
-        # Adjust column widths
-        for column in worksheet.columns:
-            max_length = 0
-            column = [cell for cell in column]
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+    from .export import write_excel
     
-    return filename
+    return write_excel(attendance_data, {
+        "roll_number": "Roll Number",
+        "name": "Name",
+        "total_sessions": "Total Sessions",
+        "attended_sessions": "Attended Sessions",
+        "attendance_percentage": "Attendance %",
+        "grade_points": "Grade Points",
+    }, filename)
@@ -0,0 +1,216 @@
+"""
+Generate a synthetic attendance database at a configurable scale.
+
+The dataset mirrors a real semester:
+- Students have a per-student attendance propensity drawn around the target
+  rate, so grades spread across every band instead of all landing on one.
+- Regular sessions fall on Monday/Wednesday/Friday and end with a session
+  today. Two test sessions are also created for today.
+- Attendance on past sessions is marked in the first minutes of the 8 AM
+  window.
+- Every session has a short token history. Tokens past the retention
+  cutoff are moved into the archive, the same way the sweeper does it.
+- Today's regular session has an active token, BENCH_TOKEN, for marking
+  benchmarks.
+
+Rows are written with chunked executemany inserts, so 100k students x 120
+sessions fits in a few minutes on SQLite.
+
+Usage:
+    python -m benchmarks.dataset --url sqlite:///./bench.db --students 100000 --sessions 120 --attendance 0.6
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Token of today's regular session, active for the rest of the day
+BENCH_TOKEN = "424242"
+# Password of every generated student
+BENCH_PASSWORD = "password123"
+CHUNK_SIZE = 20000
+
+
+def session_dates(count: int, today: date) -> list:
+    """Return count Monday/Wednesday/Friday dates ending with today, oldest first."""
+    dates = [today]
+    day = today
+    while len(dates) < count:
+        day -= timedelta(days=1)
+        if day.weekday() in (0, 2, 4):
+            dates.append(day)
+    return sorted(dates)
+
+
+def _insert_chunks(conn, table, rows) -> int:
+    """executemany rows into table in CHUNK_SIZE batches. Returns rows written."""
+    from sqlalchemy import insert
+
+    written = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            conn.execute(insert(table), chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        conn.execute(insert(table), chunk)
+        written += len(chunk)
+    return written
+
+
+def generate(url: str, students: int = 1000, sessions: int = 30, attendance: float = 0.6,
+             tokens_per_session: int = 4, seed: int = 42) -> dict:
+    """
+    Build a fresh database at url and fill it with a synthetic semester.
+
+    Args:
+        url: Database URL (must point at an empty database)
+        students: Number of students
+        sessions: Number of regular sessions (the last one is today)
+        attendance: Mean share of sessions each student attends (0-1)
+        tokens_per_session: Tokens generated per session
+        seed: Random seed, so the same arguments give the same data
+
+    Returns:
+        Summary with row counts, ids used by the benchmarks and timings
+    """
+    from app import auth, maintenance, migrations, models
+    from app.database import create_db_engine
+    from sqlalchemy.orm import Session as OrmSession
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    db_engine = create_db_engine(url, profile="throughput")
+    migrations.upgrade(db_engine)
+
+    today = date.today()
+    now = datetime.utcnow()
+    hashed_password = auth.hash_password(BENCH_PASSWORD)  # bcrypt once, shared by every student
+    counts = {}
+
+    with db_engine.begin() as conn:
+        counts["students"] = _insert_chunks(conn, models.Student.__table__, (
+            {
+                "uin": f"{i:09d}",
+                "name": f"Student{i:06d}, Bench",
+                "hashed_password": hashed_password,
+                "is_registered": True,
+                "is_enrolled": True,
+                "created_at": now,
+            } for i in range(1, students + 1)
+        ))
+
+        session_rows = [
+            {"date": datetime.combine(day, datetime.min.time()), "is_test_session": False, "created_at": now}
+            for day in session_dates(sessions, today)
+        ] + [
+            {"date": datetime.combine(today, datetime.min.time()), "is_test_session": True, "created_at": now}
+            for _ in range(2)
+        ]
+        counts["sessions"] = _insert_chunks(conn, models.Session.__table__, session_rows)
+        conn.execute(models.AdminSettings.__table__.insert().values(disable_time_restrictions=True))
+
+    db = OrmSession(bind=db_engine)
+    try:
+        student_ids = [row[0] for row in db.query(models.Student.id).order_by(models.Student.id)]
+        all_sessions = db.query(models.Session).order_by(models.Session.date, models.Session.id).all()
+        today_session = next(s for s in all_sessions if s.date.date() == today and not s.is_test_session)
+        past_sessions = [s for s in all_sessions if s.date.date() < today]
+
+        # Per-student propensity with mean `attendance` (Beta(4p, 4(1-p)))
+        attendance = min(max(attendance, 0.01), 0.99)
+        propensity = {
+            student_id: rng.betavariate(4 * attendance, 4 * (1 - attendance))
+            for student_id in student_ids
+        }
+
+        def attendance_rows():
+            for session in past_sessions:
+                window_start = session.date + timedelta(hours=8)
+                for student_id in student_ids:
+                    if rng.random() < propensity[student_id]:
+                        yield {
+                            "student_id": student_id,
+                            "session_id": session.id,
+                            "marked_at": window_start + timedelta(seconds=rng.randint(0, 299)),
+                        }
+
+        def token_rows():
+            for session in all_sessions:
+                window_start = session.date + timedelta(hours=8)
+                for n in range(tokens_per_session):
+                    created_at = window_start + timedelta(minutes=5 * n)
+                    yield {
+                        "session_id": session.id,
+                        "token": f"{rng.randint(0, 999999):06d}",
+                        "created_at": created_at,
+                        "expires_at": created_at + timedelta(minutes=5),
+                        "is_active": False,
+                    }
+            yield {
+                "session_id": today_session.id,
+                "token": BENCH_TOKEN,
+                "created_at": now,
+                "expires_at": datetime.combine(today, datetime.max.time()),
+                "is_active": True,
+            }
+
+        conn = db.connection()
+        counts["attendances"] = _insert_chunks(conn, models.Attendance.__table__, attendance_rows())
+        counts["tokens"] = _insert_chunks(conn, models.SessionToken.__table__, token_rows())
+        db.commit()
+
+        counts["tokens_archived"] = maintenance.archive_expired_tokens(db, now)
+        db.commit()
+
+        unmarked = db.query(models.Student.id).filter(
+            ~models.Student.attendances.any(models.Attendance.session_id == today_session.id)
+        ).count()
+    finally:
+        db.close()
+        db_engine.dispose()
+
+    return {
+        "url": url,
+        "seed": seed,
+        "attendance_target": attendance,
+        "counts": counts,
+        "today_session_id": today_session.id,
+        "token": BENCH_TOKEN,
+        "students_unmarked_today": unmarked,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic attendance database")
+    parser.add_argument("--url", default="sqlite:///./bench.db", help="Database URL (fresh database)")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=30, help="Regular sessions, ending today")
+    parser.add_argument("--attendance", type=float, default=0.6, help="Mean attendance rate (0-1)")
+    parser.add_argument("--tokens-per-session", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    summary = generate(args.url, args.students, args.sessions, args.attendance,
+                       args.tokens_per_session, args.seed)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"✅ Generated {args.url} in {summary['seconds']}s")
+    for table, count in summary["counts"].items():
+        print(f"   {table:<18}{count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark attendance-marking throughput across SQLite performance profiles.
+
+Each profile gets a fresh temporary database seeded with students, one
+session and an active token. Worker threads then replay the query sequence
+of mark_attendance (session lookup, settings lookup, token check, duplicate
+check, insert + commit) while a reader thread polls attendance counts the way
+the admin dashboard does.
+
+Usage:
+    python -m benchmarks.db_profiles [--students 400] [--threads 8] [--profiles legacy,balanced]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, SQLITE_PROFILES, create_db_engine
+from app import models
+
+
+def seed(SessionFactory, student_count: int) -> int:
+    """Create students, one session and an active token. Returns the session id."""
+    db = SessionFactory()
+    try:
+        db.add_all([
+            models.Student(uin=f"{i:09d}", name=f"Student {i}", hashed_password="", is_registered=True)
+            for i in range(student_count)
+        ])
+        session = models.Session(date=datetime.utcnow(), is_test_session=True)
+        db.add(session)
+        db.add(models.AdminSettings(disable_time_restrictions=True))
+        db.flush()
+        db.add(models.SessionToken(
+            session_id=session.id,
+            token="123456",
+            expires_at=datetime.utcnow() + timedelta(hours=1),
+            is_active=True
+        ))
+        db.commit()
+        return session.id
+    finally:
+        db.close()
+
+
+def mark(SessionFactory, student_id: int, session_id: int) -> None:
+    """Replay the query sequence of the mark_attendance endpoint."""
+    db = SessionFactory()
+    try:
+        db.query(models.Session).filter(models.Session.id == session_id).first()
+        db.query(models.AdminSettings).first()
+        db.query(models.SessionToken).filter(
+            models.SessionToken.session_id == session_id,
+            models.SessionToken.token == "123456",
+            models.SessionToken.is_active == True,
+            models.SessionToken.expires_at >= datetime.utcnow()
+        ).first()
+        db.query(models.Attendance).filter(
+            models.Attendance.student_id == student_id,
+            models.Attendance.session_id == session_id
+        ).first()
+        db.add(models.Attendance(student_id=student_id, session_id=session_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_profile(profile: str, student_count: int, thread_count: int) -> dict:
+    """Run the marking workload against one profile and return its results."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db", profile=profile)
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        session_id = seed(SessionFactory, student_count)
+
+        student_ids = list(range(1, student_count + 1))
+        lock_errors = [0]
+        reads = [0]
+        stop_reader = threading.Event()
+
+        def writer(ids):
+            for student_id in ids:
+                try:
+                    mark(SessionFactory, student_id, session_id)
+                except OperationalError:
+                    lock_errors[0] += 1
+
+        def reader():
+            while not stop_reader.is_set():
+                db = SessionFactory()
+                try:
+                    db.query(models.Attendance).count()
+                    reads[0] += 1
+                except OperationalError:
+                    lock_errors[0] += 1
+                finally:
+                    db.close()
+
+        workers = [
+            threading.Thread(target=writer, args=(student_ids[i::thread_count],))
+            for i in range(thread_count)
+        ]
+        reader_thread = threading.Thread(target=reader)
+
+        start = time.perf_counter()
+        reader_thread.start()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        stop_reader.set()
+        reader_thread.join()
+        engine.dispose()
+
+        marked = student_count - lock_errors[0]
+        return {
+            "profile": profile,
+            "students": student_count,
+            "threads": thread_count,
+            "seconds": round(elapsed, 3),
+            "marks_per_second": round(marked / elapsed, 1),
+            "dashboard_reads": reads[0],
+            "lock_errors": lock_errors[0],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare mark throughput across SQLite profiles")
+    parser.add_argument("--students", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--profiles", default=",".join(SQLITE_PROFILES))
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    results = [
+        run_profile(profile, args.students, args.threads)
+        for profile in args.profiles.split(",")
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'profile':<12}{'seconds':>10}{'marks/s':>10}{'reads':>8}{'locked':>8}")
+    for r in results:
+        print(f"{r['profile']:<12}{r['seconds']:>10}{r['marks_per_second']:>10}"
+              f"{r['dashboard_reads']:>8}{r['lock_errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
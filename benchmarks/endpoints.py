@@ -0,0 +1,175 @@
+"""
+Repeatable benchmarks of the grading and reporting hot paths.
+
+The endpoint functions are called directly with a database session, so the
+numbers measure query and Python work without HTTP overhead. Run against a
+database built by benchmarks.dataset:
+
+    python -m benchmarks.dataset --url sqlite:///./bench.db --students 100000 --sessions 120
+    python -m benchmarks.endpoints --url sqlite:///./bench.db --json > results.json
+
+mark_attendance inserts real rows; they are deleted again afterwards so
+repeated runs see the same data.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCHMARKS = ["calculate_grade", "students_grades", "export_excel", "mark_attendance", "my_records", "dashboard"]
+
+
+def measure(func, iterations: int, warmup: int = 1) -> dict:
+    """
+    Time func over several iterations after a warm-up.
+
+    Returns:
+        Timing summary in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)], 3),
+        "min_ms": round(samples[0], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def run(names, iterations: int) -> dict:
+    """Run the selected benchmarks against settings.DATABASE_URL."""
+    from datetime import date
+
+    from app import models, schemas, utils
+    from app.database import SessionLocal
+    from app.routers import admin, student
+
+    db = SessionLocal()
+    try:
+        today_session = db.query(models.Session).filter(
+            models.Session.is_test_session == False,
+            models.Session.date >= date.today()
+        ).order_by(models.Session.date).first()
+        token = db.query(models.SessionToken.token).filter(
+            models.SessionToken.session_id == today_session.id,
+            models.SessionToken.is_active == True
+        ).scalar()
+        student_ids = [row[0] for row in db.query(models.Student.id).filter(
+            ~models.Student.attendances.any(models.Attendance.session_id == today_session.id)
+        ).order_by(models.Student.id)]
+        sample_student_id = db.query(models.Student.id).order_by(models.Student.id).limit(1).scalar()
+        dataset = {
+            "students": db.query(models.Student).count(),
+            "sessions": db.query(models.Session).count(),
+            "attendances": db.query(models.Attendance).count(),
+            "tokens": db.query(models.SessionToken).count(),
+        }
+    finally:
+        db.close()
+
+    def with_session(func):
+        def call():
+            db = SessionLocal()
+            try:
+                return func(db)
+            finally:
+                db.close()
+        return call
+
+    def export_excel(db):
+        result = admin.export_attendance_excel(admin="bench", db=db)
+        os.remove(result["path"])
+
+    marked = []
+
+    def mark(db):
+        student_id = student_ids[len(marked)]
+        req = schemas.AttendanceMarkRequest(session_id=today_session.id, token=token)
+        student.mark_attendance(req, student_id=student_id, db=db)
+        marked.append(student_id)
+
+    grades = [i / 10 for i in range(1001)]
+    benchmarks = {
+        "calculate_grade": lambda: [utils.calculate_grade(p) for p in grades],
+        "students_grades": with_session(lambda db: admin.get_all_student_grades(admin="bench", db=db)),
+        "export_excel": with_session(export_excel),
+        "mark_attendance": with_session(mark),
+        "my_records": with_session(lambda db: student.get_my_attendance(student_id=sample_student_id, db=db)),
+        "dashboard": with_session(lambda db: admin.get_dashboard_stats(admin="bench", db=db)),
+    }
+
+    results = {}
+    try:
+        for name in names:
+            count = iterations
+            if name == "mark_attendance":
+                # Each call needs a student who has not marked yet
+                count = min(iterations, max(len(student_ids) - 1, 0))
+                if count == 0:
+                    continue
+            elif name == "calculate_grade":
+                count = iterations * 100
+            results[name] = measure(benchmarks[name], count)
+    finally:
+        if marked:
+            db = SessionLocal()
+            try:
+                db.query(models.Attendance).filter(
+                    models.Attendance.session_id == today_session.id,
+                    models.Attendance.student_id.in_(marked)
+                ).delete(synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+
+    return {"dataset": dataset, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark grading and reporting hot paths")
+    parser.add_argument("--url", help="Database URL (defaults to DATABASE_URL)")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Comma-separated benchmark names")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    # Must be set before app.database builds its engine
+    if args.url:
+        os.environ["DATABASE_URL"] = args.url
+    os.chdir(ROOT)
+
+    names = [name for name in args.only.split(",") if name]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    report = run(names, args.iterations)
+    report["python"] = platform.python_version()
+    report["database"] = os.environ.get("DATABASE_URL", "default")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("Dataset: " + ", ".join(f"{count:,} {table}" for table, count in report["dataset"].items()))
+    print(f"{'benchmark':<18}{'iters':>7}{'mean ms':>11}{'p50 ms':>11}{'p95 ms':>11}")
+    for name, r in report["results"].items():
+        print(f"{name:<18}{r['iterations']:>7}{r['mean_ms']:>11}{r['p50_ms']:>11}{r['p95_ms']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Check the import-time budget of the web app.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter and
+fails when the cumulative import time exceeds the budget or when a heavy
+export-only dependency (pandas, openpyxl, numpy) is pulled in at startup.
+Those are loaded lazily by app/export.py and should stay that way, since
+every uvicorn worker pays the import cost and the memory.
+
+Usage:
+    python -m benchmarks.import_budget [--budget-ms 1500] [--module app.main] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the Excel export needs
+FORBIDDEN_MODULES = ("pandas", "openpyxl", "numpy")
+DEFAULT_BUDGET_MS = 1500.0
+
+
+def measure_imports(module: str) -> dict:
+    """
+    Import module in a fresh interpreter and parse the -X importtime report.
+
+    Returns:
+        Mapping of top-level package name to its cumulative import time (µs)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        timings[name] = max(timings.get(name, 0), int(cumulative))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if app startup imports regress")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    timings = measure_imports(args.module)
+    total_ms = timings.get(args.module, 0) / 1000
+    forbidden = sorted(name for name in timings if name.split(".")[0] in FORBIDDEN_MODULES)
+    forbidden_roots = sorted({name.split(".")[0] for name in forbidden})
+    slowest = sorted(
+        ((name, us) for name, us in timings.items() if "." not in name and name != args.module),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:10]
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "total_ms": round(total_ms, 1),
+            "budget_ms": args.budget_ms,
+            "forbidden_imports": forbidden_roots,
+            "slowest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in slowest],
+        }, indent=2))
+    else:
+        print(f"{args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        for name, us in slowest:
+            print(f"  {name:<24} {us / 1000:8.1f} ms")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms exceeds budget of {args.budget_ms:.0f} ms")
+    if forbidden_roots:
+        failures.append(f"export-only modules imported at startup: {', '.join(forbidden_roots)}")
+
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+    if not args.json:
+        print("✅ Import budget OK")
+
+
+if __name__ == "__main__":
+    main()
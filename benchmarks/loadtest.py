@@ -0,0 +1,336 @@
+"""
+8 AM burst load test against a locally started server.
+
+Builds a synthetic database (benchmarks.dataset), starts uvicorn on it and
+replays the morning rush:
+
+    login   every student opens the login page and signs in (bcrypt),
+            staggered over --login-window seconds
+    mark    the admin generates today's token; every student then opens
+            the attendance page, fetches settings and today's sessions,
+            submits the token and views their records, staggered over
+            --mark-window seconds. Some students first type a wrong token
+            (--wrong-rate) and some submit twice (--duplicate-rate).
+    admin   in the background the admin dashboard polls grades and stats
+            every --poll-interval seconds, like the real page does
+
+Each phase reports p50/p95/p99 latency, unexpected responses by status and
+the database lock errors found in the server log. Everything runs offline
+against SQLite or a local PostgreSQL (--url).
+
+Usage:
+    python -m benchmarks.loadtest --students 400 --workers 2 [--url postgresql://...] [--json]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config import settings
+from benchmarks.dataset import BENCH_PASSWORD, generate
+
+# SQLite and PostgreSQL lock failures as they appear in the server log
+LOCK_ERROR = re.compile(r"database is locked|database table is locked|deadlock detected|lock timeout")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: list, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+class Recorder:
+    """Latency samples and unexpected outcomes per phase, shared by all client threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.endpoints = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def record(self, phase: str, endpoint: str, elapsed_ms: float, outcome: str = None):
+        with self.lock:
+            self.latencies[phase].append(elapsed_ms)
+            self.endpoints[(phase, endpoint)].append(elapsed_ms)
+            if outcome:
+                self.errors[phase][outcome] += 1
+
+
+class Client:
+    """One keep-alive HTTP connection, like a browser tab."""
+
+    def __init__(self, port: int, recorder: Recorder):
+        self.port = port
+        self.recorder = recorder
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.headers = {}
+
+    def request(self, phase: str, method: str, path: str, body: dict = None,
+                expected=(200,), endpoint: str = None):
+        """Send a request and record its latency; returns (status, parsed JSON or None)."""
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        start = time.perf_counter()
+        for attempt in (1, 2):
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                status = response.status
+                break
+            except (OSError, http.client.HTTPException) as exc:
+                self.conn.close()
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+                # The server may have closed an idle keep-alive connection; retry once like a browser
+                stale = isinstance(exc, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if attempt == 1 and stale:
+                    start = time.perf_counter()
+                    continue
+                self.recorder.record(phase, endpoint or path, (time.perf_counter() - start) * 1000,
+                                     type(exc).__name__)
+                return None, None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        outcome = None if status in expected else f"HTTP {status} {endpoint or path}"
+        self.recorder.record(phase, endpoint or path, elapsed_ms, outcome)
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def close(self):
+        self.conn.close()
+
+
+def start_server(database_url: str, port: int, workers: int, log_path: str):
+    """Start uvicorn in a subprocess and wait until /ready answers 200."""
+    env = dict(os.environ, DATABASE_URL=database_url, TOKEN_SWEEP_INTERVAL_SECONDS="0")
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {log_path}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not become ready within 60 seconds")
+
+
+def count_lock_errors(log_path: str, offset: int):
+    """Count lock errors logged after offset; returns (count, new offset)."""
+    with open(log_path, "rb") as f:
+        f.seek(offset)
+        text = f.read().decode("utf-8", "replace")
+        return len(LOCK_ERROR.findall(text)), f.tell()
+
+
+def run(args) -> dict:
+    """Build the dataset, start the server and drive the scenario."""
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    database_url = args.url or f"sqlite:///{workdir}/loadtest.db"
+    dataset = generate(database_url, students=args.students, sessions=args.sessions, seed=args.seed)
+    log_path = os.path.join(workdir, "server.log")
+    port = free_port()
+    server = start_server(database_url, port, args.workers, log_path)
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    uins = [f"{i:09d}" for i in range(1, args.students + 1)]
+    clients = {}
+    phase_windows = {}
+    lock_errors = {}
+    log_offset = 0
+
+    try:
+        admin = Client(port, recorder)
+        _, body = admin.request("admin", "POST", "/api/admin/login",
+                                {"username": args.admin_user, "password": args.admin_password})
+        admin.headers["Authorization"] = f"Bearer {body['access_token']}"
+
+        stop_polling = threading.Event()
+
+        def poll_admin():
+            poller = Client(port, recorder)
+            poller.headers = dict(admin.headers)
+            while not stop_polling.is_set():
+                poller.request("admin", "GET", "/api/admin/students/grades", expected=(200, 503))
+                poller.request("admin", "GET", "/api/admin/dashboard", expected=(200, 503))
+                stop_polling.wait(args.poll_interval)
+            poller.close()
+
+        poller_thread = threading.Thread(target=poll_admin, daemon=True)
+        poller_thread.start()
+
+        def staggered(window: float, action):
+            """Run action(uin) for every student, start times spread uniformly over window."""
+            offsets = sorted(rng.uniform(0, window) for _ in uins)
+            plan = list(zip(offsets, rng.sample(uins, len(uins))))
+            started = time.perf_counter()
+
+            def task(item):
+                offset, uin = item
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                action(uin)
+
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(task, plan))
+            return time.perf_counter() - started
+
+        # Phase 1: staggered logins
+        def login(uin):
+            client = clients[uin] = Client(port, recorder)
+            client.request("login", "GET", "/", endpoint="GET /")
+            status, body = client.request("login", "POST", "/api/student/login",
+                                          {"uin": uin, "password": BENCH_PASSWORD},
+                                          endpoint="POST /api/student/login")
+            if status == 200:
+                client.headers["Authorization"] = f"Bearer {body['access_token']}"
+
+        phase_windows["login"] = staggered(args.login_window, login)
+        lock_errors["login"], log_offset = count_lock_errors(log_path, log_offset)
+
+        # Phase 2: the admin puts up a token, everyone marks
+        _, body = admin.request("admin", "POST", "/api/admin/tokens/generate",
+                                {"session_id": dataset["today_session_id"]})
+        token = body["token"]
+        wrong_token = f"{(int(token) + 1) % 1000000:06d}"
+
+        def mark(uin):
+            client = clients.get(uin)
+            if client is None or "Authorization" not in client.headers:
+                return
+            client.request("mark", "GET", "/attendance", endpoint="GET /attendance")
+            client.request("mark", "GET", "/api/admin/settings", endpoint="GET /api/admin/settings")
+            client.request("mark", "GET", "/api/student/sessions/today",
+                           endpoint="GET /api/student/sessions/today")
+            submission = {"session_id": dataset["today_session_id"], "token": token}
+            if rng.random() < args.wrong_rate:
+                client.request("mark", "POST", "/api/student/attendance/mark",
+                               dict(submission, token=wrong_token), expected=(403,),
+                               endpoint="POST mark (wrong token)")
+            client.request("mark", "POST", "/api/student/attendance/mark", submission,
+                           endpoint="POST mark")
+            if rng.random() < args.duplicate_rate:
+                client.request("mark", "POST", "/api/student/attendance/mark", submission,
+                               expected=(400,), endpoint="POST mark (duplicate)")
+            client.request("mark", "GET", "/api/student/attendance/my-records",
+                           endpoint="GET /api/student/attendance/my-records")
+
+        phase_windows["mark"] = staggered(args.mark_window, mark)
+        lock_errors["mark"], log_offset = count_lock_errors(log_path, log_offset)
+
+        stop_polling.set()
+        poller_thread.join()
+        lock_errors["admin"] = None  # Overlaps both phases; its lock errors are counted there
+        for client in clients.values():
+            client.close()
+        admin.close()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    phases = {}
+    for phase in ("login", "mark", "admin"):
+        samples = recorder.latencies.get(phase, [])
+        phases[phase] = {
+            "requests": len(samples),
+            "seconds": round(phase_windows.get(phase, 0), 2) or None,
+            "p50_ms": round(percentile(samples, 0.50), 1),
+            "p95_ms": round(percentile(samples, 0.95), 1),
+            "p99_ms": round(percentile(samples, 0.99), 1),
+            "max_ms": round(max(samples), 1) if samples else 0.0,
+            "errors": dict(recorder.errors.get(phase, {})),
+            "db_lock_errors": lock_errors.get(phase),
+            "endpoints": {
+                endpoint: {
+                    "requests": len(values),
+                    "p50_ms": round(percentile(values, 0.50), 1),
+                    "p95_ms": round(percentile(values, 0.95), 1),
+                    "p99_ms": round(percentile(values, 0.99), 1),
+                }
+                for (endpoint_phase, endpoint), values in sorted(recorder.endpoints.items())
+                if endpoint_phase == phase
+            },
+        }
+
+    return {
+        "database": database_url,
+        "students": args.students,
+        "workers": args.workers,
+        "server_log": log_path,
+        "phases": phases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the 8 AM attendance burst against a local server")
+    parser.add_argument("--url", help="Empty database to use (default: a temporary SQLite file)")
+    parser.add_argument("--students", type=int, default=400)
+    parser.add_argument("--sessions", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=100, help="Client threads")
+    parser.add_argument("--login-window", type=float, default=30.0, help="Seconds over which logins spread")
+    parser.add_argument("--mark-window", type=float, default=60.0, help="Seconds over which marks spread")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Admin dashboard poll interval")
+    parser.add_argument("--wrong-rate", type=float, default=0.15, help="Share of students mistyping first")
+    parser.add_argument("--duplicate-rate", type=float, default=0.10, help="Share submitting twice")
+    parser.add_argument("--admin-user", default=settings.ADMIN_USER_1)
+    parser.add_argument("--admin-password", default=settings.ADMIN_PASSWORD)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{args.students} students, {args.workers} worker(s), {report['database']}")
+    print(f"{'phase':<8}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'locks':>8}  errors")
+    for phase, r in report["phases"].items():
+        locks = "-" if r["db_lock_errors"] is None else r["db_lock_errors"]
+        errors = ", ".join(f"{name}: {count}" for name, count in r["errors"].items()) or "none"
+        print(f"{phase:<8}{r['requests']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{locks:>8}  {errors}")
+    print(f"Server log: {report['server_log']}")
+
+
+if __name__ == "__main__":
+    main()
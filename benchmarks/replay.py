@@ -0,0 +1,315 @@
+"""
+Replay captured production traffic against a local instance.
+
+Reads capture files written by app/capture.py (CAPTURE_ENABLED=true) and
+re-issues every request at the captured pace, or --speed times faster.
+Each principal (student, admin or anonymous connection) replays on its own
+keep-alive connection in captured order, so refresh storms, retries and
+double submits arrive with their original inter-arrival gaps.
+
+Captures are anonymized, so the replay maps them onto the target:
+- Pseudonymous students become target students in order of first
+  appearance (UINs 000000001, 000000002, ... as made by
+  benchmarks.dataset), logging in with --password. A login that failed
+  when captured is replayed with a wrong password.
+- Admins log in with --admin-user/--admin-password.
+- Captured session ids map onto the target's sessions for today, in order
+  of first appearance (or --session-map 12=3,13=4).
+- "<valid>" tokens become the target's current token for that session (one
+  is generated up front, and replayed token generations replace it).
+  "<invalid>" tokens become a wrong token.
+
+The mapping depends only on the capture, so the same capture against the
+same database replays the same requests.
+
+Usage:
+    python -m benchmarks.replay captures/*.jsonl.gz --port 8000 [--speed 2] [--json]
+    python -m benchmarks.replay captures/*.jsonl.gz --start-server --students 400
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.config import settings
+from benchmarks.dataset import BENCH_PASSWORD, generate
+from benchmarks.loadtest import Client, Recorder, free_port, percentile, start_server
+
+REDACTED = "<redacted>"
+VALID_TOKEN = "<valid>"
+INVALID_TOKEN = "<invalid>"
+WRONG_PASSWORD = "not-the-password"
+
+
+def load_records(paths) -> list:
+    """Read capture files (gzip or plain JSON lines), ordered by arrival time."""
+    records = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda record: record["t"])  # Stable, so ties keep file order
+    return records
+
+
+class Mapping:
+    """Deterministic assignment of captured pseudonyms to target identities."""
+
+    def __init__(self, uin_format: str, session_ids: list, session_map: dict):
+        self.uin_format = uin_format
+        self.uins = {}
+        self.target_sessions = session_ids
+        self.sessions = dict(session_map)
+
+    def uin(self, pseudonym: str) -> str:
+        if pseudonym not in self.uins:
+            self.uins[pseudonym] = self.uin_format.format(len(self.uins) + 1)
+        return self.uins[pseudonym]
+
+    def session(self, captured_id) -> int:
+        captured_id = str(captured_id)
+        if captured_id not in self.sessions:
+            if not self.target_sessions:
+                raise RuntimeError("The target has no sessions today; pass --session-map")
+            self.sessions[captured_id] = self.target_sessions[len(self.sessions) % len(self.target_sessions)]
+        return self.sessions[captured_id]
+
+
+class Replayer:
+    """Turns captured records into requests and runs one thread per principal."""
+
+    def __init__(self, args, records: list):
+        self.args = args
+        self.records = records
+        self.port = args.port
+        self.recorder = Recorder()
+        self.results = defaultdict(lambda: {"statuses": Counter(), "matched": 0, "replayed": [], "captured": []})
+        self.lock = threading.Lock()
+        self.tokens = {}  # target session id -> current token
+        self.skipped = Counter()
+        self.lag_ms = []
+
+    def setup(self):
+        """Log in as admin, discover today's sessions and make sure each has a token."""
+        self.admin = Client(self.port, self.recorder)
+        _, body = self.admin.request("setup", "POST", "/api/admin/login",
+                                     {"username": self.args.admin_user, "password": self.args.admin_password})
+        self.admin.headers["Authorization"] = f"Bearer {body['access_token']}"
+        _, body = self.admin.request("setup", "GET", "/api/admin/sessions/today")
+        session_ids = [session["id"] for session in body["sessions"]]
+
+        session_map = {}
+        for pair in filter(None, (self.args.session_map or "").split(",")):
+            captured, target = pair.split("=")
+            session_map[captured] = int(target)
+        self.mapping = Mapping(self.args.uin_format, session_ids, session_map)
+
+        # Assign identities and sessions in capture order so the mapping is deterministic
+        for record in self.records:
+            if record.get("who", "").startswith(("student:", "uin:")):
+                self.mapping.uin(record["who"])
+            if "session_id" in record.get("p", {}):
+                self.mapping.session(record["p"]["session_id"])
+            if isinstance(record.get("b"), dict) and "session_id" in record["b"]:
+                self.mapping.session(record["b"]["session_id"])
+
+        for target in sorted(set(self.mapping.sessions.values())):
+            _, body = self.admin.request("setup", "POST", "/api/admin/tokens/generate", {"session_id": target})
+            self.tokens[target] = body["token"]
+
+    def _map_body(self, record: dict, value):
+        if isinstance(value, dict):
+            mapped = {}
+            for key, item in value.items():
+                if key in ("password", "new_password") and item == REDACTED:
+                    mapped[key] = self._password(record)
+                elif key in ("name", "student_name") and item == REDACTED:
+                    mapped[key] = "Replay, Student"
+                elif key in ("uin", "student_uin") and isinstance(item, str) and item.startswith("uin:"):
+                    mapped[key] = self.mapping.uin(record["who"] if record["r"] == "/api/student/login" else item)
+                elif key == "username" and record["r"] == "/api/admin/login":
+                    mapped[key] = self.args.admin_user
+                elif key == "session_id":
+                    mapped[key] = self.mapping.session(item)
+                else:
+                    mapped[key] = self._map_body(record, item)
+            if value.get("token") in (VALID_TOKEN, INVALID_TOKEN):
+                token = self.tokens.get(mapped.get("session_id"), "000000")
+                mapped["token"] = token if value["token"] == VALID_TOKEN else f"{(int(token) + 1) % 1000000:06d}"
+            return mapped
+        if isinstance(value, list):
+            return [self._map_body(record, item) for item in value]
+        return value
+
+    def _password(self, record: dict) -> str:
+        if record["s"] != 200:
+            return WRONG_PASSWORD
+        return self.args.admin_password if record["r"] == "/api/admin/login" else self.args.password
+
+    def _path(self, record: dict) -> str:
+        params = dict(record.get("p", {}))
+        if "session_id" in params:
+            params["session_id"] = self.mapping.session(params["session_id"])
+        path = record["r"].format(**params)
+        return f"{path}?{record['q']}" if record.get("q") else path
+
+    def _login(self, client: Client, who: str) -> None:
+        """Log in a principal whose login happened before the capture started."""
+        if who.startswith("admin:"):
+            client.headers["Authorization"] = self.admin.headers["Authorization"]
+        elif who.startswith("student:"):
+            _, body = client.request("setup", "POST", "/api/student/login",
+                                     {"uin": self.mapping.uin(who), "password": self.args.password})
+            if body and "access_token" in body:
+                client.headers["Authorization"] = f"Bearer {body['access_token']}"
+
+    def replay_principal(self, who: str, records: list, t0: float, started: float) -> None:
+        client = Client(self.port, self.recorder)
+        for record in records:
+            if "body_bytes" in record:
+                # Uploads are captured by size only
+                self.skipped["non-JSON body"] += 1
+                continue
+            is_login = record["r"] in ("/api/student/login", "/api/admin/login")
+            if not is_login and "Authorization" not in client.headers and who.startswith(("student:", "admin:")):
+                self._login(client, who)
+
+            due = started + (record["t"] - t0) / self.args.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                with self.lock:
+                    self.lag_ms.append(-delay * 1000)
+
+            body = self._map_body(record, record["b"]) if "b" in record else None
+            if record.get("course"):
+                client.headers["X-Course"] = record["course"]
+            else:
+                client.headers.pop("X-Course", None)
+            request_start = time.perf_counter()
+            status, response = client.request("replay", record["m"], self._path(record), body,
+                                              expected=(record["s"],), endpoint=record["r"])
+            elapsed_ms = (time.perf_counter() - request_start) * 1000
+
+            if is_login and status == 200 and response:
+                client.headers["Authorization"] = f"Bearer {response['access_token']}"
+            if record["r"] == "/api/admin/tokens/generate" and status == 200 and response:
+                with self.lock:
+                    self.tokens[response["session_id"]] = response["token"]
+
+            with self.lock:
+                result = self.results[f"{record['m']} {record['r']}"]
+                result["statuses"][status] += 1
+                result["matched"] += status == record["s"]
+                result["replayed"].append(elapsed_ms)
+                result["captured"].append(record["d"])
+        client.close()
+
+    def run(self) -> dict:
+        by_principal = defaultdict(list)
+        for record in self.records:
+            by_principal[record.get("who") or "anonymous"].append(record)
+
+        t0 = self.records[0]["t"]
+        started = time.perf_counter() + 0.5  # Let every thread get ready first
+        threads = [
+            threading.Thread(target=self.replay_principal, args=(who, records, t0, started), daemon=True)
+            for who, records in by_principal.items()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        routes = {}
+        for route, result in sorted(self.results.items()):
+            count = len(result["replayed"])
+            routes[route] = {
+                "requests": count,
+                "status_match": round(result["matched"] / count, 3) if count else None,
+                "statuses": {str(code): n for code, n in result["statuses"].items()},
+                "replay_p50_ms": round(percentile(result["replayed"], 0.50), 1),
+                "replay_p95_ms": round(percentile(result["replayed"], 0.95), 1),
+                "replay_p99_ms": round(percentile(result["replayed"], 0.99), 1),
+                "captured_p50_ms": round(percentile(result["captured"], 0.50), 1),
+                "captured_p95_ms": round(percentile(result["captured"], 0.95), 1),
+                "captured_p99_ms": round(percentile(result["captured"], 0.99), 1),
+            }
+        return {
+            "records": len(self.records),
+            "principals": len(by_principal),
+            "speed": self.args.speed,
+            "captured_seconds": round(self.records[-1]["t"] - t0, 2),
+            "replay_seconds": round(wall, 2),
+            "late_requests": len(self.lag_ms),
+            "max_lag_ms": round(max(self.lag_ms), 1) if self.lag_ms else 0.0,
+            "skipped": dict(self.skipped),
+            "routes": routes,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a local instance")
+    parser.add_argument("captures", nargs="+", help="Capture files (.jsonl or .jsonl.gz)")
+    parser.add_argument("--port", type=int, default=settings.PORT, help="Port of the local instance")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay N times faster than captured")
+    parser.add_argument("--start-server", action="store_true",
+                        help="Build a synthetic database and start a local server to replay against")
+    parser.add_argument("--students", type=int, default=400, help="Students in the --start-server database")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for --start-server")
+    parser.add_argument("--uin-format", default="{:09d}", help="Target UIN for the n-th captured student")
+    parser.add_argument("--password", default=BENCH_PASSWORD, help="Password of the target students")
+    parser.add_argument("--admin-user", default=settings.ADMIN_USER_1)
+    parser.add_argument("--admin-password", default=settings.ADMIN_PASSWORD)
+    parser.add_argument("--session-map", help="Captured=target session ids, e.g. 12=3,13=4")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    records = load_records(args.captures)
+    if not records:
+        parser.error("The capture files contain no requests")
+
+    server = None
+    if args.start_server:
+        workdir = tempfile.mkdtemp(prefix="replay-")
+        database_url = f"sqlite:///{workdir}/replay.db"
+        generate(database_url, students=args.students)
+        port = free_port()
+        server = start_server(database_url, port, args.workers, os.path.join(workdir, "server.log"))
+        args.port = port
+
+    try:
+        replayer = Replayer(args, records)
+        replayer.setup()
+        report = replayer.run()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Replayed {report['records']} requests from {report['principals']} principals at {args.speed}x "
+          f"in {report['replay_seconds']}s (captured span {report['captured_seconds']}s)")
+    print(f"{'route':<52}{'reqs':>6}{'match':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'was p95':>9}")
+    for route, r in report["routes"].items():
+        print(f"{route:<52}{r['requests']:>6}{r['status_match']:>7}{r['replay_p50_ms']:>8}"
+              f"{r['replay_p95_ms']:>8}{r['replay_p99_ms']:>8}{r['captured_p95_ms']:>9}")
+    if report["skipped"]:
+        print("Skipped: " + ", ".join(f"{reason}: {n}" for reason, n in report["skipped"].items()))
+
+
+if __name__ == "__main__":
+    main()
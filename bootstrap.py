@@ -0,0 +1,119 @@
+"""
+Prepare the database for serving in a single process.
+
+Runs migrations and all seeding (sessions, roster students, test students)
+in one interpreter. A fingerprint of the schema version, seed inputs and
+database layout is stored in every database; when it matches, seeding is
+skipped entirely so restarts only pay for the migration check.
+
+Usage:
+    python bootstrap.py [--force]
+"""
+import sys
+import time
+import hashlib
+from contextlib import contextmanager
+
+from app import migrations
+from app.config import settings
+from app.database import course_keys, engine_for_course
+from app.roster import import_rosters
+from seed_sessions import seed_course_sessions
+from seed_students import CSV_FILES
+from seed_test_students import seed_course_test_students
+
+# Bump when the seed scripts change what they create
+SEED_VERSION = "1"
+
+FINGERPRINT_KEY = "seed_fingerprint"
+
+
+@contextmanager
+def timed(label: str, timings: list):
+    """Record how long a bootstrap step takes."""
+    start = time.perf_counter()
+    yield
+    timings.append((label, time.perf_counter() - start))
+
+
+def seed_fingerprint() -> str:
+    """Hash everything that determines the seeded data."""
+    digest = hashlib.sha256()
+    digest.update(f"seed:{SEED_VERSION};schema:{migrations.HEAD_VERSION};".encode())
+    for course in course_keys():
+        digest.update(f"course:{course}={settings.COURSE_DATABASE_URLS.get(course)};".encode())
+    for path in CSV_FILES:
+        digest.update(f"file:{path};".encode())
+        try:
+            with open(path, "rb") as file:
+                digest.update(hashlib.sha256(file.read()).digest())
+        except FileNotFoundError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def stored_fingerprints() -> dict:
+    """Read the stored seed fingerprint from every database."""
+    fingerprints = {}
+    for course in course_keys():
+        with engine_for_course(course).connect() as conn:
+            fingerprints[course] = migrations.get_state(conn, FINGERPRINT_KEY)
+    return fingerprints
+
+
+def store_fingerprint(fingerprint: str) -> None:
+    """Record the seed fingerprint in every database."""
+    for course in course_keys():
+        with engine_for_course(course).begin() as conn:
+            migrations.set_state(conn, FINGERPRINT_KEY, fingerprint)
+
+
+def bootstrap(force: bool = False):
+    """Migrate and seed all databases, skipping seeding when nothing changed."""
+    timings = []
+    total_start = time.perf_counter()
+    
+    print("🌱 Bootstrapping database...")
+    
+    with timed("migrations", timings):
+        migrations.upgrade_all()
+    
+    with timed("fingerprint check", timings):
+        fingerprint = seed_fingerprint()
+        up_to_date = all(
+            stored == fingerprint for stored in stored_fingerprints().values()
+        )
+    
+    if up_to_date and not force:
+        print("⏭️  Seed data unchanged since last bootstrap. Skipping seed.")
+    else:
+        with timed("sessions", timings):
+            for course in course_keys():
+                seed_course_sessions(course)
+        
+        with timed("roster students", timings):
+            summary = import_rosters(CSV_FILES)
+            for path in summary["missing"]:
+                print(f"⚠️  Warning: {path} not found, skipping...")
+            print(f"✅ Roster: {summary['added']} added, {summary['skipped']} already present")
+        
+        with timed("test students", timings):
+            for course in course_keys():
+                seed_course_test_students(course)
+        
+        store_fingerprint(fingerprint)
+    
+    print()
+    print("⏱️  Bootstrap timings:")
+    for label, seconds in timings:
+        print(f"   {label:<20} {seconds * 1000:8.1f} ms")
+    print(f"   {'total':<20} {(time.perf_counter() - total_start) * 1000:8.1f} ms")
+    print("✅ Database ready!")
+
+
+if __name__ == "__main__":
+    try:
+        bootstrap(force="--force" in sys.argv[1:])
+    except Exception as e:
+        print(f"❌ Bootstrap failed: {e}")
+        sys.exit(1)
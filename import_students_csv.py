@@ -3,119 +3,111 @@ Script to import student data from Canvas CSV files.
 Reads CSV files and populates the database with student UINs and names.
 
 Usage:
-    python import_students_csv.py <path_to_csv_file>
+    python import_students_csv.py <path_to_csv_file> [<path_to_csv_file> ...]
+    python import_students_csv.py sync [--dry-run] <path_to_csv_file> [...]
+    
+The sync command treats the files as the complete current roster: new
+students are added, renamed students updated and students missing from the
+roster marked as dropped (their attendance history is kept).
     
 Example:
     python import_students_csv.py "/Users/.../Grades-CSCE_704_600_.csv"
+    python import_students_csv.py sync "/Users/.../Grades-CSCE_704_600_.csv"
 """
 import sys
-import csv
-from app.database import SessionLocal, engine, Base
-from app.models import Student
+from app import migrations
+from app.roster import import_rosters, sync_rosters
+
+# Create all tables and apply pending migrations
+migrations.upgrade_all()
+
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+def print_import_summary(summary: dict):
+    """Print the result of a roster import."""
+    print()
+    print("=" * 60)
+    print("📊 IMPORT SUMMARY")
+    print("=" * 60)
+    for path in summary["missing"]:
+        print(f"⚠️  Not found: {path}")
+    for f in summary["files"]:
+        print(f"📂 {f['file']} ({f['course'] or 'no course'}): "
+              f"{f['added']} added, {f['skipped']} skipped in {f['seconds']:.2f}s")
+    print(f"✅ Successfully added: {summary['added']} students")
+    print(f"⏭️  Skipped: {summary['skipped']} students (already existed)")
+    print(f"⚡ {summary['rows']} rows in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second']:.0f} rows/second)")
+    print("=" * 60)
+    print()
 
 
-def import_students_from_csv(csv_path: str):
-    """Import students from Canvas CSV file."""
-    db = SessionLocal()
+def import_students_from_csv(*csv_paths: str):
+    """Import students from one or more Canvas CSV files."""
+    print("=" * 60)
+    print("📚 IMPORTING STUDENTS FROM CSV")
+    print("=" * 60)
     
     try:
-        print("=" * 60)
-        print("📚 IMPORTING STUDENTS FROM CSV")
-        print("=" * 60)
-        print(f"File: {csv_path}\n")
-        
-        added_count = 0
-        skipped_count = 0
-        error_count = 0
-        
-        with open(csv_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.DictReader(file)
-            
-            for row in csv_reader:
-                # Skip the "Points Possible" row
-                if row.get('Student', '').strip() == 'Points Possible':
-                    continue
-                
-                # Extract data
-                name = row.get('Student', '').strip()
-                uin = row.get('SIS User ID', '').strip()
-                
-                # Skip if no name or UIN
-                if not name or not uin or name == 'Student, Test':
-                    if name:
-                        print(f"⏭️  Skipped: {name} (missing UIN or test student)")
-                        skipped_count += 1
-                    continue
-                
-                # Check if student already exists
-                existing = db.query(Student).filter(
-                    Student.uin == uin
-                ).first()
-                
-                if existing:
-                    print(f"⏭️  Skipped: {name} (UIN: {uin}) - already exists")
-                    skipped_count += 1
-                    continue
-                
-                # Create new student (without password - they'll set it during registration)
-                try:
-                    student = Student(
-                        uin=uin,
-                        name=name,
-                        hashed_password="",  # Empty until student registers
-                        is_registered=False
-                    )
-                    
-                    db.add(student)
-                    print(f"✅ Added: {name} (UIN: {uin})")
-                    added_count += 1
-                    
-                except Exception as e:
-                    print(f"❌ Error adding {name} (UIN: {uin}): {e}")
-                    error_count += 1
-        
-        # Commit all changes
-        db.commit()
-        
-        print()
-        print("=" * 60)
-        print("📊 IMPORT SUMMARY")
-        print("=" * 60)
-        print(f"✅ Successfully added: {added_count} students")
-        print(f"⏭️  Skipped: {skipped_count} students")
-        print(f"❌ Errors: {error_count} students")
-        print(f"📈 Total students in database: {db.query(Student).count()}")
-        print("=" * 60)
-        print()
-        
-        if added_count > 0:
-            print("🎉 Import completed successfully!")
-            print()
-            print("📝 Students must now register by:")
-            print("   1. Going to http://localhost:8000/register")
-            print("   2. Entering their Name and UIN")
-            print("   3. Setting a password")
-        
-    except FileNotFoundError:
-        print(f"❌ Error: File not found: {csv_path}")
+        summary = import_rosters(list(csv_paths))
+    except Exception as e:
+        print(f"❌ Error occurred: {e}")
+        sys.exit(1)
+    
+    print_import_summary(summary)
+    
+    if summary["missing"] and not summary["files"]:
         sys.exit(1)
+    
+    if summary["added"] > 0:
+        print("🎉 Import completed successfully!")
+        print()
+        print("📝 Students must now register by:")
+        print("   1. Going to http://localhost:8000/student/register")
+        print("   2. Entering their Name and UIN")
+        print("   3. Setting a password")
+
+
+def sync_students_from_csv(*csv_paths: str, dry_run: bool = False):
+    """Apply only the roster changes (adds, renames, drops) from Canvas CSV files."""
+    print("=" * 60)
+    print(f"🔄 SYNCING ROSTER FROM CSV{' (DRY RUN)' if dry_run else ''}")
+    print("=" * 60)
+    
+    try:
+        summary = sync_rosters(list(csv_paths), dry_run=dry_run)
     except Exception as e:
         print(f"❌ Error occurred: {e}")
-        db.rollback()
         sys.exit(1)
-    finally:
-        db.close()
+    
+    for path in summary["missing"]:
+        print(f"⚠️  Not found: {path}")
+    for c in summary["courses"]:
+        print(f"📂 {c['course'] or 'no course'}: {c['added']} added, {c['updated']} updated, "
+              f"{c['dropped']} dropped, {c['unchanged']} unchanged")
+    print(f"⚡ {summary['rows']} rows in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second']:.0f} rows/second)")
+    
+    if summary["missing"] and not summary["courses"]:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python import_students_csv.py <path_to_csv_file>")
+    args = sys.argv[1:]
+    command = "import"
+    if args and args[0] == "sync":
+        command = "sync"
+        args = args[1:]
+    dry_run = "--dry-run" in args
+    args = [arg for arg in args if arg != "--dry-run"]
+    
+    if not args:
+        print("Usage: python import_students_csv.py <path_to_csv_file> [<path_to_csv_file> ...]")
+        print("       python import_students_csv.py sync [--dry-run] <path_to_csv_file> [...]")
         print("\nExample:")
         print("  python import_students_csv.py '/Users/.../Grades-CSCE_704_600_.csv'")
         sys.exit(1)
     
-    csv_path = sys.argv[1]
-    import_students_from_csv(csv_path)
+    if command == "sync":
+        sync_students_from_csv(*args, dry_run=dry_run)
+    else:
+        import_students_from_csv(*args)
@@ -0,0 +1,69 @@
+"""
+Script to bulk-load attendance from paper or kiosk sign-in sheets.
+Accepts a CSV file with a uin,session_id,marked_at header or a JSON list of
+{"uin", "session_id", "marked_at"} objects. marked_at is optional (ISO 8601).
+
+Usage:
+    python ingest_attendance.py <sheet.csv|sheet.json> [--course CSCE-439] [--report outcomes.csv]
+    
+Example:
+    python ingest_attendance.py signins_2026-02-04.csv --report outcomes.csv
+"""
+import sys
+import csv
+import time
+import argparse
+from app import migrations
+from app.database import SessionLocal
+from app.ingest import ingest_attendance, parse_records
+
+# Create all tables and apply pending migrations
+migrations.upgrade_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load attendance sign-in sheets")
+    parser.add_argument("path", help="CSV or JSON file with uin, session_id, marked_at")
+    parser.add_argument("--course", help="Course database to load into (sharded deployments)")
+    parser.add_argument("--report", help="Write per-row outcomes to this CSV file")
+    args = parser.parse_args()
+    
+    fmt = "json" if args.path.lower().endswith(".json") else "csv"
+    try:
+        with open(args.path, 'r', encoding='utf-8-sig') as file:
+            records = parse_records(file.read(), fmt)
+    except FileNotFoundError:
+        print(f"❌ Error: File not found: {args.path}")
+        sys.exit(1)
+    
+    print("=" * 60)
+    print("📝 INGESTING ATTENDANCE RECORDS")
+    print("=" * 60)
+    print(f"File: {args.path} ({len(records)} rows)\n")
+    
+    db = SessionLocal(info={"course": args.course})
+    start = time.perf_counter()
+    try:
+        result = ingest_attendance(db, records)
+    except Exception as e:
+        print(f"❌ Error occurred: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+    seconds = time.perf_counter() - start
+    
+    for status, count in sorted(result["counts"].items()):
+        print(f"   {status:<16} {count}")
+    print(f"\n⚡ {result['total']} rows in {seconds:.2f}s")
+    
+    if args.report:
+        with open(args.report, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=["row", "uin", "session_id", "status", "detail"])
+            writer.writeheader()
+            writer.writerows(result["results"])
+        print(f"📄 Per-row outcomes written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
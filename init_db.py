@@ -2,14 +2,13 @@
 Initialize database tables on startup.
 This ensures tables are created before seeding.
 """
-from app.database import engine
-from app.models import Base
+from app import migrations
 
 def init_db():
-    """Create all database tables."""
+    """Create all database tables and apply pending migrations."""
     print("🔧 Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables ready!")
+    for course, version in migrations.upgrade_all().items():
+        print(f"✅ Database tables ready for {course or 'default database'} (schema version {version})")
 
 if __name__ == "__main__":
     init_db()
@@ -1,7 +1,18 @@
 """
 Server entry point.
+
+Usage:
+    python run.py                 # Development: one process with auto-reload
+    python run.py --production    # Production: one worker per core, recycled periodically
+
+The mode can also be set with SERVER_MODE=production. Production uses
+gunicorn with uvicorn workers when gunicorn is installed (the app is
+preloaded once and forked), otherwise uvicorn's own process manager.
 """
+import argparse
+import math
 import os
+import random
 import sys
 import uvicorn
 from pathlib import Path
@@ -15,11 +26,180 @@ sys.path.insert(0, str(script_dir))
 
 from app.config import settings
 
-if __name__ == "__main__":
-    print(f"Starting server from: {os.getcwd()}")
+
+def _read_ints(*paths):
+    """Integer contents of each file, or None if any is missing or unreadable."""
+    try:
+        values = []
+        for path in paths:
+            with open(path) as f:
+                values.append(int(f.read().strip()))
+        return values
+    except (OSError, ValueError):
+        return None
+
+
+def cgroup_cpu_limit():
+    """
+    CPUs allowed by the container's CFS quota, rounded up, or None when unlimited.
+
+    Reads cgroup v2 (/sys/fs/cgroup/cpu.max) and falls back to cgroup v1
+    (cpu.cfs_quota_us / cpu.cfs_period_us).
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota == "max":
+            return None
+        quota, period = int(quota), int(period)
+    except (OSError, ValueError):
+        values = _read_ints("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if values is None:
+            return None
+        quota, period = values
+    if quota <= 0 or period <= 0:
+        return None  # -1 means no quota
+    return max(1, math.ceil(quota / period))
+
+
+def worker_count() -> int:
+    """Return the configured worker count, or one per CPU the process may use."""
+    if settings.WORKERS > 0:
+        return settings.WORKERS
+    try:
+        # CPU affinity (cpusets, taskset)
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # Affinity ignores CPU quotas (docker --cpus, Kubernetes limits), so cap by the cgroup quota
+    quota = cgroup_cpu_limit()
+    return min(cpus, quota) if quota else cpus
+
+
+def event_loop_and_parser():
+    """Pick uvloop and httptools when installed, else the pure-Python fallbacks."""
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    return loop, http
+
+
+def run_development():
+    """Single process with a file watcher."""
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
         reload=True
     )
+
+
+def run_gunicorn(workers: int):
+    """Preload the app in a gunicorn master and fork uvicorn workers from it."""
+    from gunicorn.app.base import BaseApplication
+
+    class AttendanceServer(BaseApplication):
+        def load_config(self):
+            config = {
+                "bind": f"{settings.HOST}:{settings.PORT}",
+                "workers": workers,
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                # Import the app once; workers share its pages copy-on-write.
+                # run_production disposes the pools before forking, and each
+                # worker opens its own connections in the app lifespan.
+                "preload_app": True,
+                "max_requests": settings.WORKER_MAX_REQUESTS,
+                "max_requests_jitter": settings.WORKER_MAX_REQUESTS_JITTER,
+                "graceful_timeout": settings.WORKER_GRACEFUL_TIMEOUT,
+                "keepalive": settings.KEEPALIVE_TIMEOUT,
+                "backlog": settings.BACKLOG,
+            }
+            for key, value in config.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    AttendanceServer().run()
+
+
+def run_uvicorn(workers: int):
+    """uvicorn's process manager: spawns workers and restarts any that exit."""
+    loop, http = event_loop_and_parser()
+    max_requests = settings.WORKER_MAX_REQUESTS or None
+    if max_requests and settings.WORKER_MAX_REQUESTS_JITTER:
+        # uvicorn applies one limit to every worker, so jitter once per launch
+        max_requests += random.randint(0, settings.WORKER_MAX_REQUESTS_JITTER)
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        limit_max_requests=max_requests,
+        timeout_keep_alive=settings.KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.WORKER_GRACEFUL_TIMEOUT,
+        backlog=settings.BACKLOG,
+        proxy_headers=True,
+        access_log=not settings.ACCESS_LOG_ENABLED,
+    )
+
+
+def run_production():
+    """Multi-process server sized to the machine."""
+    from app import cache, migrations
+
+    from app.database import dispose_engines
+
+    # Migrate once here so workers starting together only see the version fast path
+    migrations.upgrade_all()
+    # Forked workers must not inherit the master's pooled connections
+    dispose_engines()
+
+    workers = worker_count()
+    # Lockouts and Idempotency-Key records must be shared, or each worker enforces its own
+    cache_backend = cache.backend_for_workers(workers)
+    if cache_backend == "memory" and workers > 1:
+        print(f"WARNING: CACHE_BACKEND=memory with {workers} workers: token attempt limits and "
+              f"Idempotency-Key records are per worker, so a guesser gets {workers}x the attempt limit. "
+              f"Use CACHE_BACKEND=sqlite.", file=sys.stderr)
+    # Spawned workers read the environment; forked ones inherit settings
+    os.environ["CACHE_BACKEND"] = settings.CACHE_BACKEND = cache_backend
+    loop, http = event_loop_and_parser()
+    try:
+        import gunicorn  # noqa: F401
+        server = "gunicorn"
+    except ImportError:
+        server = "uvicorn"
+        print("WARNING: gunicorn is not installed (see requirements.txt); falling back to uvicorn's "
+              "process manager, which does not preload the app", file=sys.stderr)
+
+    print(f"Starting {workers} {server} worker(s) ({loop}, {http}, {cache_backend} cache) "
+          f"on {settings.HOST}:{settings.PORT}")
+    if server == "gunicorn":
+        run_gunicorn(workers)
+    else:
+        run_uvicorn(workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Attendance Wizard server")
+    parser.add_argument("--production", action="store_true",
+                        help="Multi-worker production mode (same as SERVER_MODE=production)")
+    args = parser.parse_args()
+
+    print(f"Starting server from: {os.getcwd()}")
+    if args.production or settings.SERVER_MODE == "production":
+        run_production()
+    else:
+        run_development()
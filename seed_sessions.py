@@ -8,33 +8,43 @@ from datetime import datetime, date
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal, engine
-from app.models import Base, Session as SessionModel, AdminSettings
+from app import migrations
+from app.database import SessionLocal, course_keys
+from app.models import Session as SessionModel, AdminSettings
 
 def seed_sessions():
-    """Create initial test sessions and admin settings."""
+    """Create initial test sessions and admin settings in every course database."""
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    migrations.upgrade_all()
     
-    db = SessionLocal()
+    for course in course_keys():
+        seed_course_sessions(course)
+
+
+def seed_course_sessions(course=None):
+    """Create initial test sessions and admin settings for one course database."""
+    db = SessionLocal(info={"course": course})
+    label = course or "database"
     try:
         # Check if sessions exist
         existing_count = db.query(SessionModel).count()
         if existing_count > 0:
-            print(f"⏭️  Database already has {existing_count} sessions. Skipping seed.")
+            print(f"⏭️  {label} already has {existing_count} sessions. Skipping seed.")
             return
         
-        print("🌱 Seeding database with sessions...")
+        print(f"🌱 Seeding {label} with sessions...")
         
         # Create 2 test sessions for today
         today = date.today()
         test_session1 = SessionModel(
             date=datetime.combine(today, datetime.min.time()),
-            is_test_session=True
+            is_test_session=True,
+            course=course
         )
         test_session2 = SessionModel(
             date=datetime.combine(today, datetime.min.time()),
-            is_test_session=True
+            is_test_session=True,
+            course=course
         )
         db.add(test_session1)
         db.add(test_session2)
@@ -54,7 +64,8 @@ def seed_sessions():
             session_date = datetime.strptime(date_str, "%Y-%m-%d")
             session = SessionModel(
                 date=session_date,
-                is_test_session=False
+                is_test_session=False,
+                course=course
             )
             db.add(session)
         
@@ -8,18 +8,25 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal, engine
-from app.models import Base, Student
+from app import migrations
+from app.database import SessionLocal, course_keys
+from app.models import Student
 from app.auth import hash_password
 
 def seed_test_students():
-    """Create 2 test students that are already registered."""
+    """Create the test students in every course database."""
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    migrations.upgrade_all()
     
-    db = SessionLocal()
+    for course in course_keys():
+        seed_course_test_students(course)
+
+
+def seed_course_test_students(course=None):
+    """Create 2 test students that are already registered."""
+    db = SessionLocal(info={"course": course})
     try:
-        print("🌱 Seeding test students...")
+        print(f"🌱 Seeding test students{f' for {course}' if course else ''}...")
         
         # Test Student 1
         test1_uin = "999999991"
@@ -32,7 +39,8 @@ def seed_test_students():
                 uin=test1_uin,
                 name="Test, Student One",
                 hashed_password=hash_password("test123"),
-                is_registered=True
+                is_registered=True,
+                course=course
             )
             db.add(student1)
             print(f"✅ Created test student 1:")
@@ -51,7 +59,8 @@ def seed_test_students():
                 uin=test2_uin,
                 name="Test, Student Two",
                 hashed_password=hash_password("test123"),
-                is_registered=True
+                is_registered=True,
+                course=course
             )
             db.add(student2)
             print(f"✅ Created test student 2:")
@@ -70,7 +79,8 @@ def seed_test_students():
                 uin=test3_uin,
                 name="puffyboo",
                 hashed_password="",  # Empty password - not registered yet
-                is_registered=False
+                is_registered=False,
+                course=course
             )
             db.add(student3)
             print(f"✅ Created test student 3 (UNREGISTERED):")
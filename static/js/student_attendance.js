@@ -132,6 +132,17 @@ document.getElementById('sessionSelect').addEventListener('change', function() {
 
 loadSessions();
 
+// Idempotency key of a submission whose outcome is unknown (network error),
+// reused when the same session and token are submitted again
+let pendingMark = null;
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
 // Mark attendance
 attendanceForm.addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -149,12 +160,18 @@ attendanceForm.addEventListener('submit', async (e) => {
         return;
     }
     
+    const submission = `${sessionId}:${token}`;
+    if (!pendingMark || pendingMark.submission !== submission) {
+        pendingMark = { submission: submission, key: newIdempotencyKey() };
+    }
+    
     try {
         const response = await fetch('/api/student/attendance/mark', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                'Authorization': `Bearer ${localStorage.getItem('token')}`
+                'Authorization': `Bearer ${localStorage.getItem('token')}`,
+                'Idempotency-Key': pendingMark.key
             },
             body: JSON.stringify({
                 session_id: parseInt(sessionId),
@@ -163,6 +180,10 @@ attendanceForm.addEventListener('submit', async (e) => {
         });
         
         const data = await response.json();
+        // The server answered, so a new submission gets a new key (409: the first attempt is still running)
+        if (response.status !== 409) {
+            pendingMark = null;
+        }
         
         if (response.ok) {
             showAlert('✅ Attendance marked successfully!', 'success');
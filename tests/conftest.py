@@ -0,0 +1,114 @@
+"""
+Shared fixtures: the app against a throwaway SQLite database.
+
+Settings are read from the environment on import, so the database and
+cache paths are set before anything under app/ is imported.
+"""
+import itertools
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+_data_dir = tempfile.mkdtemp(prefix="attendance-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_data_dir}/attendance.db"
+os.environ["CACHE_SQLITE_PATH"] = os.path.join(_data_dir, "cache.db")
+os.environ["CAPTURE_ENABLED"] = "false"
+os.environ["QUERY_BUDGET_STRICT"] = "true"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import auth, cache, models
+from app.config import settings
+from app.database import SessionLocal
+from app.main import app
+
+STUDENT_PASSWORD = "password123"
+SESSION_TOKEN = "424242"
+
+_uins = itertools.count(100000001)
+# Hashing is deliberately slow, so every test student shares one hash
+_password_hash = auth.hash_password(STUDENT_PASSWORD)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    """Each test starts with empty attempt counters and idempotency records."""
+    monkeypatch.setattr(cache, "_cache", cache.MemoryCache())
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal(info={"course": None})
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/api/admin/login", json={
+        "username": settings.ADMIN_USER_1,
+        "password": settings.ADMIN_PASSWORD,
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def make_student(db):
+    """Create a registered, enrolled student; returns the model."""
+    def factory(**fields) -> models.Student:
+        student = models.Student(
+            uin=str(next(_uins)),
+            name="Test Student",
+            hashed_password=_password_hash,
+            is_registered=True,
+            **fields,
+        )
+        db.add(student)
+        db.commit()
+        db.refresh(student)
+        return student
+    return factory
+
+
+@pytest.fixture
+def student(make_student):
+    """One registered, enrolled student."""
+    return make_student()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, monkeypatch, tmp_path):
+    """Run a test against each cache backend; sqlite is what several workers share."""
+    if request.param == "sqlite":
+        monkeypatch.setattr(cache, "_cache", cache.SqliteCache(str(tmp_path / "cache.db")))
+    return request.param
+
+
+@pytest.fixture
+def login(client):
+    """Log a student in; returns Authorization headers."""
+    def do_login(student: models.Student) -> dict:
+        response = client.post("/api/student/login", json={"uin": student.uin, "password": STUDENT_PASSWORD})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return do_login
+
+
+@pytest.fixture
+def today_session(db):
+    """A test session today (no time window) with SESSION_TOKEN active."""
+    session = models.Session(date=datetime.combine(date.today(), datetime.min.time()), is_test_session=True)
+    db.add(session)
+    db.flush()
+    db.add(models.SessionToken(session_id=session.id, token=SESSION_TOKEN,
+                               expires_at=datetime.utcnow() + timedelta(hours=1)))
+    db.commit()
+    db.refresh(session)
+    return session
@@ -0,0 +1,41 @@
+"""Admission control: which requests take a lane slot."""
+import pytest
+
+from app import admission
+
+
+def admitted(lane: str) -> int:
+    return admission.controller.snapshot()["lanes"][lane]["admitted_total"]
+
+
+@pytest.mark.parametrize("path", ["/", "/attendance", "/static/css/style.css", "/health", "/ready", "/metrics"])
+def test_pages_static_and_probes_bypass_admission(client, path):
+    before = {lane: admitted(lane) for lane in (admission.CRITICAL, admission.ANALYTICS, admission.DEFAULT)}
+    client.get(path)
+    assert {lane: admitted(lane) for lane in before} == before
+
+
+def test_api_requests_are_admitted(client, admin_headers):
+    before = admitted(admission.ANALYTICS)
+    assert client.get("/api/admin/dashboard", headers=admin_headers).status_code == 200
+    assert admitted(admission.ANALYTICS) == before + 1
+
+
+def test_probes_answer_while_the_api_is_shedding(client, monkeypatch):
+    async def shed(lane):
+        return False
+
+    monkeypatch.setattr(admission.controller, "acquire", shed)
+    assert client.get("/api/student/sessions/today").status_code == 503
+    assert client.get("/ready").status_code == 200
+
+
+def test_shed_responses_carry_cors_headers(client, monkeypatch):
+    async def shed(lane):
+        return False
+
+    monkeypatch.setattr(admission.controller, "acquire", shed)
+    response = client.get("/api/student/sessions/today", headers={"Origin": "https://example.edu"})
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert "access-control-allow-origin" in response.headers
@@ -0,0 +1,90 @@
+"""Session token guessing: lockout threshold, reset and what counts as a guess."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import attempts, cache, models
+from app.config import settings
+from app.database import get_db
+from app.main import app
+from tests.conftest import SESSION_TOKEN
+
+WRONG_TOKEN = "000000"
+
+
+@pytest.fixture
+def mark(client, student, login, today_session):
+    headers = login(student)
+
+    def submit(token: str, session_id: int = None):
+        return client.post("/api/student/attendance/mark", headers=headers,
+                           json={"session_id": session_id or today_session.id, "token": token})
+    return submit
+
+
+def guess_until_locked(mark):
+    for _ in range(settings.MARK_ATTEMPT_LIMIT - 1):
+        assert mark(WRONG_TOKEN).status_code == 403
+    return mark(WRONG_TOKEN)
+
+
+def test_limit_of_wrong_tokens_locks_out(backend, mark):
+    locked = guess_until_locked(mark)
+    assert locked.status_code == 429
+    assert int(locked.headers["Retry-After"]) == settings.MARK_LOCKOUT_BASE_SECONDS
+
+    # Even the right token is refused until the lockout ends
+    assert mark(SESSION_TOKEN).status_code == 429
+
+
+def test_lockouts_double(backend, mark, student, today_session):
+    assert guess_until_locked(mark).status_code == 429
+    # The first lockout runs out
+    cache.get_cache().delete(attempts._keys(student.id, today_session.id)[1])
+
+    locked = guess_until_locked(mark)
+    assert locked.status_code == 429
+    assert int(locked.headers["Retry-After"]) == 2 * settings.MARK_LOCKOUT_BASE_SECONDS
+
+
+def test_valid_token_resets_the_count(backend, mark):
+    for _ in range(settings.MARK_ATTEMPT_LIMIT - 1):
+        assert mark(WRONG_TOKEN).status_code == 403
+    assert mark(SESSION_TOKEN).status_code == 200
+
+    # A fresh allowance after the reset: wrong, but not locked out
+    for _ in range(settings.MARK_ATTEMPT_LIMIT - 1):
+        assert mark(WRONG_TOKEN).status_code == 403
+
+
+def test_other_rejections_do_not_count(backend, mark):
+    assert mark(SESSION_TOKEN).status_code == 200
+    for _ in range(settings.MARK_ATTEMPT_LIMIT + 1):
+        assert mark(SESSION_TOKEN).status_code == 400  # Already marked
+        assert mark(WRONG_TOKEN, session_id=999999).status_code == 404  # Unknown session
+
+
+def test_lockout_is_per_session(backend, mark, db, today_session):
+    other = models.Session(date=today_session.date, is_test_session=True)
+    db.add(other)
+    db.flush()
+    db.add(models.SessionToken(session_id=other.id, token=SESSION_TOKEN,
+                               expires_at=datetime.utcnow() + timedelta(hours=1)))
+    db.commit()
+
+    assert guess_until_locked(mark).status_code == 429
+    assert mark(SESSION_TOKEN, session_id=other.id).status_code == 200
+
+
+def test_locked_out_requests_open_no_database_session(backend, mark):
+    assert guess_until_locked(mark).status_code == 429
+
+    def no_database():
+        raise AssertionError("database session opened for a locked-out request")
+        yield  # pragma: no cover
+
+    app.dependency_overrides[get_db] = no_database
+    try:
+        assert mark(SESSION_TOKEN).status_code == 429
+    finally:
+        app.dependency_overrides.pop(get_db)
@@ -0,0 +1,59 @@
+"""Traffic capture: pseudonym stability, the bounded queue and skipped paths."""
+import asyncio
+from datetime import date
+
+import pytest
+
+from app import capture
+
+
+class FixedDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2026, 3, 2)
+
+
+def test_pseudonyms_are_keyed_on_the_capture_start_day(tmp_path, monkeypatch):
+    writer = capture.CaptureWriter(str(tmp_path))
+    writer.start()
+    try:
+        middleware = capture.CaptureMiddleware(app=None, capture_writer=writer)
+        headers = {b"authorization": b""}
+        scope = {"method": "POST", "path": "/api/student/login", "client": ("10.0.0.1", 5000)}
+        before = middleware._record(scope, headers, 0.0, 0.0, b"", False, {"status": 200, "body": b""})
+
+        # Midnight passes while the capture is running
+        monkeypatch.setattr(capture, "date", FixedDate)
+        after = middleware._record(scope, headers, 0.0, 0.0, b"", False, {"status": 200, "body": b""})
+    finally:
+        writer.stop()
+
+    assert before["who"] == after["who"]
+    assert capture.pseudonym("conn", "10.0.0.1:5000", "2026-03-02") != before["who"]
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    writer = capture.CaptureWriter(str(tmp_path), queue_size=2)
+    writer._thread = object()  # Pretend started, with nothing draining the queue
+    for index in range(5):
+        writer.write({"n": index})
+    assert writer.dropped == 3
+
+
+@pytest.mark.parametrize("path, captured", [
+    ("/api/student/sessions/today", True),
+    ("/static/js/app.js", False),
+    ("/ready", False),
+    ("/api/admin/debug/traces", False),
+])
+def test_skipped_paths_are_not_captured(tmp_path, monkeypatch, path, captured):
+    writer = capture.CaptureWriter(str(tmp_path))
+    records = []
+    monkeypatch.setattr(writer, "write", records.append)
+
+    async def app(scope, receive, send):
+        pass
+
+    middleware = capture.CaptureMiddleware(app, capture_writer=writer)
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": path, "headers": []}, None, None))
+    assert len(records) == (1 if captured else 0)
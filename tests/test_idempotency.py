@@ -0,0 +1,106 @@
+"""Idempotency-Key: replays, key reuse and retries that overlap the first attempt."""
+import threading
+
+import pytest
+
+from app import attempts, models
+from tests.conftest import SESSION_TOKEN
+
+MARK = "/api/student/attendance/mark"
+
+
+@pytest.fixture
+def headers(login, student):
+    return login(student)
+
+
+def attendance_count(db, student):
+    db.expire_all()
+    return db.query(models.Attendance).filter(models.Attendance.student_id == student.id).count()
+
+
+def test_retry_replays_the_first_response(backend, client, db, student, headers, today_session):
+    body = {"session_id": today_session.id, "token": SESSION_TOKEN}
+    keyed = {**headers, "Idempotency-Key": "retry-1"}
+
+    first = client.post(MARK, headers=keyed, json=body)
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    retry = client.post(MARK, headers=keyed, json=body)
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert attendance_count(db, student) == 1
+
+    # Without a key the duplicate reaches the endpoint and is refused
+    assert client.post(MARK, headers=headers, json=body).status_code == 400
+
+
+def test_key_reused_with_a_different_body_is_rejected(backend, client, headers, today_session):
+    keyed = {**headers, "Idempotency-Key": "reused"}
+    assert client.post(MARK, headers=keyed, json={"session_id": today_session.id, "token": "000000"}).status_code == 403
+
+    response = client.post(MARK, headers=keyed, json={"session_id": today_session.id, "token": SESSION_TOKEN})
+    assert response.status_code == 422
+
+
+def test_keys_are_scoped_to_the_caller(backend, client, db, make_student, login, headers, today_session):
+    body = {"session_id": today_session.id, "token": SESSION_TOKEN}
+    assert client.post(MARK, headers={**headers, "Idempotency-Key": "shared"}, json=body).status_code == 200
+
+    other = make_student()
+    response = client.post(MARK, headers={**login(other), "Idempotency-Key": "shared"}, json=body)
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+    assert attendance_count(db, other) == 1
+
+
+def test_concurrent_duplicate_gets_409(backend, client, db, student, headers, today_session, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    check = attempts.check
+
+    def slow_check(student_id, session_id):
+        started.set()
+        assert release.wait(10)
+        check(student_id, session_id)
+
+    monkeypatch.setattr(attempts, "check", slow_check)
+    body = {"session_id": today_session.id, "token": SESSION_TOKEN}
+    keyed = {**headers, "Idempotency-Key": "in-flight"}
+    results = {}
+
+    first = threading.Thread(target=lambda: results.setdefault("first", client.post(MARK, headers=keyed, json=body)))
+    first.start()
+    try:
+        assert started.wait(10)
+        duplicate = client.post(MARK, headers=keyed, json=body)
+    finally:
+        release.set()
+        first.join(10)
+
+    assert duplicate.status_code == 409
+    assert duplicate.headers["retry-after"] == "1"
+    assert results["first"].status_code == 200
+    assert attendance_count(db, student) == 1
+
+    # Once the first attempt has finished, the retry is answered from the store
+    monkeypatch.setattr(attempts, "check", check)
+    retry = client.post(MARK, headers=keyed, json=body)
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+
+
+def test_transient_failures_are_not_stored(backend, client, headers, today_session, monkeypatch):
+    check = attempts.check
+
+    def locked_out(student_id, session_id):
+        attempts._reject(0)
+
+    monkeypatch.setattr(attempts, "check", locked_out)
+    body = {"session_id": today_session.id, "token": SESSION_TOKEN}
+    keyed = {**headers, "Idempotency-Key": "after-429"}
+    assert client.post(MARK, headers=keyed, json=body).status_code == 429
+
+    monkeypatch.setattr(attempts, "check", check)
+    assert client.post(MARK, headers=keyed, json=body).status_code == 200
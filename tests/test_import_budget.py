@@ -0,0 +1,11 @@
+"""Startup import budget: the export-only dependencies stay lazy."""
+from benchmarks.import_budget import DEFAULT_BUDGET_MS, FORBIDDEN_MODULES, measure_imports
+
+
+def test_app_main_stays_within_its_import_budget():
+    # A fresh interpreter, so modules imported by other tests don't count
+    timings = measure_imports("app.main")
+
+    imported = {name.split(".")[0] for name in timings}
+    assert not imported & set(FORBIDDEN_MODULES)
+    assert timings["app.main"] / 1000 <= DEFAULT_BUDGET_MS
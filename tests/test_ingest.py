@@ -0,0 +1,74 @@
+"""Bulk attendance ingestion: per-row outcomes, including races with live marks."""
+from app import ingest, models
+from app.database import SessionLocal
+
+
+def statuses(report):
+    return [result["status"] for result in report["results"]]
+
+
+def test_outcome_for_every_row(db, make_student, today_session):
+    first, second = make_student(), make_student()
+    records = [
+        {"uin": first.uin, "session_id": today_session.id},
+        {"uin": first.uin, "session_id": today_session.id},
+        {"uin": second.uin, "session_id": str(today_session.id), "marked_at": "2026-01-05T09:15:00"},
+        {"uin": "000000000", "session_id": today_session.id},
+        {"uin": first.uin, "session_id": 999999},
+        {"uin": "", "session_id": today_session.id},
+        {"uin": second.uin, "session_id": today_session.id, "marked_at": "yesterday"},
+    ]
+    report = ingest.ingest_attendance(db, records)
+
+    assert statuses(report) == ["inserted", "duplicate", "inserted", "unknown_uin",
+                                "unknown_session", "invalid", "invalid"]
+    assert report["counts"] == {"inserted": 2, "duplicate": 1, "unknown_uin": 1, "unknown_session": 1, "invalid": 2}
+    assert db.query(models.Attendance).filter(models.Attendance.session_id == today_session.id).count() == 2
+
+
+def test_already_marked_is_duplicate(db, make_student, today_session):
+    student = make_student()
+    db.add(models.Attendance(student_id=student.id, session_id=today_session.id))
+    db.commit()
+
+    report = ingest.ingest_attendance(db, [{"uin": student.uin, "session_id": today_session.id}])
+    assert statuses(report) == ["duplicate"]
+
+
+def test_concurrent_mark_is_reported_as_duplicate(db, make_student, today_session, monkeypatch):
+    raced, clean = make_student(), make_student()
+    original = ingest._insert_statement
+
+    def insert_after_live_mark(dialect_name):
+        # The student marks through the API after the lookups but before the insert
+        other = SessionLocal(info={"course": None})
+        other.add(models.Attendance(student_id=raced.id, session_id=today_session.id))
+        other.commit()
+        other.close()
+        return original(dialect_name)
+
+    monkeypatch.setattr(ingest, "_insert_statement", insert_after_live_mark)
+    report = ingest.ingest_attendance(db, [
+        {"uin": raced.uin, "session_id": today_session.id},
+        {"uin": clean.uin, "session_id": today_session.id},
+    ])
+
+    assert statuses(report) == ["duplicate", "inserted"]
+    assert report["counts"] == {"duplicate": 1, "inserted": 1}
+
+
+def test_batches_are_reported_independently(db, make_student, today_session):
+    students = [make_student() for _ in range(5)]
+    report = ingest.ingest_attendance(
+        db, [{"uin": student.uin, "session_id": today_session.id} for student in students], batch_size=2
+    )
+    assert report["counts"] == {"inserted": 5}
+
+
+def test_csv_endpoint(client, admin_headers, make_student, today_session):
+    student = make_student()
+    body = f"uin,session_id,marked_at\n{student.uin},{today_session.id},\n"
+    response = client.post("/api/admin/attendance/bulk/csv", headers=admin_headers,
+                           files={"file": ("sheet.csv", body, "text/csv")})
+    assert response.status_code == 200, response.text
+    assert response.json()["counts"] == {"inserted": 1}
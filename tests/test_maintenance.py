@@ -0,0 +1,78 @@
+"""Token sweeps: deactivation, archiving and history across both tables."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import maintenance, models
+from app.config import settings
+
+
+@pytest.fixture
+def tokens(db, today_session):
+    """A live, a recently expired and a long expired token on one session."""
+    now = datetime.utcnow()
+    old = now - timedelta(days=settings.TOKEN_ARCHIVE_AFTER_DAYS + 1)
+    rows = {
+        "live": models.SessionToken(session_id=today_session.id, token="111111",
+                                    created_at=now, expires_at=now + timedelta(minutes=5)),
+        "expired": models.SessionToken(session_id=today_session.id, token="222222",
+                                       created_at=now - timedelta(hours=1), expires_at=now - timedelta(minutes=55)),
+        "old": models.SessionToken(session_id=today_session.id, token="333333",
+                                   created_at=old, expires_at=old + timedelta(minutes=5)),
+    }
+    db.add_all(rows.values())
+    db.commit()
+    return {name: (row.id, row.token) for name, row in rows.items()}
+
+
+def live_token(db, token_id):
+    db.expire_all()
+    return db.get(models.SessionToken, token_id)
+
+
+def archived_ids(db, session_id):
+    return [row.id for row in db.query(models.SessionTokenArchive).filter(
+        models.SessionTokenArchive.session_id == session_id)]
+
+
+def test_sweep_deactivates_and_archives(db, tokens, today_session):
+    deactivated, archived = maintenance.sweep_tokens()
+    assert deactivated >= 2 and archived >= 1
+
+    assert live_token(db, tokens["live"][0]).is_active
+    assert not live_token(db, tokens["expired"][0]).is_active
+    assert live_token(db, tokens["old"][0]) is None
+    assert archived_ids(db, today_session.id) == [tokens["old"][0]]
+
+
+def test_history_includes_archived_tokens(client, admin_headers, tokens, today_session):
+    maintenance.sweep_tokens()
+
+    response = client.get(f"/api/admin/tokens/history/{today_session.id}", headers=admin_headers)
+    assert response.status_code == 200
+    history = {row["token"]: row for row in response.json()["tokens"]}
+    assert {token for _, token in tokens.values()} <= set(history)
+    assert history[tokens["old"][1]]["is_active"] is False
+    assert history[tokens["old"][1]]["is_expired"] is True
+    assert history[tokens["live"][1]]["is_active"] is True
+
+
+def test_back_to_back_sweeps(db, tokens, today_session):
+    maintenance.sweep_tokens()
+    assert maintenance.sweep_tokens() == (0, 0)
+    assert archived_ids(db, today_session.id) == [tokens["old"][0]]
+
+
+def test_sweep_overlapping_another_worker(db, tokens, today_session):
+    # Another worker has copied the old token into the archive but not yet deleted it
+    token_id, token = tokens["old"]
+    row = live_token(db, token_id)
+    db.add(models.SessionTokenArchive(id=token_id, session_id=row.session_id, token=token,
+                                      expires_at=row.expires_at, created_at=row.created_at,
+                                      archive_month=row.created_at.strftime("%Y-%m")))
+    db.commit()
+
+    deactivated, archived = maintenance.sweep_tokens()
+    assert archived >= 1
+    assert live_token(db, token_id) is None
+    assert archived_ids(db, today_session.id) == [token_id]
@@ -0,0 +1,42 @@
+"""Query budgets and N+1 detection, which fail the suite in strict mode."""
+import pytest
+
+from app import models, profiler
+from app.config import settings
+from app.database import engine
+from sqlalchemy import text
+
+
+@pytest.fixture
+def class_with_attendance(db, make_student, today_session):
+    """More students than the N+1 threshold, each with an attendance record."""
+    for _ in range(settings.N_PLUS_ONE_THRESHOLD + 2):
+        student = make_student()
+        db.add(models.Attendance(student_id=student.id, session_id=today_session.id))
+    db.commit()
+
+
+def test_suite_runs_in_strict_mode():
+    assert settings.QUERY_BUDGET_STRICT
+
+
+@pytest.mark.parametrize("path", ["/api/admin/dashboard", "/api/admin/students/grades"])
+def test_admin_reports_stay_within_budget(client, admin_headers, class_with_attendance, path):
+    assert client.get(path, headers=admin_headers).status_code == 200
+
+
+def test_route_over_its_budget_fails(client, admin_headers, monkeypatch):
+    monkeypatch.setitem(settings.QUERY_BUDGETS, "/api/admin/dashboard", 1)
+    with pytest.raises(profiler.QueryBudgetExceeded, match="budget of 1 queries"):
+        client.get("/api/admin/dashboard", headers=admin_headers)
+
+
+def test_repeated_statement_is_flagged_as_n_plus_one():
+    token = profiler._query_log.set(profiler.QueryLog({"path": "/loop"}))
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(profiler.QueryBudgetExceeded, match="same statement"):
+                for student_id in range(settings.N_PLUS_ONE_THRESHOLD + 1):
+                    conn.execute(text("SELECT name FROM students WHERE id = :id"), {"id": student_id})
+    finally:
+        profiler._query_log.reset(token)
@@ -0,0 +1,66 @@
+"""Read replica routing with read-your-writes, per course database."""
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app import auth, database
+from app.config import settings
+
+SHARD = "CSCE-439"
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """A read-only engine on the test database standing in for a replica."""
+    path = settings.DATABASE_URL[len("sqlite:///"):]
+    read_engine = database.create_db_engine(f"sqlite:///file:{path}?mode=ro&uri=true")
+    monkeypatch.setattr(database, "read_engine", read_engine)
+    yield read_engine
+    read_engine.dispose()
+
+
+def student_request(course=None) -> Request:
+    claims = {"sub": "1", "type": "student"}
+    if course:
+        claims["course"] = course
+    token = auth.create_access_token(claims)
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())],
+                    "query_string": b""})
+
+
+def read_bind(request: Request, principal: str = "student:1"):
+    reads = database.read_db_for(request, principal)
+    db = next(reads)
+    try:
+        return db.get_bind()
+    finally:
+        reads.close()
+
+
+def write_session(course=None):
+    return database.SessionLocal(info={"course": course})
+
+
+def test_reads_go_to_the_replica(replica):
+    assert read_bind(student_request()) is replica
+
+
+def test_reads_after_a_write_stay_on_the_writer(replica, monkeypatch):
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 0.2)
+    database.record_write(write_session(), "student:1")
+    assert read_bind(student_request()) is database.engine
+    # Other readers are unaffected
+    assert read_bind(student_request(), "student:2") is replica
+
+    time.sleep(0.3)
+    assert read_bind(student_request()) is replica
+
+
+def test_same_student_id_in_another_course_is_not_pinned(replica):
+    # Student 1 of the CSCE-439 shard is a different person from student 1 of the default database
+    database.record_write(write_session(SHARD), "student:1")
+    assert read_bind(student_request()) is replica
+
+    database.record_write(write_session(), "student:1")
+    assert read_bind(student_request()) is database.engine
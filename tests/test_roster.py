@@ -0,0 +1,94 @@
+"""Roster sync: adds, changes and drops, and what a drop takes away."""
+import csv
+
+from app import models, roster
+from app.utils import roster_fingerprint
+from tests.conftest import SESSION_TOKEN
+
+COURSE = "CSCE-901"
+
+
+def write_roster(path, students):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["Student", "SIS User ID", "Section"])
+        writer.writeheader()
+        writer.writerow({"Student": "Points Possible", "SIS User ID": "", "Section": ""})
+        for uin, name in students:
+            writer.writerow({"Student": name, "SIS User ID": uin, "Section": f"{COURSE}-500"})
+    return str(path)
+
+
+def course_summary(result):
+    (summary,) = [c for c in result["courses"] if c["course"] == COURSE]
+    return summary
+
+
+def stored(db, uin):
+    db.expire_all()
+    return db.query(models.Student).filter(models.Student.uin == uin).one()
+
+
+def test_sync_applies_adds_changes_and_drops(db, tmp_path):
+    path = write_roster(tmp_path / "roster.csv", [("900000001", "Ada Lovelace"), ("900000002", "Alan Turing")])
+    assert course_summary(roster.sync_rosters([path]))["added"] == 2
+
+    path = write_roster(tmp_path / "roster.csv", [("900000001", "Ada King"), ("900000003", "Grace Hopper")])
+    summary = course_summary(roster.sync_rosters([path]))
+    assert (summary["added"], summary["updated"], summary["dropped"], summary["unchanged"]) == (1, 1, 1, 0)
+
+    renamed = stored(db, "900000001")
+    assert renamed.name == "Ada King"
+    assert renamed.roster_fingerprint == roster_fingerprint("900000001", "Ada King", COURSE)
+    assert stored(db, "900000002").is_enrolled is False
+    assert stored(db, "900000003").is_enrolled is True
+
+    # An unchanged roster is a no-op, and a returning student is re-enrolled
+    path = write_roster(tmp_path / "roster.csv",
+                        [("900000001", "Ada King"), ("900000002", "Alan Turing"), ("900000003", "Grace Hopper")])
+    summary = course_summary(roster.sync_rosters([path]))
+    assert (summary["added"], summary["updated"], summary["dropped"], summary["unchanged"]) == (0, 1, 0, 2)
+    assert stored(db, "900000002").is_enrolled is True
+
+
+def test_dry_run_writes_nothing(db, tmp_path):
+    path = write_roster(tmp_path / "roster.csv", [("900000101", "Dry Run")])
+    assert course_summary(roster.sync_rosters([path], dry_run=True))["added"] == 1
+    assert db.query(models.Student).filter(models.Student.uin == "900000101").count() == 0
+
+
+def test_students_without_fingerprint_are_never_dropped(db, tmp_path, make_student):
+    manual = make_student(course=COURSE)
+    path = write_roster(tmp_path / "roster.csv", [("900000201", "On Roster")])
+    roster.sync_rosters([path])
+    assert stored(db, manual.uin).is_enrolled is True
+
+
+def test_dropped_student_cannot_log_in(client, db, make_student):
+    student = make_student(is_enrolled=False)
+    response = client.post("/api/student/login", json={"uin": student.uin, "password": "password123"})
+    assert response.status_code == 403
+
+
+def test_dropped_student_cannot_mark(client, db, make_student, login, today_session):
+    student = make_student()
+    headers = login(student)
+    student.is_enrolled = False
+    db.commit()
+
+    response = client.post("/api/student/attendance/mark", headers=headers,
+                           json={"session_id": today_session.id, "token": SESSION_TOKEN})
+    assert response.status_code == 403
+    assert db.query(models.Attendance).filter(models.Attendance.student_id == student.id).count() == 0
+
+
+def test_dropped_students_leave_admin_aggregates(client, make_student, admin_headers):
+    enrolled = make_student()
+    dropped = make_student(is_enrolled=False)
+
+    uins = {row["uin"] for row in client.get("/api/admin/students/grades", headers=admin_headers).json()}
+    assert enrolled.uin in uins
+    assert dropped.uin not in uins
+
+    before = client.get("/api/admin/dashboard", headers=admin_headers).json()["total_students"]
+    make_student(is_enrolled=False)
+    assert client.get("/api/admin/dashboard", headers=admin_headers).json()["total_students"] == before
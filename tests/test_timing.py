@@ -0,0 +1,72 @@
+"""Shared statement timing and the observers built on it."""
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import metrics, profiler, timing
+from app.config import settings
+from app.database import engine
+
+
+@pytest.fixture
+def observed(client):
+    calls = []
+
+    def before(conn, statement, parameters, context, executemany):
+        calls.append(("before", statement))
+
+    def after(conn, cursor, statement, parameters, context, executemany, elapsed):
+        calls.append(("after", statement, elapsed))
+
+    def error(context, exception, elapsed):
+        calls.append(("error", type(exception).__name__, elapsed))
+
+    timing.register(before=before, after=after, error=error)
+    yield calls
+    timing._before.remove(before)
+    timing._after.remove(after)
+    timing._error.remove(error)
+
+
+def test_failed_statement_reports_error_and_leaves_no_state(observed):
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        conn.execute(text("SELECT 1"))
+
+    kinds = [call[0] for call in observed]
+    assert kinds == ["before", "error", "before", "after"]
+    assert observed[1][1] == "OperationalError"
+    assert all(call[-1] >= 0 for call in observed if call[0] != "before")
+
+
+def test_metrics_count_failed_statements(client):
+    stats = metrics.RequestStats()
+    token = metrics._request_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.execute(text("SELECT 1"))
+    finally:
+        metrics._request_stats.reset(token)
+    assert stats.queries == 2
+    assert stats.db_seconds > 0
+
+
+def test_slow_query_log_omits_parameters(client, monkeypatch, caplog):
+    profiler.install_query_hooks()
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.0)
+    token = profiler._query_log.set(profiler.QueryLog({"path": "/test"}))
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.profiler"):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT :secret AS value"), {"secret": "hunter2-secret"})
+    finally:
+        profiler._query_log.reset(token)
+
+    slow = [record.getMessage() for record in caplog.records if "Slow query" in record.getMessage()]
+    assert slow
+    assert all("hunter2-secret" not in message for message in slow)
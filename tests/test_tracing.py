@@ -0,0 +1,131 @@
+"""Request tracing: sampling and the span tree built by TracedRoute."""
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app import sampler, tracing
+from app.config import settings
+from app.main import app
+from app.routers import student
+from tests.conftest import SESSION_TOKEN
+
+INCOMING = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def trace_of(response):
+    trace_id = response.headers["traceparent"].split("-")[1]
+    return tracing.buffer.get(trace_id)
+
+
+def test_request_stages_nest_under_the_root(client, monkeypatch, make_student, login, today_session):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    headers = login(make_student())
+    response = client.post("/api/student/attendance/mark", headers=headers,
+                           json={"session_id": today_session.id, "token": SESSION_TOKEN})
+    assert response.status_code == 200
+
+    trace = trace_of(response)
+    by_id = {span.span_id: span for span in trace.spans}
+    parent_of = {span.name: by_id[span.parent_id].name if span.parent_id in by_id else None
+                 for span in trace.spans}
+    root = trace.root.name
+    assert root == "POST /api/student/attendance/mark"
+    assert parent_of["dependencies"] == root
+    assert parent_of["auth.student"] == "dependencies"
+    assert parent_of["endpoint"] == root
+    assert parent_of["serialize"] == root
+    assert parent_of["render"] == "serialize"
+    assert any(span.name == "db.query" and by_id[span.parent_id].name == "endpoint" for span in trace.spans)
+
+    stages = sorted((span for span in trace.spans if span.name in ("dependencies", "endpoint", "serialize")),
+                    key=lambda span: span.start_ns)
+    assert [span.name for span in stages] == ["dependencies", "endpoint", "serialize"]
+    assert all(span.end_ns is not None for span in trace.spans)
+
+
+def test_failing_dependency_closes_its_stage(client, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    response = client.get("/api/student/sessions/today", headers={"Authorization": "Bearer nope"})
+    assert response.status_code == 401
+
+    trace = trace_of(response)
+    (dependencies,) = [span for span in trace.spans if span.name == "dependencies"]
+    assert dependencies.status == tracing.STATUS_ERROR
+    assert not any(span.name == "endpoint" for span in trace.spans)
+
+
+def test_unsampled_requests_are_not_traced(client, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+    assert "traceparent" not in client.get("/api/admin/settings").headers
+
+
+def test_sampled_traceparent_forces_tracing(client, monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+    response = client.get("/api/admin/settings", headers={"traceparent": INCOMING})
+    trace = trace_of(response)
+    assert trace.trace_id == INCOMING.split("-")[1]
+    assert trace.root.parent_id == INCOMING.split("-")[2]
+
+    unsampled = INCOMING[:-2] + "00"
+    assert "traceparent" not in client.get("/api/admin/settings", headers={"traceparent": unsampled}).headers
+
+
+@pytest.mark.parametrize("rate", [0.0, 1.0])
+def test_endpoints_behave_the_same_traced_or_not(client, monkeypatch, admin_headers, rate):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", rate)
+    response = client.get("/api/admin/sessions", headers=admin_headers)
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+@pytest.fixture
+def staged_calls(monkeypatch):
+    """Count calls through the stage-splitting endpoint wrapper."""
+    calls = []
+    wrap = tracing._traced_endpoint
+
+    def counting(func):
+        wrapper = wrap(func)
+
+        async def counted(*args, **kwargs):
+            calls.append(func.__name__)
+            return await wrapper(*args, **kwargs)
+        return counted
+
+    monkeypatch.setattr(tracing, "_traced_endpoint", counting)
+    return calls
+
+
+def traced_app() -> TestClient:
+    router = APIRouter(route_class=tracing.TracedRoute)
+
+    @router.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(tracing.TracingMiddleware, trace_buffer=tracing.TraceBuffer(10))
+    return TestClient(app)
+
+
+def test_untraced_requests_skip_the_endpoint_wrapper(monkeypatch, staged_calls):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+    test_client = traced_app()
+    assert test_client.get("/ping").json() == {"ok": True}
+    assert staged_calls == []
+
+    assert test_client.get("/ping", headers={"traceparent": INCOMING}).json() == {"ok": True}
+    assert staged_calls == ["ping"]
+
+
+def test_tracing_disabled_builds_plain_routes(monkeypatch, staged_calls):
+    monkeypatch.setattr(settings, "TRACING_ENABLED", False)
+    test_client = traced_app()
+    assert test_client.get("/ping", headers={"traceparent": INCOMING}).json() == {"ok": True}
+    assert staged_calls == []
+
+
+def test_profiler_attributes_frames_to_the_wrapped_endpoint():
+    index = sampler.route_index(app.routes)
+    assert index[student.mark_attendance.__code__] == "POST /api/student/attendance/mark"